@@ -0,0 +1,110 @@
+"""\
+This module provides a vectorized evaluator for many gameboards at once.
+
+Boards are int8 arrays of shape (N, size * size) or (N, size, size) where
+each slot holds EMPTY, X or O. Every line of winning_lines() becomes a column
+of an indicator matrix, so one matrix product gives the sum of every line of
+every board and a line of win_length X (or O) sums to win_length (or
+-win_length). The rules come from the same line list as BoardClass, and the
+boards can be exported from and imported into BoardClass gameboard lists.
+
+Functions:
+line_matrix() -- build the slot-by-line indicator matrix
+evaluate_batch() -- find the winners, the full boards and the legal moves
+export_boards() -- turn BoardClass gameboards into an array
+import_board() -- load one row of an array into a BoardClass
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from bitboard import winning_lines
+from gameboard import BoardClass
+
+EMPTY, X, O = 0, 1, -1
+CHESS_VALUES = {'': EMPTY, 'x': X, 'o': O}
+VALUE_CHESS = {EMPTY: '', X: 'x', O: 'o'}
+
+_line_matrices: Dict[Tuple[int, int], np.ndarray] = {}
+
+
+def line_matrix(size: int, win_length: int) -> np.ndarray:
+    '''Build the indicator matrix of the winning lines.
+
+    Args:
+        size: The number of rows (and columns) of the boards.
+        win_length: The number of chess in a row needed to win.
+
+    Returns:
+        An int16 array of shape (size * size, number of lines), 1 where a slot lies on a line
+    '''
+    key = (size, win_length)
+    if key not in _line_matrices:
+        lines = winning_lines(size, win_length)
+        matrix = np.zeros((size * size, len(lines)), dtype=np.int16)
+        for column, line in enumerate(lines):
+            matrix[list(line), column] = 1
+        _line_matrices[key] = matrix
+    return _line_matrices[key]
+
+
+def evaluate_batch(boards: np.ndarray, win_length: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Evaluate many boards in one vectorized pass.
+
+    Args:
+        boards: An int8 array of shape (N, size * size) or (N, size, size).
+        win_length: The number of chess in a row needed to win, None for 3 or the board size if smaller.
+
+    Returns:
+        The winners as an (N,) int8 array of X, O or EMPTY,
+        the full-board flags as an (N,) bool array,
+        and the legal moves as an (N, size * size) bool array, all False once a board is won
+
+    Raises:
+        ValueError: if the boards are not square
+    '''
+    boards = np.asarray(boards, dtype=np.int8)
+    if boards.ndim == 3:
+        size = boards.shape[1]
+        if boards.shape[2] != size:
+            raise ValueError('The boards should be square')
+        boards = boards.reshape(boards.shape[0], size * size)
+    else:
+        size = int(round(boards.shape[1] ** 0.5))
+        if size * size != boards.shape[1]:
+            raise ValueError('The boards should have a square number of slots')
+    if win_length is None:
+        win_length = min(3, size)
+
+    sums = boards.astype(np.int16) @ line_matrix(size, win_length)
+    x_wins = (sums == win_length).any(axis=1)
+    o_wins = (sums == -win_length).any(axis=1)
+    winners = np.where(x_wins, X, np.where(o_wins, O, EMPTY)).astype(np.int8)
+
+    legal = boards == EMPTY
+    full = ~legal.any(axis=1)
+    legal &= (winners == EMPTY)[:, None]
+    return winners, full, legal
+
+
+def export_boards(boards: Iterable[BoardClass]) -> np.ndarray:
+    '''Turn the gameboards of BoardClass objects of one size into an array.
+
+    Args:
+        boards: The BoardClass objects to export.
+
+    Returns:
+        An int8 array of shape (N, size * size)
+    '''
+    rows = [[CHESS_VALUES[chess] for row in board.gameboard for chess in row] for board in boards]
+    return np.array(rows, dtype=np.int8)
+
+
+def import_board(row: np.ndarray, board: BoardClass) -> None:
+    '''Load one board of an array into a BoardClass.
+
+    Args:
+        row: An array of size * size slots, or size rows of size slots.
+        board: The BoardClass that receives the position.
+    '''
+    values = np.asarray(row, dtype=np.int8).reshape(board.size, board.size).tolist()
+    board.setGameBoard([[VALUE_CHESS[value] for value in values_row] for values_row in values])
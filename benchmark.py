@@ -0,0 +1,429 @@
+"""\
+This module provides a reproducible benchmark suite for the game stack.
+
+Every benchmark returns one number with its unit. The results are written to
+a JSON file so that a later run can be compared with it, and the comparison
+flags every benchmark that got slower by more than a threshold. Benchmarks
+with a budget, like the import time of the headless entry point cli.py,
+fail the run when they go over it whatever the baseline.
+
+Usage:
+    python benchmark.py [--output results.json] [--compare baseline.json] [--threshold 0.1] [NAME ...]
+
+Functions:
+bench_board_move() -- time updateGameBoard, isWinner and boardIsFull per move
+bench_parse_coordinate() -- count parse_coordinate calls per second
+bench_random_game() -- count random games simulated per second
+bench_mcts_playouts() -- count MCTS playouts run per second on a 9x9 board
+bench_loopback_match() -- time the move round trip between a client and a server
+bench_import_headless() -- time the import of the headless entry point with -X importtime
+bench_window_startup() -- time the window of a 3x3 or a 19x19 board until it is drawn
+run_benchmarks() -- run the benchmarks and collect the results
+compare_results() -- find the benchmarks that got slower than a baseline
+check_budgets() -- find the benchmarks over their budget
+"""
+
+import argparse
+import json
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from threading import Thread
+from typing import Callable, Dict, List, Tuple
+from gameboard import BoardClass, BACKENDS
+from mcts import MCTS
+from selfplay import play_chunk
+import coordinate
+import protocol
+
+SEED = 2022
+REPEATS = 5         # the best of REPEATS runs is reported
+THRESHOLD = 0.1     # slowdowns above 10% are flagged
+HEADLESS_MODULE = 'cli'             # the headless entry point
+IMPORT_BUDGET_MS = 80               # import time allowed for the headless entry point
+UI_MODULES = ('tkinter', '_tkinter')    # modules a headless import must not load
+WINDOW_SIZES = (3, 19)              # board sizes whose window startups are compared
+WINDOW_SCRIPT = '''\
+import resource, sys, time
+from game_window import GameWindow
+started = time.perf_counter()
+window = GameWindow('x', int(sys.argv[1]), sys.argv[2])
+window.create_widget()
+window.window.update()
+print(time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+Result = Dict[str, object]
+
+
+def best_of(func: Callable[[], float], repeats: int = REPEATS) -> float:
+    '''Run a timed function several times.
+
+    Args:
+        func: A function that returns the seconds it measured.
+        repeats: The number of runs.
+
+    Returns:
+        The fastest run in seconds
+    '''
+    return min(func() for _ in range(repeats))
+
+
+def record_games(num_of_games: int, size: int = 3) -> List[List[tuple]]:
+    '''Record random games so every backend replays the same moves.
+
+    Args:
+        num_of_games: The number of games to record.
+        size: The number of rows (and columns) of the gameboard.
+
+    Returns:
+        A list of games, each one a list of (player name, x, y) moves
+    '''
+    rng = random.Random(SEED)
+    board = BoardClass('player1', 'player2', 'player1', size=size)
+    games = []
+    for _ in range(num_of_games):
+        board.resetGameBoard()
+        moves = []
+        name = 'player1'
+        while True:
+            x, y = rng.choice(board.getEmptySlots())
+            board.updateGameBoard(name, x, y)
+            moves.append((name, x, y))
+            if board.isWinner() or board.boardIsFull():
+                break
+            name = 'player2' if name == 'player1' else 'player1'
+        games.append(moves)
+    return games
+
+
+def bench_board_move(backend: str, num_of_games: int = 5000) -> Result:
+    '''Time one move: updateGameBoard followed by isWinner and boardIsFull.
+
+    Args:
+        backend: The backend of BoardClass.
+        num_of_games: The number of recorded games to replay.
+
+    Returns:
+        The nanoseconds per move
+    '''
+    games = record_games(num_of_games)
+    num_of_moves = sum(len(moves) for moves in games)
+    board = BoardClass('player1', 'player2', 'player1', backend=backend)
+
+    def run() -> float:
+        start = time.perf_counter()
+        for moves in games:
+            board.resetGameBoard()
+            for name, x, y in moves:
+                board.updateGameBoard(name, x, y)
+                if board.isWinner() or board.boardIsFull():
+                    break
+        return time.perf_counter() - start
+
+    return {'value': best_of(run) / num_of_moves * 1e9, 'unit': 'ns/move', 'higher_is_better': False}
+
+
+def bench_parse_coordinate(num_of_calls: int = 200000) -> Result:
+    '''Count how many coordinate strings are parsed per second.
+
+    Args:
+        num_of_calls: The number of strings to parse in a run.
+
+    Returns:
+        The calls per second
+    '''
+    rng = random.Random(SEED)
+    strings = ['{}, {}'.format(rng.randint(1, 3), rng.randint(1, 3)) for _ in range(num_of_calls)]
+    parse = coordinate.parse_coordinate
+
+    def run() -> float:
+        start = time.perf_counter()
+        for string in strings:
+            parse(string)
+        return time.perf_counter() - start
+
+    return {'value': num_of_calls / best_of(run), 'unit': 'calls/s', 'higher_is_better': True}
+
+
+def bench_random_game(num_of_games: int = 20000) -> Result:
+    '''Count how many random games are simulated per second in one process.
+
+    Args:
+        num_of_games: The number of games in a run.
+
+    Returns:
+        The games per second
+    '''
+    def run() -> float:
+        start = time.perf_counter()
+        play_chunk('random', 'random', num_of_games, SEED)
+        return time.perf_counter() - start
+
+    return {'value': num_of_games / best_of(run), 'unit': 'games/s', 'higher_is_better': True}
+
+
+def bench_mcts_playouts(size: int = 9, win_length: int = 5, budget: float = 1.0) -> Result:
+    '''Count how many MCTS playouts are run per second from an empty board.
+
+    Args:
+        size: The number of rows (and columns) of the gameboard.
+        win_length: The number of chess in a row needed to win.
+        budget: The seconds of one search.
+
+    Returns:
+        The playouts per second
+    '''
+    def run() -> float:
+        search = MCTS(size, win_length, budget, rng=random.Random(SEED))
+        search.search([])
+        return 1 / search.last_report['playouts_per_second']     # seconds per playout, the best run is the lowest
+
+    return {'value': 1 / best_of(run, 3), 'unit': 'playouts/s', 'higher_is_better': True}
+
+
+def bench_loopback_match(num_of_moves: int = 2000) -> Result:
+    '''Time the round trip of a move between a Player1-style client and a Player2-style server.
+
+    The server answers every move with a move of its own, like Player2 does.
+
+    Args:
+        num_of_moves: The number of moves sent by the client.
+
+    Returns:
+        The 99th percentile round trip in microseconds, with the median as extra information
+    '''
+    server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_sock.bind(('127.0.0.1', 0))
+    server_sock.listen(1)
+
+    def serve() -> None:
+        conn_sock, _ = server_sock.accept()
+        conn_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        reader = protocol.FrameReader(conn_sock)
+        reader.read_frame()
+        conn_sock.sendall(protocol.encode_hello('player2'))
+        try:
+            while True:
+                kind, payload = reader.read_frame()
+                if kind != protocol.MOVE:
+                    break
+                conn_sock.sendall(protocol.encode_move(*protocol.decode_move(payload)))
+        finally:
+            conn_sock.close()
+
+    thread = Thread(target=serve)
+    thread.start()
+
+    sock = socket.create_connection(server_sock.getsockname())
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    reader = protocol.FrameReader(sock)
+    sock.sendall(protocol.encode_hello('player1'))
+    reader.read_frame()
+
+    samples = []
+    for move in range(num_of_moves):
+        start = time.perf_counter()
+        sock.sendall(protocol.encode_move(move % 3 + 1, move // 3 % 3 + 1))
+        reader.read_frame()
+        samples.append(time.perf_counter() - start)
+
+    sock.sendall(protocol.encode_frame(protocol.FUN_TIMES))
+    thread.join()
+    sock.close()
+    server_sock.close()
+
+    samples.sort()
+    return {
+        'value': samples[int(len(samples) * 0.99)] * 1e6,
+        'unit': 'us p99',
+        'higher_is_better': False,
+        'p50': samples[len(samples) // 2] * 1e6,
+    }
+
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    '''Import a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module: The name of the module.
+
+    Returns:
+        The cumulative import time of the module in seconds and the names of all the modules it loaded
+    '''
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            capture_output=True, text=True, check=True).stderr
+    cumulative = {}
+    for line in output.splitlines():
+        fields = line.split('|')
+        if not line.startswith('import time:') or len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        cumulative[fields[2].strip()] = int(fields[1])     # microseconds
+    return cumulative[module] / 1e6, list(cumulative)
+
+
+def bench_import_headless(module: str = HEADLESS_MODULE) -> Result:
+    '''Time the import of the headless entry point and check that it doesn't load tkinter.
+
+    Args:
+        module: The name of the entry point module.
+
+    Returns:
+        The import time in milliseconds, with the budget and the UI modules it loaded
+    '''
+    seconds = best_of(lambda: measure_import(module)[0])
+    _, loaded = measure_import(module)
+    return {
+        'value': seconds * 1e3,
+        'unit': 'ms import',
+        'higher_is_better': False,
+        'budget': IMPORT_BUDGET_MS,
+        'ui_modules': [name for name in loaded if name in UI_MODULES],
+    }
+
+
+def bench_window_startup(size: int, renderer: str = 'canvas') -> Result:
+    '''Time the creation of a window until it is drawn, in a fresh interpreter each run.
+
+    The run is skipped with a value of 0 when Tk can't open a display.
+
+    Args:
+        size: The number of rows (and columns) of the board.
+        renderer: 'buttons' or 'canvas', see GameWindow.
+
+    Returns:
+        The startup time in milliseconds, with the peak resident memory of the process in kilobytes
+    '''
+    samples = []
+    for _ in range(REPEATS):
+        process = subprocess.run([sys.executable, '-c', WINDOW_SCRIPT, str(size), renderer],
+                                 capture_output=True, text=True)
+        if process.returncode != 0:
+            return {'value': 0.0, 'unit': 'ms startup', 'higher_is_better': False,
+                    'skipped': process.stderr.strip().splitlines()[-1]}
+        seconds, max_rss = process.stdout.split()
+        samples.append((float(seconds), int(max_rss)))
+    seconds, max_rss = min(samples)
+    return {
+        'value': seconds * 1e3,
+        'unit': 'ms startup',
+        'higher_is_better': False,
+        'max_rss_kb': max_rss,
+    }
+
+
+BENCHMARKS: Dict[str, Callable[[], Result]] = {
+    'parse_coordinate': bench_parse_coordinate,
+    'random_game': bench_random_game,
+    'mcts_playouts': bench_mcts_playouts,
+    'loopback_match': bench_loopback_match,
+    'import_headless': bench_import_headless,
+}
+for _backend in BACKENDS:
+    BENCHMARKS['board_move_%s' % _backend] = lambda backend=_backend: bench_board_move(backend)
+for _size in WINDOW_SIZES:
+    BENCHMARKS['window_startup_%d' % _size] = lambda size=_size: bench_window_startup(size)
+
+
+def run_benchmarks(names: List[str]) -> Dict[str, object]:
+    '''Run benchmarks.
+
+    Args:
+        names: The names of the benchmarks, all of them when empty.
+
+    Returns:
+        A dict with information about the machine and the result of every benchmark
+
+    Raises:
+        ValueError: if a name is unknown
+    '''
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError('Unknown benchmark %s, choose from %s' % (name, ', '.join(BENCHMARKS)))
+
+    results = {}
+    for name in names or BENCHMARKS:
+        results[name] = BENCHMARKS[name]()
+        print('{:24} {:14.2f} {}'.format(name, results[name]['value'], results[name]['unit']))
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def compare_results(current: Dict[str, object], baseline: Dict[str, object], threshold: float = THRESHOLD) -> List[str]:
+    '''Find the benchmarks that got slower than a baseline.
+
+    Args:
+        current: The output of run_benchmarks().
+        baseline: An earlier output of run_benchmarks().
+        threshold: The relative slowdown that is tolerated.
+
+    Returns:
+        A message for every benchmark slower than the threshold
+    '''
+    slowdowns = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        old, new = baseline['results'][name]['value'], result['value']
+        if result['higher_is_better']:
+            change = (old - new) / old if old else 0.0
+        else:
+            change = (new - old) / old if old else 0.0
+        if change > threshold:
+            slowdowns.append('{} is {:.1%} slower: {:.2f} -> {:.2f} {}'.format(name, change, old, new, result['unit']))
+    return slowdowns
+
+
+def check_budgets(report: Dict[str, object]) -> List[str]:
+    '''Find the benchmarks over their budget.
+
+    Args:
+        report: The output of run_benchmarks().
+
+    Returns:
+        A message for every benchmark over its budget or loading UI modules
+    '''
+    messages = []
+    for name, result in report['results'].items():
+        if 'budget' in result and result['value'] > result['budget']:
+            messages.append('{} is over its budget: {:.2f} > {:.2f} {}'.format(
+                name, result['value'], result['budget'], result['unit']))
+        if result.get('ui_modules'):
+            messages.append('{} loads {}'.format(name, ', '.join(result['ui_modules'])))
+    return messages
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the game stack.')
+    parser.add_argument('names', nargs='*', help='benchmarks to run, all of them by default')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='compare with the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='relative slowdown to flag')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.names)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    failed = False
+    for message in check_budgets(report):
+        print('BUDGET: ' + message)
+        failed = True
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            messages = compare_results(report, json.load(baseline_file), args.threshold)
+        for message in messages:
+            print('SLOWER: ' + message)
+            failed = True
+
+    if failed:
+        sys.exit(1)
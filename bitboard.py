@@ -0,0 +1,154 @@
+"""\
+This module provides a bitboard representation of the gameboard.
+
+Every player owns a mask of size * size bits where bit (x * size + y) is set
+when the player has a chess on the slot (x, y). A win is found by AND-ing the
+mask with the precomputed masks of the lines that pass through the last slot,
+and a full board by one popcount.
+
+Functions:
+winning_lines() -- list the slot indices of every line that wins the game
+slot_line_masks() -- group the line masks by the slots they pass through
+
+Classes:
+BitBoard -- keeps the slots of both players as two integer masks
+"""
+
+from typing import Dict, List, Tuple
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))     # row, column, diagonal, anti-diagonal
+
+_line_masks_cache: Dict[Tuple[int, int], List[Tuple[int, ...]]] = {}
+
+
+def winning_lines(size: int, win_length: int) -> List[Tuple[int, ...]]:
+    '''List every line of win_length slots on a size * size board.
+
+    Args:
+        size: The number of rows (and columns) of the board.
+        win_length: The number of chess in a row needed to win.
+
+    Returns:
+        A list of tuples, each one holds the slot indices of a line
+    '''
+    lines = []
+    for x in range(size):
+        for y in range(size):
+            for dx, dy in DIRECTIONS:
+                end_x = x + dx * (win_length - 1)
+                end_y = y + dy * (win_length - 1)
+                if 0 <= end_x < size and 0 <= end_y < size:    # Justify whether the line stays on the board
+                    lines.append(tuple((x + dx * i) * size + y + dy * i for i in range(win_length)))
+    return lines
+
+
+def slot_line_masks(size: int, win_length: int) -> List[Tuple[int, ...]]:
+    '''Group the line masks by the slots they pass through.
+
+    Args:
+        size: The number of rows (and columns) of the board.
+        win_length: The number of chess in a row needed to win.
+
+    Returns:
+        A list indexed by slot, each item holds the masks of the lines through that slot
+    '''
+    key = (size, win_length)
+    if key not in _line_masks_cache:
+        slot_masks = [[] for _ in range(size * size)]
+        for line in winning_lines(size, win_length):
+            mask = sum(1 << index for index in line)
+            for index in line:
+                slot_masks[index].append(mask)
+        _line_masks_cache[key] = [tuple(masks) for masks in slot_masks]
+    return _line_masks_cache[key]
+
+
+class BitBoard:
+    '''A class to store the gameboard as two bit masks.
+
+    Attributes:
+        size(int): The number of rows (and columns) of the board.
+        win_length(int): The number of chess in a row needed to win.
+        x_bits(int): The mask of slots taken by player1.
+        o_bits(int): The mask of slots taken by player2.
+    '''
+    def __init__(self, size: int = 3, win_length: int = 3) -> None:
+        '''Make an empty bitboard.
+
+        Args:
+            size: The number of rows (and columns) of the board.
+            win_length: The number of chess in a row needed to win.
+        '''
+        self.size = size
+        self.win_length = win_length
+        self.x_bits = 0
+        self.o_bits = 0
+        self.slot_masks = slot_line_masks(size, win_length)
+
+
+    def clear(self) -> None:
+        '''Clear all the chess from the bitboard.
+        '''
+        self.x_bits = 0
+        self.o_bits = 0
+
+
+    def is_empty(self, index: int) -> bool:
+        '''Justify whether the slot is empty.
+
+        Args:
+            index: The index of the slot, which is x * size + y.
+
+        Returns:
+            True if it's empty, False otherwise
+        '''
+        return not (self.x_bits | self.o_bits) >> index & 1
+
+
+    def place(self, index: int, chess: str) -> None:
+        '''Put a chess on the slot.
+
+        Args:
+            index: The index of the slot, which is x * size + y.
+            chess: 'x' for player1, 'o' for player2.
+        '''
+        if chess == 'x':
+            self.x_bits |= 1 << index
+        else:
+            self.o_bits |= 1 << index
+
+
+    def remove(self, index: int) -> None:
+        '''Take a chess off the slot.
+
+        Args:
+            index: The index of the slot, which is x * size + y.
+        '''
+        self.x_bits &= ~(1 << index)
+        self.o_bits &= ~(1 << index)
+
+
+    def is_win(self, chess: str, index: int) -> bool:
+        '''Justify whether the chess on the slot completes a line.
+
+        Args:
+            chess: 'x' for player1, 'o' for player2.
+            index: The index of the last slot, which is x * size + y.
+
+        Returns:
+            True if one of the lines through the slot is taken, False otherwise
+        '''
+        bits = self.x_bits if chess == 'x' else self.o_bits
+        for mask in self.slot_masks[index]:
+            if bits & mask == mask:
+                return True
+        return False
+
+
+    def is_full(self) -> bool:
+        '''Justify whether there is no empty slot left.
+
+        Returns:
+            True when all the slots are taken, False otherwise
+        '''
+        return bin(self.x_bits | self.o_bits).count('1') == self.size * self.size
@@ -0,0 +1,286 @@
+"""\
+This module provides headless players that run in a terminal or as daemons.
+
+They speak the same protocol as the windows of Player1 and Player2, so they
+can play against them, against each other or through the game server. Moves
+are typed on stdin as "x, y" or picked by a strategy of the strategies
+module, which lets CI and soak tests run thousands of matches without a
+display.
+
+Usage:
+    python cli.py client HOST PORT USERNAME [--strategy NAME] [--games N]
+        -- connect to a Player2 window, a cli.py server or the game server
+    python cli.py server HOST PORT USERNAME [--strategy NAME] [--matches N]
+        -- wait for player1 like the Player2 window does
+
+The client is player1 against a Player2 window or a cli.py server, and gets
+its role from the game server otherwise. The server hands out session tokens
+like the other hosts, but a match that drops is over: it doesn't resume.
+
+Functions:
+connect() -- connect as a client and learn the role and the opponent
+serve() -- accept player1 clients one after the other
+
+Classes:
+HeadlessPlayer -- plays the matches of one username
+"""
+
+import argparse
+import random
+import socket
+import sys
+from typing import Optional, TextIO, Tuple
+from coordinate import parse_coordinate
+from gameboard import BoardClass
+from mcts import MOVE_BUDGET, get_search
+from strategies import STRATEGIES, Strategy, get_strategy
+from sessions import SessionCache
+import protocol
+
+
+class HeadlessPlayer:
+    '''A class to play matches without a window.
+
+    Attributes:
+        name(str): The username of the player.
+        strategy: The strategy that picks the moves, None to read them from stdin.
+        rng(Random): The random generator of the strategy.
+        num_of_games(int): The number of games player1 plays in a match, 0 to ask on stdin.
+        size(int): The number of rows (and columns) of the gameboard.
+        win_length(int): The number of chess in a row needed to win.
+        quiet(bool): Whether to print only the stats of every match.
+    '''
+    def __init__(self, name: str, strategy: Optional[Strategy] = None, rng: Optional[random.Random] = None,
+                 num_of_games: int = 0, size: int = 3, win_length: int = 3, quiet: bool = False,
+                 input_file: TextIO = sys.stdin) -> None:
+        '''Make a player.
+
+        Args:
+            name: The username of the player.
+            strategy: The strategy that picks the moves, None to read them from stdin.
+            rng: The random generator of the strategy.
+            num_of_games: The number of games player1 plays in a match, 0 to ask on stdin.
+            size: The number of rows (and columns) of the gameboard.
+            win_length: The number of chess in a row needed to win.
+            quiet: Whether to print only the stats of every match.
+            input_file: The stream the moves and answers are read from.
+        '''
+        self.name = name
+        self.strategy = strategy
+        self.rng = rng or random.Random()
+        self.num_of_games = num_of_games
+        self.size = size
+        self.win_length = win_length
+        self.quiet = quiet
+        self.input_file = input_file
+
+
+    def read_line(self, prompt: str) -> str:
+        '''Read one line from the input.
+
+        Args:
+            prompt: The text printed before reading.
+
+        Returns:
+            The line without its end
+
+        Raises:
+            EOFError: if the input is closed
+        '''
+        print(prompt, end='', flush=True)
+        line = self.input_file.readline()
+        if not line:
+            raise EOFError('The input is closed')
+        return line.strip()
+
+
+    def choose_move(self, board: BoardClass) -> Tuple[int, int]:
+        '''Pick the next move with the strategy or read it from the input.
+
+        Args:
+            board: The gameboard.
+
+        Returns:
+            The 1-based coordinates of the move
+        '''
+        if self.strategy is not None:
+            return self.strategy(board, self.rng)
+
+        while True:
+            x, y = parse_coordinate(self.read_line('Your move (x, y): '))
+            if board.isEmptySlot(x, y):
+                return x, y
+            print('The slot must be empty, from 1, 1 to {0}, {0}.'.format(board.size))
+
+
+    def play_again(self, num_of_games: int) -> bool:
+        '''Decide whether player1 plays another game.
+
+        Args:
+            num_of_games: The number of games played in the match so far.
+
+        Returns:
+            True to play again, False otherwise
+        '''
+        if self.num_of_games:
+            return num_of_games < self.num_of_games
+        try:
+            return self.read_line('Do you want to play again? (y/n) ').lower() == 'y'
+        except EOFError:
+            return False
+
+
+    def play_match(self, sock: socket.socket, reader: protocol.FrameReader, role: int, opponent: str) -> BoardClass:
+        '''Play games until player1 doesn't want to play again.
+
+        Args:
+            sock: The connected socket.
+            reader: The reader of the frames of the socket.
+            role: 1 to move first, 2 otherwise.
+            opponent: The username of the opponent.
+
+        Returns:
+            The gameboard with the stats of the match
+
+        Raises:
+            ConnectionError: if the opponent leaves or sends an invalid frame
+        '''
+        player1_name, player2_name = (self.name, opponent) if role == 1 else (opponent, self.name)
+        board = BoardClass(player1_name, player2_name, self.name, backend='bitboard',
+                           size=self.size, win_length=self.win_length)
+        num_of_games = 0
+        while True:
+            turn = 1
+            while True:
+                if turn == role:
+                    x, y = self.choose_move(board)
+                    board.updateGameBoard(self.name, x, y)
+                    sock.sendall(protocol.encode_move(x, y))
+                else:
+                    kind, payload = reader.read_frame()
+                    if kind != protocol.MOVE:
+                        raise ConnectionError('Expected a move from %s' % opponent)
+                    try:
+                        board.updateGameBoard(opponent, *protocol.decode_move(payload))
+                    except ValueError:
+                        raise ConnectionError('%s sent an invalid move' % opponent)
+                if not self.quiet:
+                    board.printBoard()
+
+                if board.isWinner() or board.boardIsFull():
+                    break
+                turn = 3 - turn
+
+            num_of_games += 1
+            if role == 1:
+                again = self.play_again(num_of_games)
+                sock.sendall(protocol.encode_frame(protocol.PLAY_AGAIN if again else protocol.FUN_TIMES))
+            else:
+                kind, payload = reader.read_frame()
+                again = kind == protocol.PLAY_AGAIN
+            if not again:
+                return board
+            board.resetGameBoard()
+
+
+def connect(host: str, port: int, name: str) -> Tuple[socket.socket, protocol.FrameReader, int, str]:
+    '''Connect to a Player2 window, a cli.py server or the game server and send the username.
+
+    Args:
+        host: The host name or ip address.
+        port: The port.
+        name: The username.
+
+    Returns:
+        The socket, its frame reader, the role and the username of the opponent
+
+    Raises:
+        ConnectionError: if the host doesn't send a session token
+    '''
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    reader = protocol.FrameReader(sock)
+    sock.sendall(protocol.encode_hello(name))
+    kind, payload = reader.read_frame()
+    if kind == protocol.START:      # the game server chose the role
+        role, opponent = protocol.decode_start(payload)
+    else:                           # player2 answered with its username
+        role, opponent = 1, payload.decode()
+    if reader.read_frame()[0] != protocol.SESSION:
+        raise ConnectionError('Expected a session token')
+    return sock, reader, role, opponent
+
+
+def serve(player: HeadlessPlayer, host: str, port: int, num_of_matches: int = 0) -> None:
+    '''Accept player1 clients one after the other and play their matches as player2.
+
+    Args:
+        player: The player.
+        host: The host name or ip address to bind.
+        port: The port to bind.
+        num_of_matches: The number of matches before returning, 0 to serve forever.
+    '''
+    sessions = SessionCache()
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_sock:
+        server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_sock.bind((host, port))
+        server_sock.listen(1)
+        played = 0
+        while not num_of_matches or played < num_of_matches:
+            conn_sock, _ = server_sock.accept()
+            with conn_sock:
+                conn_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                reader = protocol.FrameReader(conn_sock)
+                try:
+                    kind, payload = reader.read_frame()
+                    if kind != protocol.HELLO:      # a RESUME of a match that is already over
+                        continue
+                    session = sessions.create(payload.decode())
+                    conn_sock.sendall(protocol.encode_hello(player.name) + protocol.encode_session(session.token))
+                    board = player.play_match(conn_sock, reader, 2, session.name)
+                    sessions.discard(session.token)
+                except ConnectionError as msg:
+                    print('The match ended early: %s' % msg)
+                    continue
+            played += 1
+            board.printStats()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play tic-tac-toe without a window.')
+    parser.add_argument('mode', choices=('client', 'server'))
+    parser.add_argument('host')
+    parser.add_argument('port', type=int)
+    parser.add_argument('username')
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), help='pick the moves with this strategy instead of reading stdin')
+    parser.add_argument('--games', type=int, default=0, help='games player1 plays in a match, 0 to ask on stdin')
+    parser.add_argument('--matches', type=int, default=0, help='matches the server plays, 0 for no limit')
+    parser.add_argument('--size', type=int, default=3)
+    parser.add_argument('--win-length', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=MOVE_BUDGET, help='seconds of search per move of the mcts strategies')
+    parser.add_argument('--workers', type=int, help='processes of the mcts_parallel strategy, one per core by default')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--quiet', action='store_true', help='print only the stats of every match')
+    args = parser.parse_args()
+
+    get_search(args.size, args.win_length).budget = args.budget
+    if args.strategy == 'mcts_parallel':
+        from parallel_search import get_parallel_search
+
+        parallel_search = get_parallel_search(args.size, args.win_length)
+        parallel_search.budget = args.budget
+        parallel_search.workers = args.workers or parallel_search.workers
+    headless = HeadlessPlayer(args.username, get_strategy(args.strategy) if args.strategy else None,
+                              random.Random(args.seed), args.games, args.size, args.win_length, args.quiet)
+    try:
+        if args.mode == 'server':
+            serve(headless, args.host, args.port, args.matches)
+        else:
+            client_sock, client_reader, client_role, client_opponent = connect(args.host, args.port, args.username)
+            with client_sock:
+                headless.play_match(client_sock, client_reader, client_role, client_opponent).printStats()
+    except (ConnectionError, EOFError) as error:
+        print(error)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,252 @@
+"""\
+This module provides an append-only binary log of every move of every game.
+
+The file starts with MAGIC and a version byte. Each game follows as a record:
+    header -- size, win length, outcome, length of player1's name,
+              length of player2's name and the number of moves (GAME_HEADER)
+    names -- the two usernames in utf-8, cut to MAX_NAME_BYTES on a character boundary
+    moves -- the slot index (x * size + y) of every move in order, one byte
+             each, or two bytes each on boards of more than 256 slots
+
+The writer collects whole games in a buffer and appends it to the file in
+bulk. The reader is a generator that holds one game at a time, so millions
+of games can be replayed through BoardClass in constant memory.
+
+Usage:
+    python game_log.py PATH    -- replay and check every game of a log
+
+Functions:
+encode_name() -- encode a username to fit its length byte
+read_games() -- stream the records of a log
+replay() -- play a record through a BoardClass
+
+Classes:
+GameRecord -- one game of the log
+GameLogWriter -- appends games to a log
+"""
+
+import os
+import struct
+import sys
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Tuple
+from gameboard import BoardClass
+
+MAGIC = b'TTTL'
+VERSION = 1
+GAME_HEADER = struct.Struct('!BBBBBH')
+BUFFER_SIZE = 1 << 16   # bytes collected before they are appended to the file
+MAX_NAME_BYTES = 255    # the length of a name is one byte
+
+TIE, PLAYER1_WON, PLAYER2_WON, UNFINISHED = 0, 1, 2, 3     # outcomes of a game
+
+
+class GameRecord(NamedTuple):
+    '''One game of the log.'''
+    player1_name: str
+    player2_name: str
+    size: int
+    win_length: int
+    outcome: int
+    moves: Tuple[int, ...]
+
+
+def encode_name(name: str) -> bytes:
+    '''Encode a username in utf-8, dropping the characters that don't fit in MAX_NAME_BYTES.
+
+    Args:
+        name: The username.
+
+    Returns:
+        The utf-8 bytes, never a part of a character
+    '''
+    encoded = name.encode()
+    if len(encoded) <= MAX_NAME_BYTES:
+        return encoded
+    return encoded[:MAX_NAME_BYTES].decode(errors='ignore').encode()    # the cut character is dropped
+
+
+def board_outcome(board: BoardClass, won: bool) -> int:
+    '''Get the outcome of a finished game.
+
+    Args:
+        board: The gameboard of the game.
+        won: True if the last move won the game, False for a tie.
+
+    Returns:
+        TIE, PLAYER1_WON or PLAYER2_WON
+    '''
+    if not won:
+        return TIE
+    return PLAYER1_WON if board.last_player == board.player1_name else PLAYER2_WON
+
+
+class GameLogWriter:
+    '''A class to append games to a log in bulk.
+
+    Attributes:
+        path(str): The path of the log file.
+        buffer(bytearray): The games not written to the file yet.
+        buffer_size(int): The number of bytes that triggers a write.
+    '''
+    def __init__(self, path: str, buffer_size: int = BUFFER_SIZE) -> None:
+        '''Open a log for appending, it is created if it doesn't exist.
+
+        Args:
+            path: The path of the log file.
+            buffer_size: The number of bytes that triggers a write.
+        '''
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        self.log_file = open(path, 'ab')
+        if self.log_file.tell() == 0:
+            self.buffer += MAGIC + bytes((VERSION,))
+
+
+    def write_game(self, board: BoardClass, outcome: int) -> None:
+        '''Add a game, the moves are read from the move history of the gameboard.
+
+        Args:
+            board: The gameboard of the game.
+            outcome: TIE, PLAYER1_WON, PLAYER2_WON or UNFINISHED.
+        '''
+        player1_name = encode_name(board.player1_name)
+        player2_name = encode_name(board.player2_name)
+        self.buffer += GAME_HEADER.pack(board.size, board.win_length, outcome,
+                                        len(player1_name), len(player2_name), len(board.move_history))
+        self.buffer += player1_name + player2_name
+        if board.size * board.size <= 256:
+            self.buffer += bytes(board.move_history)
+        else:
+            self.buffer += struct.pack('!%dH' % len(board.move_history), *board.move_history)
+
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+
+    def flush(self) -> None:
+        '''Append the buffered games to the file.
+        '''
+        if self.buffer:
+            self.log_file.write(self.buffer)
+            self.log_file.flush()
+            self.buffer.clear()
+
+
+    def close(self) -> None:
+        '''Flush the buffered games and close the file.
+        '''
+        self.flush()
+        self.log_file.close()
+
+
+    def __enter__(self) -> 'GameLogWriter':
+        return self
+
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def read_exactly(log_file: BinaryIO, size: int) -> bytes:
+    '''Read a number of bytes.
+
+    Args:
+        log_file: The open log file.
+        size: The number of bytes.
+
+    Returns:
+        The bytes
+
+    Raises:
+        ValueError: if the file ends before
+    '''
+    data = log_file.read(size)
+    if len(data) != size:
+        raise ValueError('The log ends in the middle of a game')
+    return data
+
+
+def read_games(path: str) -> Iterator[GameRecord]:
+    '''Stream the games of a log one at a time.
+
+    Args:
+        path: The path of the log file.
+
+    Yields:
+        The record of each game in the order they were written
+
+    Raises:
+        ValueError: if the file is not a log of this version or is cut in the middle of a game
+    '''
+    with open(path, 'rb') as log_file:
+        if log_file.read(len(MAGIC) + 1) != MAGIC + bytes((VERSION,)):
+            raise ValueError('%s is not a version %d game log' % (path, VERSION))
+
+        while True:
+            header = log_file.read(GAME_HEADER.size)
+            if not header:
+                return
+            if len(header) != GAME_HEADER.size:
+                raise ValueError('The log ends in the middle of a game')
+
+            size, win_length, outcome, player1_length, player2_length, num_of_moves = GAME_HEADER.unpack(header)
+            names = read_exactly(log_file, player1_length + player2_length)
+            if size * size <= 256:
+                moves = tuple(read_exactly(log_file, num_of_moves))
+            else:
+                moves = struct.unpack('!%dH' % num_of_moves, read_exactly(log_file, 2 * num_of_moves))
+            yield GameRecord(names[:player1_length].decode(), names[player1_length:].decode(),
+                             size, win_length, outcome, moves)
+
+
+def replay(record: GameRecord, board: Optional[BoardClass] = None) -> Iterator[BoardClass]:
+    '''Play the moves of a game through a BoardClass.
+
+    Args:
+        record: The game to replay.
+        board: A gameboard of the same shape to reuse, None to make one.
+
+    Yields:
+        The gameboard after each move
+
+    Raises:
+        ValueError: if a move is invalid or the result differs from the recorded outcome
+    '''
+    if board is None:
+        board = BoardClass(record.player1_name, record.player2_name, record.player1_name, backend='bitboard',
+                           size=record.size, win_length=record.win_length)
+    board.resetGameBoard()
+
+    outcome = UNFINISHED
+    names = (record.player1_name, record.player2_name)
+    for turn, index in enumerate(record.moves):
+        if outcome != UNFINISHED:
+            raise ValueError('A move was recorded after the end of the game')
+        x, y = divmod(index, record.size)
+        board.updateGameBoard(names[turn % 2], x + 1, y + 1)
+        yield board
+        if board.isWinner():
+            outcome = PLAYER1_WON if turn % 2 == 0 else PLAYER2_WON
+        elif board.boardIsFull():
+            outcome = TIE
+
+    if outcome != record.outcome:
+        raise ValueError('The moves end in outcome %d but %d was recorded' % (outcome, record.outcome))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or not os.path.exists(sys.argv[1]):
+        print('Usage: python game_log.py PATH')
+        sys.exit(1)
+
+    tallies = [0, 0, 0, 0]
+    num_of_moves = 0
+    for game in read_games(sys.argv[1]):
+        for _ in replay(game):
+            num_of_moves += 1
+        tallies[game.outcome] += 1
+    print('The number of games is {}.'.format(sum(tallies)))
+    print('The number of moves is {}.'.format(num_of_moves))
+    print('Player1 won {}, player2 won {}, {} ties and {} unfinished.'.format(
+        tallies[PLAYER1_WON], tallies[PLAYER2_WON], tallies[TIE], tallies[UNFINISHED]))
@@ -0,0 +1,498 @@
+"""\
+This module provides a headless game server built on asyncio.
+
+All the matches run on one event loop without threads or polling. Every
+client sends its username and waits in the lobby, which pairs players of
+close ratings and widens the range the longer they wait. Each pair is then
+told its role and its opponent and played in a session of its own. The
+server keeps a BoardClass for each match to check the moves and relays them
+to the opponent and to the spectators of the match.
+
+Every player gets a session token when its match starts. The session is
+pinned while the player is connected, and a player whose connection drops
+has the TTL of the session from the drop to reconnect with RESUME, the
+match waits for it meanwhile. It then gets one SNAPSHOT with the board,
+the move stack and its stats, and the match goes on where it was.
+
+Messages are frames of the protocol module:
+    client -> server: HELLO with the username, closed if the username is already connected
+    server -> client: START with the role and the opponent, player1 moves first, then SESSION with the token
+    both ways: MOVE
+    player1 -> server -> player2: PLAY_AGAIN or FUN_TIMES once a game is over
+    client -> server: RESUME with the token after a drop, answered with a SNAPSHOT
+    spectator -> server: WATCH with the username of a player
+    server -> spectator: SNAPSHOT of the game, then the MOVE, PLAY_AGAIN and FUN_TIMES of the match
+
+Classes:
+Connection -- one client of the server
+GameServer -- pairs the clients and runs their matches
+"""
+
+import asyncio
+import sys
+from typing import TYPE_CHECKING, Dict, Optional, Set
+from gameboard import BoardClass
+from lobby import Lobby
+from sessions import SessionCache
+from spectators import Audience
+from game_log import GameLogWriter, board_outcome
+import metrics
+import protocol
+
+if TYPE_CHECKING:       # sqlite3 is only loaded when a stats store is used
+    from stats_store import StatsStore
+
+DEFAULT_RATING = 1000       # rating of a user without stats
+RATING_PER_WIN = 10         # rating gained for each win more than losses
+MATCH_INTERVAL = 0.5        # seconds between two rounds of pairing the longest waiting players
+
+
+class Connection:
+    '''A class to hold the streams of a client.
+
+    Attributes:
+        name(str): The username of the client.
+        reader: The stream to read from the client.
+        writer: The stream to write to the client.
+        finished: The future that is done when the match of the client ends.
+        token(bytes): The session token of the client once its match starts.
+        board(BoardClass): The gameboard of the match of the client.
+        resumed: The future that is done when the client reconnects, None unless the match waits for it.
+    '''
+    def __init__(self, name: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''Make a connection.
+
+        Args:
+            name: The username of the client.
+            reader: The stream to read from the client.
+            writer: The stream to write to the client.
+        '''
+        self.name = name
+        self.reader = reader
+        self.writer = writer
+        self.finished = asyncio.get_running_loop().create_future()
+        self.token = b''
+        self.board: Optional[BoardClass] = None
+        self.resumed: Optional[asyncio.Future] = None
+
+
+    def snapshot(self) -> bytes:
+        '''Build the SNAPSHOT of the match for the client.
+
+        Returns:
+            The frame with the moves so far and the stats of the client
+        '''
+        board = self.board
+        stats = (board.num_of_wins, board.num_of_losses, board.num_of_ties)     # counted for player1
+        if self.name != board.player1_name:
+            stats = (board.num_of_losses, board.num_of_wins, board.num_of_ties)
+        return protocol.encode_snapshot(board.size, board.win_length, board.move_history, stats)
+
+
+class GameServer:
+    '''A class to host many matches on one event loop.
+
+    Attributes:
+        size(int): The number of rows (and columns) of the gameboards.
+        win_length(int): The number of chess in a row needed to win.
+        lobby(Lobby): The clients waiting for an opponent.
+        audiences(dict): The spectators of the running matches, by the username of both players.
+        sessions(SessionCache): The seats of the running matches, by token.
+        num_of_matches(int): The number of matches that have started.
+        num_of_games(int): The number of games that have finished.
+        num_of_moves(int): The number of moves that have been relayed.
+        stats_store(StatsStore): The store that keeps the results of all the games, None to keep nothing.
+        game_log(GameLogWriter): The log that keeps the moves of all the games, None to keep nothing.
+        win_margins(dict): The wins minus losses of every user seen, so the stats store is read once per user.
+        online(dict): The clients in the lobby or in a match by username, a username is connected once at most.
+    '''
+    def __init__(self, size: int = 3, win_length: int = 3, stats_store: Optional['StatsStore'] = None,
+                 game_log: Optional[GameLogWriter] = None) -> None:
+        '''Make a server.
+
+        Args:
+            size: The number of rows (and columns) of the gameboards.
+            win_length: The number of chess in a row needed to win.
+            stats_store: The store that keeps the results of all the games, None to keep nothing.
+            game_log: The log that keeps the moves of all the games, None to keep nothing.
+        '''
+        self.size = size
+        self.win_length = win_length
+        self.lobby = Lobby()
+        self.match_tasks: Set[asyncio.Task] = set()
+        self.audiences: Dict[str, Audience] = {}
+        self.sessions = SessionCache()
+        self.num_of_matches = 0
+        self.num_of_games = 0
+        self.num_of_moves = 0
+        self.stats_store = stats_store
+        self.game_log = game_log
+        self.win_margins: Dict[str, int] = {}
+        self.online: Dict[str, Connection] = {}
+        self.server = None
+        self.matcher = None
+
+
+    async def start(self, host: str, port: int) -> int:
+        '''Start listening for clients.
+
+        Args:
+            host: The host name or ip address to bind.
+            port: The port to bind, 0 to pick a free one.
+
+        Returns:
+            The port the server listens on
+        '''
+        self.server = await asyncio.start_server(self.handle_client, host, port, backlog=4096)
+        self.matcher = asyncio.create_task(self.match_waiting())
+        return self.server.sockets[0].getsockname()[1]
+
+
+    async def close(self) -> None:
+        '''Stop listening and wait for the server to close.
+        '''
+        self.matcher.cancel()
+        self.server.close()
+        await self.server.wait_closed()
+
+
+    def rating(self, name: str) -> int:
+        '''Get the rating of a user, the stats store is only queried the first time the user is seen.
+
+        Args:
+            name: The username.
+
+        Returns:
+            The rating, DEFAULT_RATING without a stats store
+        '''
+        if self.stats_store is None:
+            return DEFAULT_RATING
+        if name not in self.win_margins:
+            wins, losses, _ = self.stats_store.user_stats(name)
+            self.win_margins[name] = wins - losses
+        return max(0, DEFAULT_RATING + RATING_PER_WIN * self.win_margins[name])
+
+
+    def record_result(self, player1: Connection, player2: Connection, winner: Optional[str]) -> None:
+        '''Queue the result of a game in the stats store and update the ratings in memory.
+
+        Args:
+            player1: The client that moves first.
+            player2: The other client.
+            winner: The username of the winner, None for a tie.
+        '''
+        self.stats_store.record_game(player1.name, player2.name, winner)
+        if winner is None:
+            return
+        for conn in (player1, player2):
+            if conn.name in self.win_margins:     # read in the lobby, the store may not have the result yet
+                self.win_margins[conn.name] += 1 if conn.name == winner else -1
+
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''Receive the username of a new client and put it in the lobby, or let a spectator watch.
+
+        Args:
+            reader: The stream to read from the client.
+            writer: The stream to write to the client.
+        '''
+        conn = None
+        try:
+            kind, payload = await protocol.read_frame_async(reader)
+            if kind == protocol.WATCH:
+                await self.watch(payload.decode(), reader, writer)
+                return
+            if kind == protocol.RESUME:
+                await self.resume(payload, reader, writer)
+                return
+            if kind != protocol.HELLO or not payload:
+                return
+            name = payload.decode()
+            old = self.online.get(name)
+            if old is not None:     # the boards and the audiences are keyed by username
+                if not (old.reader.at_eof() and self.lobby.cancel(old)):
+                    return
+                old.finished.set_result(None)       # it left while it was waiting
+
+            conn = Connection(name, reader, writer)
+            self.online[name] = conn
+            pair = self.lobby.enqueue(conn, self.rating(conn.name))
+            if pair is not None:
+                self.start_session(*pair)
+            await conn.finished      # the session of the match closes the client
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if conn is not None:
+                self.lobby.cancel(conn)
+                if self.online.get(conn.name) is conn:
+                    del self.online[conn.name]
+            writer.close()
+
+
+    async def watch(self, name: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''Add a spectator to the match of a player until the spectator leaves.
+
+        Args:
+            name: The username of the player to watch.
+            reader: The stream to read from the spectator.
+            writer: The stream to write to the spectator.
+        '''
+        audience = self.audiences.get(name)
+        if audience is None:
+            return
+        audience.add(writer)
+        try:
+            while await reader.read(protocol.RECV_SIZE):      # nothing is expected until the spectator leaves
+                pass
+        finally:
+            audience.discard(writer)
+
+
+    async def resume(self, token: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''Give a reconnecting client its seat back and send it the snapshot of its match.
+
+        Args:
+            token: The session token sent by the client.
+            reader: The new stream to read from the client.
+            writer: The new stream to write to the client.
+        '''
+        session = self.sessions.get(token)
+        if session is None:
+            return
+
+        conn = session.value
+        conn.writer.close()         # the match reads from the old stream until it ends
+        conn.reader, conn.writer = reader, writer
+        writer.write(conn.snapshot())
+        if conn.resumed is not None and not conn.resumed.done():
+            conn.resumed.set_result(None)
+        await conn.finished
+
+
+    async def wait_resume(self, conn: Connection) -> bool:
+        '''Wait for a dropped client to reconnect.
+
+        Args:
+            conn: The client.
+
+        Returns:
+            True if it reconnected within the TTL of the sessions, False otherwise
+        '''
+        session = self.sessions.unpin(conn.token)      # the TTL starts at the drop
+        if session is None:
+            return False
+        conn.resumed = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(conn.resumed, session.expires_at - self.sessions.clock())
+            self.sessions.pin(conn.token)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            conn.resumed = None
+
+
+    async def receive(self, conn: Connection) -> protocol.Frame:
+        '''Read one frame from a client, waiting for it to reconnect if it drops.
+
+        Args:
+            conn: The client.
+
+        Returns:
+            The message type and the payload
+
+        Raises:
+            asyncio.IncompleteReadError: if the client is gone and didn't reconnect
+        '''
+        while True:
+            reader = conn.reader
+            try:
+                frame = await protocol.read_frame_async(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if conn.reader is reader and not await self.wait_resume(conn):
+                    raise
+                continue            # the client is back on a new stream
+            return frame
+
+
+    async def send(self, conn: Connection, frame: bytes) -> None:
+        '''Write one frame to a client, a dropped client gets it in the snapshot once it reconnects.
+
+        Args:
+            conn: The client.
+            frame: The frame.
+        '''
+        conn.writer.write(frame)
+        try:
+            await conn.writer.drain()
+        except ConnectionError:
+            pass
+
+
+    async def match_waiting(self) -> None:
+        '''Pair the longest waiting clients as their range widens, until the server closes.
+        '''
+        while True:
+            await asyncio.sleep(MATCH_INTERVAL)
+            for player1, player2 in self.lobby.match_waiting():
+                self.start_session(player1, player2)
+
+
+    def start_session(self, player1: Connection, player2: Connection) -> None:
+        '''Run the match of a pair in a task of its own.
+
+        A client that left while it was waiting is dropped and its opponent goes back to the lobby.
+
+        Args:
+            player1: The client that moves first.
+            player2: The other client.
+        '''
+        gone = [conn for conn in (player1, player2) if conn.reader.at_eof() or conn.writer.is_closing()]
+        if gone:
+            for conn in (player1, player2):
+                if conn in gone:
+                    conn.finished.set_result(None)
+                else:
+                    pair = self.lobby.enqueue(conn, self.rating(conn.name))
+                    if pair is not None:
+                        self.start_session(*pair)
+            return
+
+        session = asyncio.create_task(self.run_session(player1, player2))
+        self.match_tasks.add(session)
+        session.add_done_callback(self.match_tasks.discard)
+
+
+    async def run_session(self, player1: Connection, player2: Connection) -> None:
+        '''Run the match of a pair and close both clients.
+
+        Args:
+            player1: The client that moves first.
+            player2: The other client.
+        '''
+        try:
+            await self.run_match(player1, player2)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for conn in (player1, player2):
+                conn.writer.close()
+                if not conn.finished.done():
+                    conn.finished.set_result(None)
+
+
+    async def run_match(self, player1: Connection, player2: Connection) -> None:
+        '''Relay the moves of two clients until player1 doesn't want to play again.
+
+        Args:
+            player1: The client that moves first.
+            player2: The other client.
+        '''
+        self.num_of_matches += 1
+        player1.writer.write(protocol.encode_start(1, player2.name))
+        player2.writer.write(protocol.encode_start(2, player1.name))
+        board = BoardClass(player1.name, player2.name, player1.name, size=self.size, win_length=self.win_length)
+        for conn in (player1, player2):
+            conn.board = board
+            conn.token = self.sessions.create(conn.name, conn, pinned=True).token
+            conn.writer.write(protocol.encode_session(conn.token))
+        audience = Audience(board)
+        self.audiences[player1.name] = self.audiences[player2.name] = audience
+        try:
+            await self.play_games(player1, player2, board, audience)
+        finally:
+            for conn in (player1, player2):
+                self.sessions.discard(conn.token)
+                if self.audiences.get(conn.name) is audience:
+                    del self.audiences[conn.name]
+            audience.close()
+
+
+    async def play_games(self, player1: Connection, player2: Connection, board: BoardClass,
+                         audience: Audience) -> None:
+        '''Play the games of a match.
+
+        Args:
+            player1: The client that moves first.
+            player2: The other client.
+            board: The gameboard of the match.
+            audience: The spectators of the match.
+        '''
+        while True:
+            current, other = player1, player2
+            while True:
+                kind, payload = await self.receive(current)
+                x, y = protocol.decode_move(payload) if kind == protocol.MOVE else (-1, -1)
+                started = metrics.now()
+                try:
+                    board.updateGameBoard(current.name, x, y)
+                except ValueError:      # the client sent an invalid move
+                    return
+                metrics.BOARD_UPDATE.observe_since(started)
+
+                self.num_of_moves += 1
+                metrics.MOVES.inc()
+                frame = protocol.encode_move(x, y)    # serialized once for the opponent and every spectator
+                audience.publish(frame)
+                await self.send(other, frame)
+
+                started = metrics.now()
+                won = board.isWinner()
+                game_over = won or board.boardIsFull()
+                metrics.WIN_CHECK.observe_since(started)
+                if game_over:
+                    break
+                current, other = other, current
+
+            self.num_of_games += 1
+            metrics.GAMES.inc()
+            if self.stats_store is not None:
+                self.record_result(player1, player2, board.last_player if won else None)
+            if self.game_log is not None:
+                self.game_log.write_game(board, board_outcome(board, won))
+            kind, payload = await self.receive(player1)
+            frame = protocol.encode_frame(kind)
+            audience.publish(frame)
+            await self.send(player2, frame)
+            if kind != protocol.PLAY_AGAIN:
+                return
+            board.resetGameBoard()
+
+
+async def serve(host: str, port: int, stats_store: Optional['StatsStore'] = None,
+                game_log: Optional[GameLogWriter] = None) -> None:
+    '''Run a server until it is interrupted.
+
+    Args:
+        host: The host name or ip address to bind.
+        port: The port to bind.
+        stats_store: The store that keeps the results of all the games, None to keep nothing.
+        game_log: The log that keeps the moves of all the games, None to keep nothing.
+    '''
+    server = GameServer(stats_store=stats_store, game_log=game_log)
+    port = await server.start(host, port)
+    print('Serving on {}:{}.'.format(host, port))
+    async with server.server:
+        await server.server.serve_forever()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4, 5):
+        print('Usage: python game_server.py HOST PORT [STATS_DB [GAME_LOG]]')
+        sys.exit(1)
+
+    from stats_store import StatsStore
+
+    metrics.enable_from_env()
+    store = StatsStore(sys.argv[3]) if len(sys.argv) >= 4 else None
+    log = GameLogWriter(sys.argv[4]) if len(sys.argv) == 5 else None
+    try:
+        asyncio.run(serve(sys.argv[1], int(sys.argv[2]), store, log))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+        if log is not None:
+            log.close()
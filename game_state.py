@@ -0,0 +1,213 @@
+"""\
+This module provides a compact game state for searches that keep many boards.
+
+A GameState holds no __dict__: the slots live in one bytearray of size * size
+bytes and the moves in a stack, so a search can make and undo moves on one
+object in place instead of copying boards. It also offers the same engine
+methods as BitBoard, so BoardClass can keep one in step with its gameboard
+(the 'compact' backend). That backend is for code that wants the GameState
+of a BoardClass: BoardClass still keeps its list of lists, so it saves no
+memory there and detects wins slower than the 'list' and 'bitboard' backends.
+
+Classes:
+GameState -- slots in a bytearray with a move stack
+"""
+
+from typing import List
+from bitboard import DIRECTIONS
+
+EMPTY, X, O = 0, 1, 2       # values of the slots
+CHESS_CODES = {'x': X, 'o': O}
+
+
+class GameState:
+    '''A class to store the slots of a game in a bytearray.
+
+    Attributes:
+        size(int): The number of rows (and columns) of the board.
+        win_length(int): The number of chess in a row needed to win.
+        cells(bytearray): The value of each slot, EMPTY, X or O, at index x * size + y.
+        moves(list): The stack of the slot indices played so far.
+    '''
+    __slots__ = ('size', 'win_length', 'cells', 'moves')
+
+    def __init__(self, size: int = 3, win_length: int = 3) -> None:
+        '''Make an empty game state.
+
+        Args:
+            size: The number of rows (and columns) of the board.
+            win_length: The number of chess in a row needed to win.
+        '''
+        self.size = size
+        self.win_length = win_length
+        self.cells = bytearray(size * size)
+        self.moves: List[int] = []
+
+
+    def copy(self) -> 'GameState':
+        '''Make an independent copy of the state.
+
+        Returns:
+            The copy
+        '''
+        state = GameState.__new__(GameState)
+        state.size = self.size
+        state.win_length = self.win_length
+        state.cells = bytearray(self.cells)
+        state.moves = self.moves[:]
+        return state
+
+
+    def to_move(self) -> int:
+        '''Get the player to move, X always moves first.
+
+        Returns:
+            X or O
+        '''
+        return O if len(self.moves) & 1 else X
+
+
+    def make_move(self, index: int) -> None:
+        '''Put the chess of the player to move on a slot.
+
+        Args:
+            index: The index of the slot, which is x * size + y.
+
+        Raises:
+            ValueError: if the slot is taken
+        '''
+        if self.cells[index] != EMPTY:
+            raise ValueError('The slot %d is taken' % index)
+        self.cells[index] = O if len(self.moves) & 1 else X
+        self.moves.append(index)
+
+
+    def undo_move(self) -> int:
+        '''Take back the last move.
+
+        Returns:
+            The index of the slot that is empty again
+
+        Raises:
+            IndexError: if no move has been made
+        '''
+        index = self.moves.pop()
+        self.cells[index] = EMPTY
+        return index
+
+
+    def legal_moves(self) -> List[int]:
+        '''List the empty slots.
+
+        Returns:
+            A list of slot indices
+        '''
+        return [index for index, value in enumerate(self.cells) if value == EMPTY]
+
+
+    def is_line(self, index: int) -> bool:
+        '''Walk out from a slot in four directions to find a line of win_length equal chess.
+
+        Args:
+            index: The index of the slot, which is x * size + y.
+
+        Returns:
+            True if the chess on the slot is part of a line, False otherwise
+        '''
+        value = self.cells[index]
+        if value == EMPTY:
+            return False
+
+        size = self.size
+        last_x, last_y = divmod(index, size)
+        for dx, dy in DIRECTIONS:
+            count = 1
+            for sign in (1, -1):
+                x = last_x + sign * dx
+                y = last_y + sign * dy
+                while count < self.win_length and 0 <= x < size and 0 <= y < size and self.cells[x * size + y] == value:
+                    count += 1
+                    x += sign * dx
+                    y += sign * dy
+            if count >= self.win_length:
+                return True
+        return False
+
+
+    def is_over(self) -> bool:
+        '''Justify whether the last move won the game or filled the board.
+
+        Returns:
+            True when the game is over, False otherwise
+        '''
+        if not self.moves:
+            return False
+        return self.is_line(self.moves[-1]) or len(self.moves) == len(self.cells)
+
+
+    # The methods below are the engine interface shared with BitBoard, used by BoardClass.
+
+    def clear(self) -> None:
+        '''Clear all the chess and the move stack.
+        '''
+        self.cells[:] = bytes(len(self.cells))
+        self.moves.clear()
+
+
+    def is_empty(self, index: int) -> bool:
+        '''Justify whether the slot is empty.
+
+        Args:
+            index: The index of the slot, which is x * size + y.
+
+        Returns:
+            True if it's empty, False otherwise
+        '''
+        return self.cells[index] == EMPTY
+
+
+    def place(self, index: int, chess: str) -> None:
+        '''Put a chess on the slot and push it on the move stack.
+
+        Args:
+            index: The index of the slot, which is x * size + y.
+            chess: 'x' for player1, 'o' for player2.
+        '''
+        self.cells[index] = CHESS_CODES[chess]
+        self.moves.append(index)
+
+
+    def remove(self, index: int) -> None:
+        '''Take back the chess on the slot, which must be the last move.
+
+        Args:
+            index: The index of the slot, which is x * size + y.
+
+        Raises:
+            ValueError: if the slot is not the last move
+        '''
+        if not self.moves or self.moves[-1] != index:
+            raise ValueError('Only the last move can be taken back')
+        self.undo_move()
+
+
+    def is_win(self, chess: str, index: int) -> bool:
+        '''Justify whether the chess on the slot completes a line.
+
+        Args:
+            chess: 'x' for player1, 'o' for player2.
+            index: The index of the last slot, which is x * size + y.
+
+        Returns:
+            True if there is a line through the slot, False otherwise
+        '''
+        return self.cells[index] == CHESS_CODES[chess] and self.is_line(index)
+
+
+    def is_full(self) -> bool:
+        '''Justify whether there is no empty slot left.
+
+        Returns:
+            True when all the slots are taken, False otherwise
+        '''
+        return len(self.moves) == len(self.cells)
@@ -1,9 +1,47 @@
-import tkinter as tk
-from tkinter import messagebox
+from concurrent.futures import Future
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
 from gameboard import BoardClass
+import metrics
+
+if TYPE_CHECKING:       # tkinter is loaded by create_widget, so headless imports of this module never load it
+    import tkinter as tk
 
 
 FONT = ('Ariel', 32)            # Typeface and size of chess.
+RENDERERS = ('buttons', 'canvas')   # one Button per slot, or the whole board on one Canvas
+BOARD_PIXELS = 480              # Width and height of the canvas board at most.
+MAX_CELL_PIXELS = 80            # Width and height of a canvas slot at most.
+HINT_COLOR = 'pale green'       # Background of the slots of a hint.
+POLL_INTERVAL = 20              # Milliseconds between two polls of the main loop for changes.
+HUMAN = 'human'                 # Strategy argument of a player that clicks its moves.
+MAX_WIN_LENGTH = 5              # Default win length of the boards larger than 5x5.
+
+
+def player_options(args: List[str]) -> Tuple[Optional[str], int, int, str]:
+    """Read the options of a player from the command line.
+
+    Both players must be started with the same size and win length.
+
+    Args:
+        args: The arguments after the script name, [STRATEGY|human [SIZE [WIN_LENGTH [RENDERER]]]].
+
+    Returns:
+        The name of the strategy (None for human), the size, the win length
+        (the size up to MAX_WIN_LENGTH by default) and the renderer (buttons
+        for 3x3 and canvas otherwise by default)
+
+    Raises:
+        ValueError: if a number or the renderer is invalid
+    """
+    strategy = args[0] if args and args[0] != HUMAN else None
+    size = int(args[1]) if len(args) > 1 else 3
+    win_length = int(args[2]) if len(args) > 2 else min(size, MAX_WIN_LENGTH)
+    renderer = args[3] if len(args) > 3 else ('buttons' if size == 3 else 'canvas')
+    if renderer not in RENDERERS:
+        raise ValueError('Unknown renderer %s, choose from %s' % (renderer, ', '.join(RENDERERS)))
+    return strategy, size, win_length, renderer
+
 
 # game window
 
@@ -15,18 +53,60 @@ class GameWindow:
         board(list): The gameboard of the game.
         slot_stat(list of integers): The state of gameboard slots.
         on_move: On move callback function.
-        is_enable_set(bool): The boolean flag that allows player to put a chess."""
-    def __init__(self, chess: str) -> None:
-        """Create a gamewindow"""
+        is_enable_set(bool): The boolean flag that allows player to put a chess.
+        size(int): The number of rows (and columns) of the gameboard.
+        renderer(str): 'buttons' for one Button per slot, 'canvas' to draw the board on one Canvas.
+        cells(list): The chess each slot should show, '' for none.
+        shown_cells(list): The chess each slot shows.
+        dirty_cells(set): The slots whose chess changed since the last render.
+        texts(dict): The text each label should show, by the name of the label.
+        shown_texts(dict): The text each label shows.
+        render_pending(bool): Whether the state changed since the last render.
+        main_calls(list): The functions queued to run on the Tk main loop, with the future of their result.
+        main_loop_done(bool): Whether the Tk main loop has stopped.
+        gameboard(BoardClass): The gameboard hints are computed from, set by the player.
+        hint_cells(set): The slots of the hint that should show, empty for none.
+        shown_hint_cells(set): The slots of the hint that show.
+
+    The methods that change the window may be called from any thread. They
+    only record the new state under render_lock and never call Tk. The main
+    loop polls every POLL_INTERVAL milliseconds, renders the changes in one
+    batch, which configures the widgets whose state differs from what they
+    show, and runs the functions other threads queued with call_main."""
+    def __init__(self, chess: str, size: int = 3, renderer: str = 'buttons') -> None:
+        """Create a gamewindow
+
+        Raises:
+            ValueError: if the renderer is unknown
+        """
+        if renderer not in RENDERERS:
+            raise ValueError('Unknown renderer %s, choose from %s' % (renderer, ', '.join(RENDERERS)))
         self.chess = chess                  # character of chess
-        self.board = [[],[],[]]             # chessboard with grid buttons
-        self.slot_stat = [0, 0, 0, 0, 0, 0, 0, 0, 0]        # situation of grids on gameboard. 0 stands for no chess and 1 stands for chess.
+        self.size = size                    # number of rows and columns
+        self.renderer = renderer
+        self.board = [[] for _ in range(size)]              # chessboard with grid buttons
+        self.slot_stat = [0] * (size * size)        # situation of grids on gameboard. 0 stands for no chess and 1 stands for chess.
         self.on_move = None                 # on_move function which is called after a chess is called.
         self.is_enable_set = False          # whether the grid allows player to put a chess，True stands for yes，False stands for no.
+        self.window = None                  # root window, made by create_widget
+        self.cells = [''] * (size * size)
+        self.shown_cells = [''] * (size * size)
+        self.dirty_cells = set()
+        self.texts = {}
+        self.shown_texts = {}
+        self.render_pending = False
+        self.main_calls = []
+        self.main_loop_done = False
+        self.render_lock = Lock()           # guards the state above, shared by the socket thread and the main loop
+        self.gameboard = None
+        self.hint_cells = set()
+        self.shown_hint_cells = set()
 
 
     def create_widget(self) -> None:        # create widgets in window
         """create a widget"""
+        import tkinter as tk
+
         self.window = tk.Tk()               # root window
         self.window.resizable(False, False)
         self.window.title("Tic Tac Toe")
@@ -56,54 +136,69 @@ class GameWindow:
         result_area.pack_propagate(False)
         self.create_result_area(result_area)
 
+        tk.Button(right_frame, text="Hint", command=self.on_hint).pack(pady=5)
+
         self.window.geometry('+%d+%d' % ((self.window.winfo_screenwidth()-300)/2, (self.window.winfo_screenheight()-400)/2))
+        self.window.after(POLL_INTERVAL, self.poll)
 
 
-    def create_board_area(self, area: tk.Frame) -> None:
+    def create_board_area(self, area: 'tk.Frame') -> None:
         """create a board area for game"""
-        button = tk.Button(area, text="", width=3, font=FONT, command=lambda: self.on_set(0, 0))
-        button.grid(row=0, column=0)
-        self.board[0].append(button)
+        import tkinter as tk
 
-        button = tk.Button(area, text="", width=3, font=FONT, command=lambda: self.on_set(0, 1))
-        button.grid(row=0, column=1)
-        self.board[0].append(button)
+        if self.renderer == 'canvas':
+            self.create_board_canvas(area)
+            return
 
-        button = tk.Button(area, text="", width=3, font=FONT, command=lambda: self.on_set(0, 2))
-        button.grid(row=0, column=2)
-        self.board[0].append(button)
+        for row in range(self.size):
+            for col in range(self.size):
+                button = tk.Button(area, text="", width=3, font=FONT, command=lambda x=row, y=col: self.on_set(x, y))
+                button.grid(row=row, column=col)
+                self.cell_color = button.cget('bg')
+                self.board[row].append(button)
 
-        button = tk.Button(area, text="", width=3, font=FONT, command=lambda: self.on_set(1, 0))
-        button.grid(row=1, column=0)
-        self.board[1].append(button)
 
-        button = tk.Button(area, text="", width=3, font=FONT, command=lambda: self.on_set(1, 1))
-        button.grid(row=1, column=1)
-        self.board[1].append(button)
+    def create_board_canvas(self, area: 'tk.Frame') -> None:
+        """Create a board drawn on one canvas, a text item is only added to a slot once it shows a chess.
 
-        button = tk.Button(area, text="", width=3, font=FONT, command=lambda: self.on_set(1, 2))
-        button.grid(row=1, column=2)
-        self.board[1].append(button)
+        Args:
+            area: The area of the board.
+        """
+        import tkinter as tk
+
+        self.cell_pixels = max(1, min(MAX_CELL_PIXELS, BOARD_PIXELS // self.size))
+        self.cell_font = (FONT[0], -max(1, self.cell_pixels * 3 // 5))     # negative sizes are in pixels
+        self.cell_items = {}                # canvas text item of each slot that has shown a chess
+        self.hint_items = {}                # canvas rectangle of each slot that shows a hint
+        pixels = self.cell_pixels * self.size
+        self.canvas = tk.Canvas(area, width=pixels, height=pixels, bg='white', highlightthickness=0)
+        self.canvas.pack()
+        for line in range(1, self.size):
+            offset = line * self.cell_pixels
+            self.canvas.create_line(0, offset, pixels, offset)
+            self.canvas.create_line(offset, 0, offset, pixels)
+        self.canvas.bind('<Button-1>', self.on_canvas_click)
 
-        button = tk.Button(area, text="", width=3, font=FONT, command=lambda: self.on_set(2, 0))
-        button.grid(row=2, column=0)
-        self.board[2].append(button)
 
-        button = tk.Button(area, text="", width=3, font=FONT, command=lambda: self.on_set(2, 1))
-        button.grid(row=2, column=1)
-        self.board[2].append(button)
+    def on_canvas_click(self, event: 'tk.Event') -> None:
+        """Map a click on the canvas to its slot.
 
-        button = tk.Button(area, text="", width=3, font=FONT, command=lambda: self.on_set(2, 2))
-        button.grid(row=2, column=2)
-        self.board[2].append(button)
+        Args:
+            event: The click event.
+        """
+        x, y = event.y // self.cell_pixels, event.x // self.cell_pixels
+        if 0 <= x < self.size and 0 <= y < self.size:
+            self.on_set(x, y)
 
 
-    def create_statistic_area(self, area: tk.LabelFrame) -> None:
+    def create_statistic_area(self, area: 'tk.LabelFrame') -> None:
         """Create statistic board which shows player name, wins and losses.
         
         Args:
             area: The area of showing words.
         """
+        import tkinter as tk
+
         tk.Label(area, text="Player1: ").grid(row=0, sticky="w")
         tk.Label(area, text="Player2: ").grid(row=1, sticky="w")
         tk.Label(area, text="User of last move: ").grid(row=2, sticky="w")
@@ -134,17 +229,19 @@ class GameWindow:
         self.ties_label.grid(row=6, column=1)
 
 
-    def create_result_area(self, area: tk.LabelFrame) -> None:
+    def create_result_area(self, area: 'tk.LabelFrame') -> None:
         """Create an area to show results
         
         Args:
             area: The area of showing."""
+        import tkinter as tk
+
         self.result_label = tk.Label(area, text="Game is playing!")
         self.result_label.pack()
 
 
     def destroy(self) -> None:      # destroy window
-        """Destroy the window when finishing."""
+        """Destroy the window when finishing, on the Tk main loop."""
         self.window.quit()
 
 
@@ -158,14 +255,44 @@ class GameWindow:
         if not self.is_enable_set:
             return
 
-        if self.slot_stat[x * 3 + y] == 1:
+        if self.slot_stat[x * self.size + y] == 1:
             return
 
-        self.slot_stat[x * 3 + y] = 1
-        self.board[x][y].configure(text=self.chess, font=FONT)
+        self.set(x + 1, y + 1, self.chess)
         self.on_move(x + 1, y + 1)
 
 
+    def on_hint(self) -> None:
+        """Callback function of the hint button, asks for the best moves of the gameboard on the player's turn."""
+        if not self.is_enable_set or self.gameboard is None:
+            return
+        from hints import get_hint_service      # the solver is only loaded once a hint is asked for
+
+        get_hint_service().request(self.gameboard, self.show_hint)
+
+
+    def show_hint(self, position_key: int, moves: List[Tuple[int, int]]) -> None:
+        """Highlight the best moves, unless the gameboard changed since they were asked for.
+
+        Args:
+            position_key: The position key of the gameboard the moves are for.
+            moves: The 1-based coordinates of the best moves.
+        """
+        with self.render_lock:
+            if self.gameboard is None or self.gameboard.positionKey() != position_key:
+                return
+            hint_cells = {(x - 1) * self.size + y - 1 for x, y in moves}
+            self.dirty_cells.update(hint_cells ^ self.hint_cells)
+            self.hint_cells = hint_cells
+            self.schedule_render()
+
+
+    def clear_hint(self) -> None:
+        """Stop highlighting the hint, called with render_lock held."""
+        self.dirty_cells.update(self.hint_cells)
+        self.hint_cells = set()
+
+
     def enable_set(self, enable: bool) -> None:     # enable slot can be click
         """enable slot to be clicked
         
@@ -175,36 +302,151 @@ class GameWindow:
         self.is_enable_set = enable
 
 
+    def schedule_render(self) -> None:
+        """Mark the state changed for the next poll of the main loop, called with render_lock held."""
+        self.render_pending = True
+
+
+    def call_main(self, func: Callable[[], object], wait: bool = True) -> Optional[object]:
+        """Run a function on the Tk main loop, e.g. a dialog asked for by the socket thread.
+
+        Args:
+            func: The function, called without arguments.
+            wait: Whether to wait for the function to return.
+
+        Returns:
+            The result of the function, None if it doesn't wait or the main loop stopped before the call
+        """
+        future = Future()
+        with self.render_lock:
+            if self.main_loop_done:
+                return None
+            self.main_calls.append((func, future))
+        return future.result() if wait else None
+
+
+    def poll(self) -> None:     # runs on the Tk main loop
+        """Render the changes and run the queued functions, then poll again after POLL_INTERVAL."""
+        if self.render_pending:
+            self.render()
+        with self.render_lock:
+            calls, self.main_calls = self.main_calls, []
+        for func, future in calls:
+            try:
+                future.set_result(func())
+            except Exception as error:
+                future.set_exception(error)
+        self.window.after(POLL_INTERVAL, self.poll)
+
+
+    def render(self) -> None:       # runs on the Tk main loop
+        """Configure the widgets whose state differs from what they show."""
+        started = metrics.now()
+        with self.render_lock:
+            self.render_pending = False
+            cells = [(index, self.cells[index], index in self.hint_cells) for index in self.dirty_cells]
+            self.dirty_cells.clear()
+            texts = [(name, text) for name, text in self.texts.items() if self.shown_texts.get(name) != text]
+            self.shown_texts.update(texts)
+
+        for index, chess, hinted in cells:
+            if self.shown_cells[index] != chess or (index in self.shown_hint_cells) != hinted:
+                self.shown_cells[index] = chess
+                if hinted:
+                    self.shown_hint_cells.add(index)
+                else:
+                    self.shown_hint_cells.discard(index)
+                self.draw_cell(index // self.size, index % self.size, chess, hinted)
+        for name, text in texts:
+            getattr(self, name).configure(text=text)
+        metrics.UI_UPDATE.observe_since(started)
+
+
+    def draw_cell(self, x: int, y: int, chess: str, hinted: bool = False) -> None:
+        """Show a chess on a slot.
+
+        Args:
+            x: The 0-based x-coordinate of the slot.
+            y: The 0-based y-coordinate of the slot.
+            chess: The chess, '' for none.
+            hinted: Whether the slot is highlighted as a hint.
+        """
+        if self.renderer == 'buttons':
+            self.board[x][y].configure(text=chess, font=FONT, bg=HINT_COLOR if hinted else self.cell_color)
+            return
+
+        hint_item = self.hint_items.pop(x * self.size + y, None)
+        if hint_item is not None:
+            self.canvas.delete(hint_item)
+        if hinted:
+            hint_item = self.canvas.create_rectangle(y * self.cell_pixels + 1, x * self.cell_pixels + 1,
+                                                     (y + 1) * self.cell_pixels - 1, (x + 1) * self.cell_pixels - 1,
+                                                     fill=HINT_COLOR, outline='')
+            self.canvas.tag_lower(hint_item)       # under the chess and the lines
+            self.hint_items[x * self.size + y] = hint_item
+
+        item = self.cell_items.get(x * self.size + y)
+        if item is not None:
+            self.canvas.itemconfigure(item, text=chess)
+        elif chess:
+            self.cell_items[x * self.size + y] = self.canvas.create_text(
+                (y + 0.5) * self.cell_pixels, (x + 0.5) * self.cell_pixels, text=chess, font=self.cell_font)
+
+
+    def set_texts(self, **texts) -> None:
+        """Change the texts of labels.
+
+        Args:
+            texts: The new text of each label, by the name of the label.
+        """
+        with self.render_lock:
+            self.texts.update(texts)
+            self.schedule_render()
+
+
     def set(self, x: int, y: int, chess: str) -> None:
-        self.board[x-1][y-1].configure(text=chess, font=FONT)
-        self.slot_stat[(x-1)*3+y-1] = 1
+        index = (x-1)*self.size+y-1
+        with self.render_lock:
+            self.slot_stat[index] = 1
+            self.cells[index] = chess
+            self.dirty_cells.add(index)
+            self.clear_hint()
+            self.schedule_render()
 
 
     def reset(self):        # reset board
-        for row in range(3):
-            for col in range(3):
-                self.board[row][col].configure(text='')
-        
-        for i in range(9):
-            self.slot_stat[i] = 0
+        with self.render_lock:
+            for index in range(self.size * self.size):
+                if self.slot_stat[index]:       # only the slots with a chess need to change
+                    self.slot_stat[index] = 0
+                    self.cells[index] = ''
+                    self.dirty_cells.add(index)
+            self.clear_hint()
+            self.schedule_render()
 
 
     def run(self):
         self.window.mainloop()
+        with self.render_lock:          # the functions nobody will run get None
+            self.main_loop_done = True
+            calls, self.main_calls = self.main_calls, []
+        for func, future in calls:
+            future.set_result(None)
 
 
     def update_turn(self, msg: str) -> None:        # update turn label，whose turn
-        self.current_turn_label.configure(text=msg)
+        self.set_texts(current_turn_label=msg)
 
 
     def update_stats(self, gameboard: BoardClass) -> None:      # update statis and status label
-        self.player1_label.configure(text=gameboard.player1_name)
-        self.player2_label.configure(text=gameboard.player2_name)
-        self.user_last_move_label.configure(text=gameboard.last_player)
-        self.number_of_games_label.configure(text=gameboard.num_of_losses + gameboard.num_of_ties + gameboard.num_of_wins)
-        self.wins_label.configure(text=gameboard.num_of_wins)
-        self.losses_label.configure(text=gameboard.num_of_losses)
-        self.ties_label.configure(text=gameboard.num_of_ties)
-
-        self.result_label.configure(text=gameboard.result)
+        self.set_texts(                 # read now, the gameboard may change before the render
+            player1_label=gameboard.player1_name,
+            player2_label=gameboard.player2_name,
+            user_last_move_label=gameboard.last_player,
+            number_of_games_label=gameboard.num_of_losses + gameboard.num_of_ties + gameboard.num_of_wins,
+            wins_label=gameboard.num_of_wins,
+            losses_label=gameboard.num_of_losses,
+            ties_label=gameboard.num_of_ties,
+            result_label=gameboard.result,
+        )
 
@@ -1,5 +1,10 @@
-import tkinter as tk
-from tkinter import messagebox
+from typing import List, Tuple
+from bitboard import BitBoard, DIRECTIONS
+from game_state import GameState
+from zobrist import NUM_OF_SYMMETRIES, symmetry_key_table, zobrist_table
+
+BACKENDS = ('list', 'bitboard')     # the gameboard representations that detect wins, 'bitboard' is the fastest
+COMPACT = 'compact'     # mirrors the moves in a GameState, no faster than 'list' and it keeps the list of lists too
 
 
 class BoardClass:
@@ -15,16 +20,37 @@ class BoardClass:
         num_of_wins(int): The number of game wins.
         num_of_ties(int): The number of game ties.
         num_of losses(int): The number of game losses.
+        num_of_moves(int): The number of chess on the gameboard.
+        move_history(list): The slot indices (x * size + y) of the moves in the order they were made.
+        size(int): The number of rows (and columns) of the gameboard.
+        win_length(int): The number of chess in a row needed to win.
+        backend(str): The representation used to detect wins, 'list', 'bitboard' or COMPACT.
+        engine: The BitBoard or GameState of the backend, None for 'list'.
+        zobrist(dict): The Zobrist numbers of every chess and slot.
+        position_key(int): The Zobrist key of the position, updated with one XOR per move.
     '''
-    def __init__(self, player1_name: str, player2_name: str, myself_name: str) -> None:
+    def __init__(self, player1_name: str, player2_name: str, myself_name: str, backend: str = 'list',
+                 size: int = 3, win_length: int = 3) -> None:
         '''Make a gameboard.
 
         Args:
             player1_name: The username of player1.
             player2_name: The username of player2.
             myself_name: The username of current user.
+            backend: 'list' to check the list of lists, 'bitboard' to check two bit masks.
+                COMPACT keeps a GameState in step with the gameboard as its engine, for code
+                that wants the GameState of a BoardClass; it saves no memory and is slower.
+            size: The number of rows (and columns) of the gameboard.
+            win_length: The number of chess in a row needed to win.
 
+        Raises:
+            ValueError: if the backend is unknown or the win length doesn't fit the gameboard
         '''
+        if backend not in BACKENDS and backend != COMPACT:
+            raise ValueError('Unknown backend: %s' % backend)
+        if not 0 < win_length <= size:
+            raise ValueError('Invalid win length %d for a %dx%d gameboard' % (win_length, size, size))
+
         self.player1_name = player1_name
         self.player2_name = player2_name
         self.myself_name = myself_name
@@ -34,9 +60,22 @@ class BoardClass:
         self.num_of_wins = 0
         self.num_of_ties = 0
         self.num_of_losses = 0
+        self.num_of_moves = 0
+        self.move_history = []
         self.result = ''
+        self.size = size
+        self.win_length = win_length
+        self.backend = backend
+        if backend == 'bitboard':
+            self.engine = BitBoard(size, win_length)
+        elif backend == 'compact':
+            self.engine = GameState(size, win_length)
+        else:
+            self.engine = None
 
-        self.gameboard = [['', '', ''], ['', '', ''], ['', '', '']] # set the gameboard as a list of lists, which contains three empty spaces
+        self.gameboard = [[''] * size for _ in range(size)] # set the gameboard as a list of lists, each row contains size empty spaces
+        self.zobrist = zobrist_table(size)
+        self.position_key = 0
 
 
     def updateGamesPlayed(self) -> int:
@@ -51,7 +90,63 @@ class BoardClass:
     def resetGameBoard(self) -> None:
         '''Clear all the moves from game board.
         '''
-        self.gameboard = [['', '', ''], ['', '', ''], ['', '', '']] # reset/clear the list gameboard
+        self.gameboard = [[''] * self.size for _ in range(self.size)] # reset/clear the list gameboard
+        self.num_of_moves = 0
+        self.move_history = []
+        self.position_key = 0
+        if self.engine is not None:
+            self.engine.clear()
+
+
+    def setGameBoard(self, gameboard: List[List[str]]) -> None:
+        '''Replace all the moves of the game board, e.g. with a position made by another tool.
+
+        The move history is filled in row order since the real order is unknown.
+
+        Args:
+            gameboard: A list of size rows, each one a list of size 'x', 'o' or '' strings.
+
+        Raises:
+            ValueError: if the gameboard has another size
+        '''
+        if len(gameboard) != self.size or any(len(row) != self.size for row in gameboard):
+            raise ValueError('The gameboard should be %dx%d' % (self.size, self.size))
+
+        self.resetGameBoard()
+        for x, row in enumerate(gameboard):
+            for y, chess in enumerate(row):
+                if chess != '':
+                    self.gameboard[x][y] = chess
+                    self.num_of_moves += 1
+                    self.move_history.append(x * self.size + y)
+                    self.position_key ^= self.zobrist[chess][x * self.size + y]
+                    if self.engine is not None:
+                        self.engine.place(x * self.size + y, chess)
+
+
+    def positionKey(self) -> int:
+        '''Get the 64-bit Zobrist key of the position, the same in every process.
+
+        Returns:
+            The key
+        '''
+        return self.position_key
+
+
+    def canonicalKey(self) -> int:
+        '''Get the 64-bit Zobrist key shared by the 8 rotations and reflections of the position.
+
+        Returns:
+            The smallest key of the 8 symmetries
+        '''
+        keys = [0] * NUM_OF_SYMMETRIES
+        table = symmetry_key_table(self.size)
+        for index in self.move_history:
+            x, y = divmod(index, self.size)
+            numbers = table[self.gameboard[x][y]][index]
+            for symmetry in range(NUM_OF_SYMMETRIES):
+                keys[symmetry] ^= numbers[symmetry]
+        return min(keys)
 
 
     def isEmptySlot(self, slot_x: int, slot_y: int) -> bool:
@@ -64,12 +159,42 @@ class BoardClass:
         Returns:
             True if it's empty, False otherwise
         '''
-        if 0 < slot_x < 4 and 0 < slot_y < 4:    # Justify whether the slot is valid
+        if 0 < slot_x <= self.size and 0 < slot_y <= self.size:    # Justify whether the slot is valid
+            if self.engine is not None:
+                return self.engine.is_empty((slot_x-1) * self.size + slot_y-1)
             return self.gameboard[slot_x-1][slot_y-1] == ''
         else:
             return False
 
 
+    def getEmptySlots(self) -> List[Tuple[int, int]]:
+        '''List the slots where a chess can be put.
+
+        Returns:
+            A list of tuples with the 1-based coordinates of every empty slot
+        '''
+        return [(x + 1, y + 1) for x, row in enumerate(self.gameboard) for y, chess in enumerate(row) if chess == '']
+
+
+    def getBitMasks(self) -> Tuple[int, int]:
+        '''Get the slots of both players as bit masks, bit (x * size + y) stands for the slot (x, y).
+
+        Returns:
+            A tuple with the mask of player1 and the mask of player2
+        '''
+        if self.backend == 'bitboard':
+            return self.engine.x_bits, self.engine.o_bits
+
+        x_bits = o_bits = 0
+        for x, row in enumerate(self.gameboard):
+            for y, chess in enumerate(row):
+                if chess == 'x':
+                    x_bits |= 1 << (x * self.size + y)
+                elif chess == 'o':
+                    o_bits |= 1 << (x * self.size + y)
+        return x_bits, o_bits
+
+
     def updateGameBoard(self, player_name: str, slot_x: int, slot_y: int) -> None:
         '''Updates the game board with the player's move
 
@@ -88,33 +213,87 @@ class BoardClass:
         self.last_x = slot_x - 1
         self.last_y = slot_y - 1
         self.last_player = player_name
+        self.num_of_moves += 1
+        self.move_history.append(self.last_x * self.size + self.last_y)
 
         if player_name == self.player1_name:     # Justify the user
             self.gameboard[self.last_x][self.last_y] = 'x'
         else:
             self.gameboard[self.last_x][self.last_y] = 'o'
 
+        self.position_key ^= self.zobrist[self.gameboard[self.last_x][self.last_y]][self.last_x * self.size + self.last_y]
+        if self.engine is not None:
+            self.engine.place(self.last_x * self.size + self.last_y, self.gameboard[self.last_x][self.last_y])
+
+
+    def undoGameBoard(self) -> None:
+        '''Take back the last move of the game board.
+
+        The stats are not changed, so undo a move before isWinner() or boardIsFull() counts it.
+
+        Raises:
+            ValueError: if there is no move to take back
+        '''
+        if not self.move_history:
+            raise ValueError
+
+        index = self.move_history.pop()
+        x, y = divmod(index, self.size)
+        self.position_key ^= self.zobrist[self.gameboard[x][y]][index]     # XOR takes the chess back out
+        self.gameboard[x][y] = ''
+        self.num_of_moves -= 1
+        if self.engine is not None:
+            self.engine.remove(index)
+
+        if self.move_history:       # the move before becomes the last move
+            self.last_x, self.last_y = divmod(self.move_history[-1], self.size)
+            if self.gameboard[self.last_x][self.last_y] == 'x':
+                self.last_player = self.player1_name
+            else:
+                self.last_player = self.player2_name
+        else:
+            self.last_x = self.last_y = 0
+            self.last_player = ''
+
+
+    def isLineCompleted(self) -> bool:
+        '''Walks out from the last slot in four directions to find a line of win_length chess.
+
+        Returns:
+            True when the last move completes a line, False otherwise
+        '''
+        chess = self.gameboard[self.last_x][self.last_y]
+
+        for dx, dy in DIRECTIONS:
+            count = 1
+            for sign in (1, -1):    # Walk forwards and then backwards along the direction
+                x = self.last_x + sign * dx
+                y = self.last_y + sign * dy
+                while count < self.win_length and 0 <= x < self.size and 0 <= y < self.size and self.gameboard[x][y] == chess:
+                    count += 1
+                    x += sign * dx
+                    y += sign * dy
+            if count >= self.win_length:
+                return True
+        return False
+
 
     def isWinner(self) -> bool:
         '''Checks if the latest move resulted in a win and updates the wins and losses count
 
         Returns:
             True when there is a winner, False otherwise
-        ''' 
+        '''
         if self.gameboard[self.last_x][self.last_y] == '':
             return False
 
         winner = ''
 
-        if self.gameboard[self.last_x][0] == self.gameboard[self.last_x][1] == self.gameboard[self.last_x][2]:   # Justify whether there is one row of same chess
-            winner = self.last_player
-        elif self.gameboard[0][self.last_y] == self.gameboard[1][self.last_y] == self.gameboard[2][self.last_y]:    # Justify whether there is one column of same chess
-            winner = self.last_player
-        elif self.gameboard[1][1] != '':
-            if self.gameboard[0][0] == self.gameboard[1][1] == self.gameboard[2][2]:   # Justify whether there is one diagonal of same chess
-                winner = self.last_player
-            elif self.gameboard[2][0] == self.gameboard[1][1] == self.gameboard[0][2]:   # Justify whether there is one diagonal of same chess
+        if self.engine is not None:
+            if self.engine.is_win(self.gameboard[self.last_x][self.last_y], self.last_x * self.size + self.last_y):   # Justify whether the engine finds a line through the last slot
                 winner = self.last_player
+        elif self.isLineCompleted():    # Justify whether there is one row, column or diagonal of same chess
+            winner = self.last_player
 
         if winner == '':
             return False
@@ -133,9 +312,11 @@ class BoardClass:
         Returns:
             True when the gameboard is full, False otherwise
         '''
-        for row in self.gameboard:
-            if row[0] == '' or row[1] == '' or row[2] == '':
+        if self.engine is not None:
+            if not self.engine.is_full():
                 return False
+        elif self.num_of_moves < self.size * self.size:
+            return False
 
         self.num_of_ties += 1
         self.result = 'This game ended in a tie!'
@@ -157,8 +338,8 @@ class BoardClass:
         '''Print the current gameboard
         '''
         print('{} move to {}, {}.'.format(self.last_player, self.last_x + 1, self.last_y + 1))
-        print('            -------------')
+        print('            -' + '----' * self.size)
 
         for row in self.gameboard:
-            print('            | {:1} | {:1} | {:1} |'.format(row[0], row[1], row[2]))
-            print('            -------------')
+            print('            |' + ''.join(' {:1} |'.format(chess) for chess in row))
+            print('            -' + '----' * self.size)
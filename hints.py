@@ -0,0 +1,166 @@
+"""\
+This module provides the hints of the game window, the best moves of a position.
+
+A hint is evaluated on a worker thread, so the Tk main loop never waits for
+the solver, and kept in a least recently used cache keyed by the Zobrist key
+of the position. The positions of a rematch are answered from the cache
+without leaving the main loop.
+
+The 3x3 positions are looked up in the opening book when it has been built,
+otherwise in the solver that solves the game once. Larger boards are
+searched HINT_DEPTH moves ahead by the solver, and the ties are narrowed to
+the slots through the most lines.
+
+Functions:
+get_hint_service() -- get the hint service shared by the whole process
+
+Classes:
+HintService -- evaluates the best moves of positions off the Tk thread and caches them
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, List, Optional, Tuple
+from gameboard import BoardClass
+from opening_book import get_book
+from solver import get_solver
+
+HINT_CACHE_SIZE = 4096      # positions kept in the cache
+HINT_DEPTH = 4              # moves searched ahead on boards larger than 3x3
+
+HintKey = Tuple[int, int, int]      # size, win length and Zobrist key of a position
+HintCallback = Callable[[int, List[Tuple[int, int]]], None]
+
+_hint_service: Optional['HintService'] = None
+
+
+def get_hint_service() -> 'HintService':
+    '''Get the hint service shared by the whole process, so every game of the process shares its cache.
+
+    Returns:
+        The shared hint service
+    '''
+    global _hint_service
+    if _hint_service is None:
+        _hint_service = HintService()
+    return _hint_service
+
+
+class HintService:
+    '''A class to evaluate the best moves of positions on a worker thread.
+
+    Attributes:
+        max_entries(int): The number of positions kept in the cache.
+        cache(OrderedDict): The best moves of each position key in least recently used order.
+        lock(Lock): Guards the cache, shared by the Tk main loop and the worker.
+        executor(ThreadPoolExecutor): The worker thread, evaluations run one at a time.
+    '''
+    def __init__(self, max_entries: int = HINT_CACHE_SIZE) -> None:
+        '''Make a hint service, its worker thread is started by the first evaluation.
+
+        Args:
+            max_entries: The number of positions kept in the cache.
+        '''
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = Lock()
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='hint')
+
+
+    def lookup(self, key: HintKey) -> Optional[List[Tuple[int, int]]]:
+        '''Look up the best moves of a position in the cache.
+
+        Args:
+            key: The size, win length and position key of the gameboard.
+
+        Returns:
+            The 1-based coordinates of the best moves, None if the position isn't cached
+        '''
+        with self.lock:
+            moves = self.cache.get(key)
+            if moves is not None:
+                self.cache.move_to_end(key)
+            return moves
+
+
+    def store(self, key: HintKey, moves: List[Tuple[int, int]]) -> None:
+        '''Keep the best moves of a position, dropping the least recently used one when the cache is full.
+
+        Args:
+            key: The size, win length and position key of the gameboard.
+            moves: The 1-based coordinates of the best moves.
+        '''
+        with self.lock:
+            self.cache[key] = moves
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+
+
+    def request(self, board: BoardClass, callback: HintCallback) -> Optional[Future]:
+        '''Get the best moves of a gameboard for the player to move.
+
+        A cached position calls back at once on the calling thread, any other
+        is copied and evaluated on the worker thread, which calls back when it
+        is done. The callback gets the position key of the gameboard, so a hint
+        that arrives after another move can be told apart.
+
+        Args:
+            board: The gameboard, read only on the calling thread.
+            callback: Called with the position key and the 1-based coordinates of the best moves.
+
+        Returns:
+            The future of the evaluation, None when the position was cached
+        '''
+        key = (board.size, board.win_length, board.positionKey())
+        moves = self.lookup(key)
+        if moves is not None:
+            callback(key[2], moves)
+            return None
+        return self.executor.submit(self.evaluate_and_store, key, list(board.move_history), callback)
+
+
+    def evaluate_and_store(self, key: HintKey, history: List[int], callback: HintCallback) -> None:
+        '''Evaluate a position on the worker thread, cache it and call back.
+
+        Args:
+            key: The size, win length and position key of the gameboard.
+            history: The slot indices played from the empty gameboard.
+            callback: Called with the position key and the 1-based coordinates of the best moves.
+        '''
+        moves = self.lookup(key)    # requested twice before the first evaluation finished
+        if moves is None:
+            moves = self.evaluate(key[0], key[1], history)
+            self.store(key, moves)
+        callback(key[2], moves)
+
+
+    def evaluate(self, size: int, win_length: int, history: List[int]) -> List[Tuple[int, int]]:
+        '''Find the best moves of a position.
+
+        Args:
+            size: The number of rows (and columns) of the gameboard.
+            win_length: The number of chess in a row needed to win.
+            history: The slot indices played from the empty gameboard, player1 first.
+
+        Returns:
+            The 1-based coordinates of the best moves, empty when the game is over
+        '''
+        board = BoardClass('player1', 'player2', 'player1', 'bitboard', size, win_length)
+        for turn, index in enumerate(history):
+            board.updateGameBoard('player2' if turn % 2 else 'player1', index // size + 1, index % size + 1)
+        if board.isWinner() or board.boardIsFull():
+            return []
+
+        if size == 3 and win_length == 3:
+            book = get_book()
+            if book is not None:
+                return book.best_moves(board)
+        if size == 3:
+            return get_solver(size, win_length).best_moves(board)
+        # A shallow search ties on most slots, keep the ones through the most lines like the heuristic strategy
+        solver = get_solver(size, win_length, HINT_DEPTH)
+        moves = solver.best_moves(board)
+        most_lines = max(len(solver.slot_masks[(x - 1) * size + y - 1]) for x, y in moves)
+        return [(x, y) for x, y in moves if len(solver.slot_masks[(x - 1) * size + y - 1]) == most_lines]
@@ -0,0 +1,154 @@
+"""\
+This module provides a load test for the game server.
+
+Headless clients connect in pairs, play random moves and report how many
+matches the server finishes per second and the round trip latency of the
+moves, from sending a move until the opponent's answer arrives.
+
+Usage:
+    python loadtest.py [--host HOST --port PORT] [--matches N] [--concurrency N] [--games N]
+
+Without --port a server is started in the same process on a free port.
+
+Functions:
+play_client() -- play the games of one client
+run_load_test() -- run many matches at once and collect the results
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional
+from gameboard import BoardClass
+from game_server import GameServer
+import protocol
+
+
+def percentile(samples: List[float], percent: float) -> float:
+    '''Get a percentile of the samples.
+
+    Args:
+        samples: The samples, they will be sorted.
+        percent: The percentile to get, from 0 to 100.
+
+    Returns:
+        The value below which the percent of the samples fall, 0 when there is no sample
+    '''
+    if not samples:
+        return 0.0
+    samples.sort()
+    return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+async def play_client(host: str, port: int, name: str, num_of_games: int, latencies: List[float],
+                      rng: random.Random) -> None:
+    '''Connect to the server and play random moves.
+
+    Args:
+        host: The host name or ip address of the server.
+        port: The port of the server.
+        name: The username of the client.
+        num_of_games: The number of games to play in the match.
+        latencies: The list that collects the move round trip times in seconds.
+        rng: The random generator used to pick the moves.
+    '''
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(protocol.encode_hello(name))
+        kind, payload = await protocol.read_frame_async(reader)
+        role, opponent = protocol.decode_start(payload)
+        await protocol.read_frame_async(reader)     # the session token, not used by the load test
+        player1_name, player2_name = (name, opponent) if role == 1 else (opponent, name)
+        board = BoardClass(player1_name, player2_name, name)
+        slots = [(x, y) for x in range(1, board.size + 1) for y in range(1, board.size + 1)]
+
+        for game in range(num_of_games):
+            turn = 1
+            sent_at = None
+            while True:
+                if turn == role:
+                    x, y = rng.choice([slot for slot in slots if board.isEmptySlot(*slot)])
+                    board.updateGameBoard(name, x, y)
+                    writer.write(protocol.encode_move(x, y))
+                    sent_at = time.perf_counter()
+                else:
+                    kind, payload = await protocol.read_frame_async(reader)
+                    if sent_at is not None:
+                        latencies.append(time.perf_counter() - sent_at)
+                    board.updateGameBoard(opponent, *protocol.decode_move(payload))
+
+                if board.isWinner() or board.boardIsFull():
+                    break
+                turn = 3 - turn
+
+            if role == 1:
+                writer.write(protocol.encode_frame(protocol.PLAY_AGAIN if game + 1 < num_of_games else protocol.FUN_TIMES))
+            else:
+                await protocol.read_frame_async(reader)
+            board.resetGameBoard()
+    finally:
+        writer.close()
+
+
+async def run_load_test(host: str, port: Optional[int], num_of_matches: int, concurrency: int,
+                        num_of_games: int, seed: int = 0) -> Dict[str, float]:
+    '''Run many matches against a server.
+
+    Args:
+        host: The host name or ip address of the server.
+        port: The port of the server, None to start one in this process.
+        num_of_matches: The number of matches to play.
+        concurrency: The number of matches played at the same time.
+        num_of_games: The number of games in each match.
+        seed: The seed of the random moves.
+
+    Returns:
+        A dict with the matches per second and the move latency percentiles in milliseconds
+    '''
+    server = None
+    if port is None:
+        server = GameServer()
+        port = await server.start(host, 0)
+
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def play_match(match_id: int) -> None:
+        async with slots:
+            await asyncio.gather(
+                play_client(host, port, 'a%d' % match_id, num_of_games, latencies, random.Random(rng.random())),
+                play_client(host, port, 'b%d' % match_id, num_of_games, latencies, random.Random(rng.random())),
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(play_match(match_id) for match_id in range(num_of_matches)))
+    elapsed = time.perf_counter() - start
+
+    if server is not None:
+        await server.close()
+
+    return {
+        'matches': num_of_matches,
+        'seconds': elapsed,
+        'matches_per_second': num_of_matches / elapsed,
+        'moves': len(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the game server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None, help='port of a running server, omit to start one')
+    parser.add_argument('--matches', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--games', type=int, default=3, help='games played in each match')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args.host, args.port, args.matches, args.concurrency, args.games, args.seed))
+    print('{matches} matches in {seconds:.2f}s: {matches_per_second:.1f} matches/s, '
+          '{moves} moves, p50 {p50_ms:.2f} ms, p99 {p99_ms:.2f} ms'.format(**report))
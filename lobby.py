@@ -0,0 +1,211 @@
+"""\
+This module provides a matchmaking lobby for the game server.
+
+Waiting players are kept in two structures:
+    a heap ordered by the time they joined, so the longest waiting player is
+    found in O(log n), and
+    buckets of BUCKET_WIDTH rating points, each a queue in joining order, so
+    the nearest opponent is found by looking at a few buckets.
+
+A new player is paired at once with the oldest player of the nearest bucket
+within BASE_TOLERANCE rating points. Players that can't be paired wait, and
+the range they accept grows with their waiting time, so match_waiting()
+pairs the longest waiting players first. Players that leave are marked and
+skipped lazily, which keeps every operation O(log n) or better.
+
+Classes:
+Ticket -- a player waiting in the lobby
+Lobby -- pairs the waiting players
+"""
+
+import heapq
+import time
+from collections import deque
+from itertools import count
+from typing import Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+BUCKET_WIDTH = 50           # rating points of a bucket
+BASE_TOLERANCE = 100        # rating difference accepted right away
+WIDEN_PER_SECOND = 25       # rating difference added for every second of waiting
+MAX_TOLERANCE = 1000        # rating difference accepted at most
+
+Pair = Tuple[Hashable, Hashable]
+
+
+class Ticket:
+    '''A class to hold a waiting player.
+
+    Attributes:
+        player: The player, any hashable object such as a connection.
+        rating(int): The rating of the player.
+        joined_at(float): The time the player joined.
+        waiting(bool): False once the player is paired or has left.
+    '''
+    __slots__ = ('player', 'rating', 'joined_at', 'waiting')
+
+    def __init__(self, player: Hashable, rating: int, joined_at: float) -> None:
+        '''Make a ticket.
+
+        Args:
+            player: The player.
+            rating: The rating of the player.
+            joined_at: The time the player joined.
+        '''
+        self.player = player
+        self.rating = rating
+        self.joined_at = joined_at
+        self.waiting = True
+
+
+class Lobby:
+    '''A class to pair waiting players by rating and waiting time.
+
+    Attributes:
+        tickets(dict): The ticket of every waiting player.
+        heap(list): The tickets in (joined_at, sequence, ticket) entries, oldest first.
+        buckets(dict): The queue of tickets of every rating bucket.
+    '''
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        '''Make an empty lobby.
+
+        Args:
+            clock: The function that returns the current time in seconds.
+        '''
+        self.clock = clock
+        self.tickets: Dict[Hashable, Ticket] = {}
+        self.heap: List[Tuple[float, int, Ticket]] = []
+        self.buckets: Dict[int, Deque[Ticket]] = {}
+        self.sequence = count()
+
+
+    def __len__(self) -> int:
+        '''Get the number of waiting players.'''
+        return len(self.tickets)
+
+
+    def tolerance(self, ticket: Ticket, now: float) -> float:
+        '''Get the rating difference a player accepts after waiting.
+
+        Args:
+            ticket: The ticket of the player.
+            now: The current time.
+
+        Returns:
+            The accepted rating difference
+        '''
+        return min(MAX_TOLERANCE, BASE_TOLERANCE + WIDEN_PER_SECOND * (now - ticket.joined_at))
+
+
+    def take_opponent(self, ticket: Ticket, tolerance: float) -> Optional[Ticket]:
+        '''Remove the best waiting opponent of a player from the buckets.
+
+        The nearest buckets are looked at first, and in a bucket the oldest player.
+
+        Args:
+            ticket: The ticket of the player.
+            tolerance: The accepted rating difference.
+
+        Returns:
+            The ticket of the opponent, None if nobody is in range
+        '''
+        center = ticket.rating // BUCKET_WIDTH
+        reach = int(tolerance) // BUCKET_WIDTH + 1
+        for distance in range(reach + 1):
+            for bucket in {center - distance, center + distance}:
+                waiting = self.buckets.get(bucket)
+                while waiting:
+                    if not waiting[0].waiting:      # paired or left, skip it lazily
+                        waiting.popleft()
+                        continue
+                    if waiting[0] is ticket or abs(waiting[0].rating - ticket.rating) > tolerance:
+                        break
+                    opponent = waiting.popleft()
+                    self.remove(opponent)
+                    return opponent
+                if waiting is not None and not waiting:
+                    del self.buckets[bucket]
+        return None
+
+
+    def remove(self, ticket: Ticket) -> None:
+        '''Mark a ticket as no longer waiting.
+
+        Args:
+            ticket: The ticket to remove.
+        '''
+        ticket.waiting = False
+        del self.tickets[ticket.player]
+
+
+    def enqueue(self, player: Hashable, rating: int) -> Optional[Pair]:
+        '''Add a player, pairing it at once if an opponent is in range.
+
+        Args:
+            player: The player, it must not be waiting already.
+            rating: The rating of the player.
+
+        Returns:
+            The opponent and the player if they are paired, None if the player waits
+
+        Raises:
+            ValueError: if the player is already waiting
+        '''
+        if player in self.tickets:
+            raise ValueError('The player is already waiting')
+
+        now = self.clock()
+        ticket = Ticket(player, rating, now)
+        opponent = self.take_opponent(ticket, BASE_TOLERANCE)
+        if opponent is not None:
+            return opponent.player, player
+
+        self.tickets[player] = ticket
+        heapq.heappush(self.heap, (now, next(self.sequence), ticket))
+        self.buckets.setdefault(rating // BUCKET_WIDTH, deque()).append(ticket)
+        return None
+
+
+    def cancel(self, player: Hashable) -> bool:
+        '''Remove a player that leaves before being paired.
+
+        Args:
+            player: The player.
+
+        Returns:
+            True if the player was waiting, False otherwise
+        '''
+        ticket = self.tickets.get(player)
+        if ticket is None:
+            return False
+        self.remove(ticket)
+        return True
+
+
+    def match_waiting(self, limit: int = 1000) -> List[Pair]:
+        '''Pair the longest waiting players with the wider range their waiting time allows.
+
+        Args:
+            limit: The number of waiting players looked at, oldest first.
+
+        Returns:
+            The list of pairs, the older player first
+        '''
+        now = self.clock()
+        pairs = []
+        skipped = []
+        while self.heap and len(skipped) < limit:
+            entry = heapq.heappop(self.heap)
+            ticket = entry[2]
+            if not ticket.waiting:
+                continue
+
+            opponent = self.take_opponent(ticket, self.tolerance(ticket, now))
+            if opponent is None:
+                skipped.append(entry)
+                continue
+            self.remove(ticket)
+            pairs.append((ticket.player, opponent.player))
+
+        for entry in skipped:
+            heapq.heappush(self.heap, entry)
+        return pairs
@@ -0,0 +1,407 @@
+"""\
+This module provides a Monte Carlo tree search (UCT) player for large boards.
+
+The exhaustive solver can't see the end of a 9x9 or 15x15 game, so this
+player estimates the moves with random playouts instead. Every search runs
+until a wall-clock budget is spent, and the move played most often wins.
+
+The tree is kept in flat arrays indexed by node, not in node objects: the
+children of a node are expanded together and sit next to each other, so a
+node only stores where its children start and how many there are. Playouts
+run on a GameState that is copied from the root, which is one bytearray
+copy. Between two moves the subtree of the position that was reached is kept
+and moved to the front of the arrays, so the playouts of the last turn are
+not thrown away.
+
+Usage:
+    python mcts.py [--size N] [--win-length N] [--budget SECONDS] [--moves N]
+        -- print the playouts per second of a few searches from an empty board
+
+Functions:
+get_search() -- get the shared search of a board size and win length
+
+Classes:
+MCTS -- UCT search on array-backed nodes
+"""
+
+import argparse
+import math
+import random
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+from game_state import GameState, EMPTY, X, O
+from gameboard import BoardClass
+
+MOVE_BUDGET = 1.0           # default seconds of search per move
+EXPLORATION = 1.4           # weight of the exploration term of UCT
+MAX_NODES = 1 << 21         # nodes kept at most, the leaves are no longer expanded beyond
+
+ONGOING, WON, DRAWN = 0, 1, 2   # status of a node, WON means the move of the node won the game
+
+_searches: Dict[Tuple[int, int], 'MCTS'] = {}
+
+
+def get_search(size: int = 3, win_length: int = 3) -> 'MCTS':
+    '''Get the search shared by the whole process, so its tree is reused between moves.
+
+    Args:
+        size: The number of rows (and columns) of the board.
+        win_length: The number of chess in a row needed to win.
+
+    Returns:
+        The shared search
+    '''
+    key = (size, win_length)
+    if key not in _searches:
+        _searches[key] = MCTS(size, win_length)
+    return _searches[key]
+
+
+class MCTS:
+    '''A class to search the moves of a gameboard with random playouts.
+
+    Attributes:
+        size(int): The number of rows (and columns) of the board.
+        win_length(int): The number of chess in a row needed to win.
+        budget(float): The seconds of search per move.
+        exploration(float): The weight of the exploration term of UCT.
+        max_nodes(int): The number of nodes kept at most.
+        rng(Random): The random generator of the playouts.
+        state(GameState): The position of the root.
+        parent(array): The parent of each node, -1 for the root.
+        move(array): The slot index played to reach each node, -1 for the root.
+        first_child(array): The index of the first child of each node, -1 until it is expanded.
+        num_children(array): The number of children of each node.
+        visits(array): The number of playouts through each node.
+        rewards(array): The sum of the results of those playouts for the player who made the move.
+        status(bytearray): ONGOING, WON or DRAWN, known once the node has been visited.
+        last_report(dict): The playouts, seconds, playouts per second and nodes of the last search.
+    '''
+    def __init__(self, size: int = 3, win_length: int = 3, budget: float = MOVE_BUDGET,
+                 exploration: float = EXPLORATION, max_nodes: int = MAX_NODES,
+                 rng: Optional[random.Random] = None) -> None:
+        '''Make a search with an empty tree.
+
+        Args:
+            size: The number of rows (and columns) of the board.
+            win_length: The number of chess in a row needed to win.
+            budget: The seconds of search per move.
+            exploration: The weight of the exploration term of UCT.
+            max_nodes: The number of nodes kept at most.
+            rng: The random generator of the playouts.
+        '''
+        self.size = size
+        self.win_length = win_length
+        self.budget = budget
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.rng = rng or random.Random()
+        self.last_report = {}
+        self.clear(GameState(size, win_length))
+
+
+    def clear(self, state: GameState) -> None:
+        '''Throw the tree away and start again from a position.
+
+        Args:
+            state: The position of the new root.
+        '''
+        self.state = state
+        self.parent = array('i', [-1])
+        self.move = array('i', [-1])
+        self.first_child = array('i', [-1])
+        self.num_children = array('i', [0])
+        self.visits = array('i', [0])
+        self.rewards = array('d', [0.0])
+        self.status = bytearray(1)
+
+
+    def __len__(self) -> int:
+        '''Get the number of nodes.'''
+        return len(self.move)
+
+
+    def find_child(self, node: int, index: int) -> int:
+        '''Find the child of a node reached by a move.
+
+        Args:
+            node: The node.
+            index: The slot index of the move.
+
+        Returns:
+            The child, -1 if the node isn't expanded
+        '''
+        first = self.first_child[node]
+        if first < 0:
+            return -1
+        for child in range(first, first + self.num_children[node]):
+            if self.move[child] == index:
+                return child
+        return -1
+
+
+    def advance(self, moves: List[int]) -> None:
+        '''Move the root to the position after a list of moves, keeping the subtree if it was searched.
+
+        Args:
+            moves: The slot indices played from the empty board.
+        '''
+        played = self.state.moves
+        if moves[:len(played)] != played:       # another game, or the same one taken back
+            state = GameState(self.size, self.win_length)
+            for index in moves:
+                state.make_move(index)
+            self.clear(state)
+            return
+
+        root = 0
+        for index in moves[len(played):]:
+            self.state.make_move(index)
+            if root >= 0:
+                root = self.find_child(root, index)
+        if root < 0:
+            self.clear(self.state)
+        elif root > 0:
+            self.keep_subtree(root)
+
+
+    def keep_subtree(self, root: int) -> None:
+        '''Move the subtree of a node to the front of the arrays and drop all the other nodes.
+
+        The nodes are copied in breadth-first order, so the children of a node stay next to each other.
+
+        Args:
+            root: The node that becomes the root.
+        '''
+        order = [root]
+        for node in order:      # the list grows while it is walked
+            first = self.first_child[node]
+            if first >= 0:
+                order.extend(range(first, first + self.num_children[node]))
+
+        new_index = array('i', [-1]) * len(self.move)
+        for position, node in enumerate(order):
+            new_index[node] = position
+
+        self.parent = array('i', [-1] + [new_index[self.parent[node]] for node in order[1:]])
+        self.move = array('i', [-1] + [self.move[node] for node in order[1:]])
+        self.first_child = array('i', (new_index[self.first_child[node]] if self.first_child[node] >= 0 else -1 for node in order))
+        self.num_children = array('i', (self.num_children[node] for node in order))
+        self.visits = array('i', (self.visits[node] for node in order))
+        self.rewards = array('d', (self.rewards[node] for node in order))
+        self.status = bytearray(self.status[node] for node in order)
+
+
+    def expand(self, node: int, state: GameState) -> bool:
+        '''Add a child for every legal move of a node, in random order.
+
+        Args:
+            node: The node.
+            state: The position of the node.
+
+        Returns:
+            True if the children were added, False if there is no room left
+        '''
+        moves = state.legal_moves()
+        first = len(self.move)
+        if first + len(moves) > self.max_nodes:
+            return False
+
+        self.rng.shuffle(moves)     # the unvisited children are tried in this order
+        count = len(moves)
+        self.parent.extend(array('i', [node]) * count)
+        self.move.extend(array('i', moves))
+        self.first_child.extend(array('i', [-1]) * count)
+        self.num_children.extend(array('i', [0]) * count)
+        self.visits.extend(array('i', [0]) * count)
+        self.rewards.extend(array('d', [0.0]) * count)
+        self.status.extend(bytes(count))
+        self.first_child[node] = first
+        self.num_children[node] = count
+        return True
+
+
+    def select_child(self, node: int) -> int:
+        '''Pick the child of a node with the highest UCT value, an unvisited child first.
+
+        Args:
+            node: The expanded node.
+
+        Returns:
+            The child
+        '''
+        visits = self.visits
+        rewards = self.rewards
+        first = self.first_child[node]
+        scale = self.exploration * math.sqrt(math.log(visits[node] or 1))     # a fresh root has no visits yet
+        best, best_value = first, -1.0
+        for child in range(first, first + self.num_children[node]):
+            child_visits = visits[child]
+            if child_visits == 0:
+                return child
+            value = rewards[child] / child_visits + scale / math.sqrt(child_visits)
+            if value > best_value:
+                best, best_value = child, value
+        return best
+
+
+    def playout(self, state: GameState) -> int:
+        '''Play random moves until the game is over.
+
+        Only the slots are written, the move stack of the state is left behind.
+
+        Args:
+            state: The position to play from, it is changed.
+
+        Returns:
+            The winner, X or O, EMPTY for a tie
+        '''
+        moves = state.legal_moves()
+        self.rng.shuffle(moves)
+        cells = state.cells
+        player = state.to_move()
+        for index in moves:
+            cells[index] = player
+            if state.is_line(index):
+                return player
+            player ^= X ^ O
+        return EMPTY
+
+
+    def run_playout(self) -> None:
+        '''Walk down the tree with UCT, expand a leaf, play it out and back up the result.
+        '''
+        state = self.state.copy()
+        node = 0
+        path = [0]
+        while self.status[node] == ONGOING:
+            if self.first_child[node] < 0:      # a leaf is expanded on its second visit
+                if (node and self.visits[node] == 0) or not self.expand(node, state):
+                    break
+            node = self.select_child(node)
+            index = self.move[node]
+            state.make_move(index)
+            if self.visits[node] == 0:      # the status is found on the first visit
+                if state.is_line(index):
+                    self.status[node] = WON
+                elif len(state.moves) == len(state.cells):
+                    self.status[node] = DRAWN
+            path.append(node)
+
+        status = self.status[node]
+        if status == WON:
+            winner = state.cells[self.move[node]]
+        elif status == DRAWN:
+            winner = EMPTY
+        else:
+            winner = self.playout(state)
+
+        mover = self.state.to_move() ^ X ^ O      # the root was reached by the opponent's move
+        visits = self.visits
+        rewards = self.rewards
+        for node in path:
+            visits[node] += 1
+            if winner == mover:
+                rewards[node] += 1.0
+            elif winner == EMPTY:
+                rewards[node] += 0.5
+            mover ^= X ^ O
+
+
+    def search(self, moves: List[int], budget: Optional[float] = None, max_playouts: Optional[int] = None) -> int:
+        '''Run playouts from a position until the budget is spent and pick the most visited move.
+
+        Args:
+            moves: The slot indices played from the empty board.
+            budget: The seconds of search, None for the budget of the search.
+            max_playouts: The number of playouts at most, None for no limit.
+
+        Returns:
+            The slot index of the move
+
+        Raises:
+            ValueError: if the game is already over
+        '''
+        self.advance(moves)
+        if self.state.is_over():
+            raise ValueError('The game is already over')
+
+        reused = self.visits[0]
+        start = time.perf_counter()
+        deadline = start + (self.budget if budget is None else budget)
+        playouts = 0
+        while time.perf_counter() < deadline and (max_playouts is None or playouts < max_playouts):
+            self.run_playout()
+            playouts += 1
+        seconds = time.perf_counter() - start
+
+        self.last_report = {
+            'playouts': playouts,
+            'seconds': seconds,
+            'playouts_per_second': playouts / seconds if seconds > 0 else 0.0,
+            'reused': reused,
+            'nodes': len(self),
+        }
+
+        first = self.first_child[0]
+        if first < 0:       # not even one playout, any legal move will do
+            return self.rng.choice(self.state.legal_moves())
+        best = max(range(first, first + self.num_children[0]), key=self.visits.__getitem__)
+        return self.move[best]
+
+
+    def root_visits(self) -> List[int]:
+        '''Count the playouts of every move of the root.
+
+        Returns:
+            A list indexed by slot, 0 for the slots that weren't searched
+        '''
+        counts = [0] * (self.size * self.size)
+        first = self.first_child[0]
+        if first >= 0:
+            for child in range(first, first + self.num_children[0]):
+                counts[self.move[child]] = self.visits[child]
+        return counts
+
+
+    def best_move(self, board: BoardClass, rng: Optional[random.Random] = None) -> Tuple[int, int]:
+        '''Search a gameboard and find the best move of the player to move.
+
+        Args:
+            board: The gameboard to search.
+            rng: The random generator of the playouts, None to keep the one of the search.
+
+        Returns:
+            The 1-based coordinates of the move
+
+        Raises:
+            ValueError: if the gameboard has another size or win length, or the game is over
+        '''
+        if board.size != self.size or board.win_length != self.win_length:
+            raise ValueError('The search is for %dx%d boards with %d in a row' % (self.size, self.size, self.win_length))
+        if rng is not None:
+            self.rng = rng
+        x, y = divmod(self.search(board.move_history), self.size)
+        return x + 1, y + 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the playouts per second of the MCTS player.')
+    parser.add_argument('--size', type=int, default=9)
+    parser.add_argument('--win-length', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=MOVE_BUDGET, help='seconds of search per move')
+    parser.add_argument('--moves', type=int, default=5, help='moves searched, the search plays both sides')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    mcts = MCTS(args.size, args.win_length, args.budget, rng=random.Random(args.seed))
+    played: List[int] = []
+    for _ in range(args.moves):
+        played.append(mcts.search(played))
+        report = mcts.last_report
+        print('move %d: %d playouts in %.2f s, %.0f playouts/s, %d reused, %d nodes' % (
+            len(played), report['playouts'], report['seconds'], report['playouts_per_second'],
+            report['reused'], report['nodes']))
+        if mcts.state.is_over() or len(played) == args.size * args.size:
+            break
@@ -0,0 +1,286 @@
+"""\
+This module provides opt-in latency histograms and counters for live matches.
+
+Instrumentation is off by default. When it is off, now() returns 0 and
+observe_since() returns at once, so the hot paths only pay two function
+calls. Once enabled, the metrics are served as Prometheus text on a local
+HTTP port and/or dumped to a JSON file periodically.
+
+Usage in a hot path:
+    started = metrics.now()
+    ...
+    metrics.NETWORK_RECEIVE.observe_since(started)
+
+Environment variables read by enable_from_env():
+    TTT_METRICS_PORT -- serve http://127.0.0.1:PORT/metrics
+    TTT_METRICS_JSON -- dump the metrics to this file every TTT_METRICS_INTERVAL seconds (default 10)
+
+Functions:
+now() -- get the start time of a measure, 0 when disabled
+enable() -- turn the instrumentation on and start the exporters
+serve_http() -- serve the Prometheus endpoint
+enable_from_env() -- call enable() with the environment variables
+render_prometheus() -- format all the metrics as Prometheus text
+snapshot() -- get all the metrics as a dict
+
+Classes:
+Histogram -- counts the observed latencies in buckets
+Counter -- counts events
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional
+
+ENABLED = False
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = 'tictactoe_'
+DUMP_INTERVAL = 10.0    # seconds between two JSON dumps
+
+
+def now() -> float:
+    '''Get the start time of a measure.
+
+    Returns:
+        The performance counter in seconds, 0 when the instrumentation is disabled
+    '''
+    if ENABLED:
+        return time.perf_counter()
+    return 0.0
+
+
+class Histogram:
+    '''A class to count latencies in buckets.
+
+    Attributes:
+        name(str): The name of the metric.
+        help(str): The description of the metric.
+        counts(list): The number of observations of each bucket, the last one is above all BUCKETS.
+        total(float): The sum of the observed seconds.
+    '''
+    def __init__(self, name: str, help: str) -> None:
+        '''Make an empty histogram.
+
+        Args:
+            name: The name of the metric.
+            help: The description of the metric.
+        '''
+        self.name = name
+        self.help = help
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+
+    def observe(self, seconds: float) -> None:
+        '''Count one latency.
+
+        Args:
+            seconds: The latency.
+        '''
+        with self.lock:
+            self.counts[bisect_left(BUCKETS, seconds)] += 1
+            self.total += seconds
+
+
+    def observe_since(self, started: float) -> None:
+        '''Count the latency since a start time returned by now().
+
+        Args:
+            started: The start time, 0 when the instrumentation was disabled.
+        '''
+        if started:
+            self.observe(time.perf_counter() - started)
+
+
+    def render(self) -> str:
+        '''Format the histogram as Prometheus text.
+
+        Returns:
+            The lines of the metric
+        '''
+        with self.lock:
+            counts, total = self.counts[:], self.total
+        lines = ['# HELP %s%s %s' % (PREFIX, self.name, self.help), '# TYPE %s%s histogram' % (PREFIX, self.name)]
+        cumulative = 0
+        for bound, count in zip(BUCKETS, counts):
+            cumulative += count
+            lines.append('%s%s_bucket{le="%g"} %d' % (PREFIX, self.name, bound, cumulative))
+        cumulative += counts[-1]
+        lines.append('%s%s_bucket{le="+Inf"} %d' % (PREFIX, self.name, cumulative))
+        lines.append('%s%s_sum %f' % (PREFIX, self.name, total))
+        lines.append('%s%s_count %d' % (PREFIX, self.name, cumulative))
+        return '\n'.join(lines)
+
+
+    def to_dict(self) -> Dict[str, object]:
+        '''Get the histogram as a dict.
+
+        Returns:
+            The bucket counts, the sum and the number of observations
+        '''
+        with self.lock:
+            return {
+                'buckets': dict(zip([str(bound) for bound in BUCKETS] + ['+Inf'], self.counts)),
+                'sum': self.total,
+                'count': sum(self.counts),
+            }
+
+
+class Counter:
+    '''A class to count events.
+
+    Attributes:
+        name(str): The name of the metric.
+        help(str): The description of the metric.
+        value(int): The number of events.
+    '''
+    def __init__(self, name: str, help: str) -> None:
+        '''Make a counter at 0.
+
+        Args:
+            name: The name of the metric.
+            help: The description of the metric.
+        '''
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.lock = threading.Lock()
+
+
+    def inc(self, amount: int = 1) -> None:
+        '''Count events if the instrumentation is enabled.
+
+        Args:
+            amount: The number of events.
+        '''
+        if ENABLED:
+            with self.lock:
+                self.value += amount
+
+
+    def render(self) -> str:
+        '''Format the counter as Prometheus text.
+
+        Returns:
+            The lines of the metric
+        '''
+        return '# HELP %s%s %s\n# TYPE %s%s counter\n%s%s %d' % (
+            PREFIX, self.name, self.help, PREFIX, self.name, PREFIX, self.name, self.value)
+
+
+NETWORK_RECEIVE = Histogram('network_receive_seconds', 'Time spent waiting for a frame from the opponent.')
+NETWORK_SEND = Histogram('network_send_seconds', 'Time spent sending a frame to the opponent.')
+BOARD_UPDATE = Histogram('board_update_seconds', 'Time spent in BoardClass.updateGameBoard.')
+WIN_CHECK = Histogram('win_check_seconds', 'Time spent in BoardClass.isWinner and boardIsFull.')
+UI_UPDATE = Histogram('ui_update_seconds', 'Time spent updating the Tk widgets.')
+GAMES = Counter('games_total', 'Games that have finished.')
+MOVES = Counter('moves_total', 'Moves that have been played.')
+RECONNECTS = Counter('reconnects_total', 'Connections that have been tried again.')
+
+HISTOGRAMS = (NETWORK_RECEIVE, NETWORK_SEND, BOARD_UPDATE, WIN_CHECK, UI_UPDATE)
+COUNTERS = (GAMES, MOVES, RECONNECTS)
+
+
+def render_prometheus() -> str:
+    '''Format all the metrics as Prometheus text.
+
+    Returns:
+        The text exposition of every metric
+    '''
+    return '\n'.join(metric.render() for metric in HISTOGRAMS + COUNTERS) + '\n'
+
+
+def snapshot() -> Dict[str, object]:
+    '''Get all the metrics as a dict.
+
+    Returns:
+        A dict from the metric names to their values
+    '''
+    metrics = {histogram.name: histogram.to_dict() for histogram in HISTOGRAMS}
+    metrics.update({counter.name: counter.value for counter in COUNTERS})
+    metrics['time'] = time.time()
+    return metrics
+
+
+def serve_http(port: int) -> None:
+    '''Serve the Prometheus endpoint in a daemon thread.
+
+    http.server is imported here, so the hot paths don't pay for it while the instrumentation is off.
+
+    Args:
+        port: The local port of the endpoint.
+    '''
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        '''A class to answer the Prometheus scrapes.'''
+        def do_GET(self) -> None:
+            '''Send the metrics for /metrics, 404 otherwise.'''
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+        def log_message(self, format: str, *args) -> None:
+            '''Keep the scrapes out of the console.'''
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+def dump_periodically(path: str, interval: float) -> None:
+    '''Write the metrics to a JSON file forever, run in a daemon thread.
+
+    Args:
+        path: The file to write.
+        interval: The seconds between two dumps.
+    '''
+    import json
+
+    while True:
+        time.sleep(interval)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as dump_file:
+            json.dump(snapshot(), dump_file)
+        os.replace(temp_path, path)     # readers never see a half-written file
+
+
+def enable(port: Optional[int] = None, dump_path: Optional[str] = None, interval: float = DUMP_INTERVAL) -> None:
+    '''Turn the instrumentation on and start the exporters.
+
+    Args:
+        port: The local port of the Prometheus endpoint, None for no endpoint.
+        dump_path: The JSON file to dump the metrics to, None for no dump.
+        interval: The seconds between two JSON dumps.
+    '''
+    global ENABLED
+    ENABLED = True
+
+    if port is not None:
+        serve_http(port)
+    if dump_path is not None:
+        threading.Thread(target=dump_periodically, args=(dump_path, interval), daemon=True).start()
+
+
+def enable_from_env() -> bool:
+    '''Turn the instrumentation on if TTT_METRICS_PORT or TTT_METRICS_JSON is set.
+
+    Returns:
+        True if the instrumentation is enabled, False otherwise
+    '''
+    port = os.environ.get('TTT_METRICS_PORT')
+    dump_path = os.environ.get('TTT_METRICS_JSON')
+    if not port and not dump_path:
+        return False
+
+    enable(int(port) if port else None, dump_path or None, float(os.environ.get('TTT_METRICS_INTERVAL', DUMP_INTERVAL)))
+    return True
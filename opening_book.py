@@ -0,0 +1,231 @@
+"""\
+This module provides a precomputed table of every 3x3 position.
+
+The book is built once with `python opening_book.py [path]`. It enumerates
+every position reachable from an empty gameboard and records the value and
+the best moves of each one in a binary file indexed by the base-3 code of the
+position (0 for an empty slot, 1 for 'x', 2 for 'o'). The file is loaded
+with mmap, so all the processes that read the book share one copy of its
+pages, and a lookup is a single array index without any search.
+
+File layout:
+    header -- MAGIC, version, board size, entry size and byte order
+    entries -- 3 ** 9 unsigned 16-bit entries in the byte order of the header
+               bits 0-8: mask of the best moves
+               bits 9-10: value for the player to move (VALUE_*)
+               bit 11: set when the position is reachable
+
+Functions:
+position_code() -- compute the base-3 code of a gameboard
+build_book() -- enumerate all the positions and write the book file
+get_book() -- get the book shared by the whole process, if it has been built
+
+Classes:
+OpeningBook -- read-only view of a book file
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+from gameboard import BoardClass
+from solver import get_solver
+
+MAGIC = b'TTTB'
+VERSION = 1
+SIZE = 3
+NUM_OF_SLOTS = SIZE * SIZE
+NUM_OF_ENTRIES = 3 ** NUM_OF_SLOTS
+HEADER = struct.Struct('<4sBBBB')   # magic, version, size, entry size, 1 for little-endian entries
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+
+VALUE_NONE, VALUE_WIN, VALUE_TIE, VALUE_LOSS = 0, 1, 2, 3   # VALUE_NONE is used when the game is over
+VALUE_SHIFT = 9
+REACHABLE = 1 << 11
+MOVES_MASK = (1 << NUM_OF_SLOTS) - 1
+
+CHESS_CODES = {'': 0, 'x': 1, 'o': 2}
+POWERS = tuple(3 ** index for index in range(NUM_OF_SLOTS))
+
+_books: Dict[str, Optional['OpeningBook']] = {}
+
+
+def position_code(board: BoardClass) -> int:
+    '''Compute the base-3 code of a 3x3 gameboard.
+
+    Args:
+        board: The gameboard to encode.
+
+    Returns:
+        The sum of the code of each slot times 3 to the power of its index
+    '''
+    code = 0
+    index = 0
+    for row in board.gameboard:
+        for chess in row:
+            code += CHESS_CODES[chess] * POWERS[index]
+            index += 1
+    return code
+
+
+def build_book(path: str = DEFAULT_PATH) -> int:
+    '''Enumerate every position reachable from an empty gameboard and write the book.
+
+    Args:
+        path: The path of the book file.
+
+    Returns:
+        The number of reachable positions
+    '''
+    solver = get_solver(SIZE, SIZE)
+    entries = array('H', bytes(2 * NUM_OF_ENTRIES))
+
+    def code_of(x_bits: int, o_bits: int) -> int:
+        code = 0
+        for index in range(NUM_OF_SLOTS):
+            if x_bits >> index & 1:
+                code += POWERS[index]
+            elif o_bits >> index & 1:
+                code += 2 * POWERS[index]
+        return code
+
+    def visit(me: int, opp: int, me_is_x: bool) -> None:
+        x_bits, o_bits = (me, opp) if me_is_x else (opp, me)
+        code = code_of(x_bits, o_bits)
+        if entries[code]:
+            return
+
+        values = solver.slot_values(me, opp)
+        entry = REACHABLE
+        if values:
+            best = max(values.values())
+            for index, value in values.items():
+                if value == best:
+                    entry |= 1 << index
+            if best > 0:
+                entry |= VALUE_WIN << VALUE_SHIFT
+            elif best == 0:
+                entry |= VALUE_TIE << VALUE_SHIFT
+            else:
+                entry |= VALUE_LOSS << VALUE_SHIFT
+        entries[code] = entry
+
+        for index in values:
+            new_me = me | 1 << index
+            if any(new_me & mask == mask for mask in solver.slot_masks[index]):    # The move ends the game with a win
+                x_bits, o_bits = (new_me, opp) if me_is_x else (opp, new_me)
+                entries[code_of(x_bits, o_bits)] = REACHABLE
+            else:
+                visit(opp, new_me, not me_is_x)
+
+    visit(0, 0, True)
+
+    if sys.byteorder != 'little':
+        entries.byteswap()
+    with open(path, 'wb') as book_file:
+        book_file.write(HEADER.pack(MAGIC, VERSION, SIZE, entries.itemsize, 1))
+        entries.tofile(book_file)
+
+    return sum(1 for entry in entries if entry)
+
+
+def get_book(path: str = DEFAULT_PATH) -> Optional['OpeningBook']:
+    '''Get the book shared by the whole process, mapped the first time it is requested.
+
+    Args:
+        path: The path of the book file.
+
+    Returns:
+        The shared book, None if the file doesn't exist
+    '''
+    if path not in _books:
+        _books[path] = OpeningBook(path) if os.path.exists(path) else None
+    return _books[path]
+
+
+class OpeningBook:
+    '''A class to look up positions in a memory-mapped book file.
+
+    Attributes:
+        path(str): The path of the book file.
+    '''
+    def __init__(self, path: str = DEFAULT_PATH) -> None:
+        '''Map a book file into memory.
+
+        Args:
+            path: The path of the book file, built beforehand by build_book().
+
+        Raises:
+            FileNotFoundError: if the book has not been built
+            ValueError: if the file is not a book of this version
+        '''
+        self.path = path
+        with open(path, 'rb') as book_file:
+            self.map = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, size, entry_size, little_endian = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or size != SIZE or entry_size != 2:
+            self.map.close()
+            raise ValueError('%s is not a version %d opening book' % (path, VERSION))
+        if little_endian != (sys.byteorder == 'little') or len(self.map) != HEADER.size + 2 * NUM_OF_ENTRIES:
+            self.map.close()
+            raise ValueError('%s does not match this machine, please build it again' % path)
+
+        self.entries = memoryview(self.map)[HEADER.size:].cast('H')
+
+
+    def close(self) -> None:
+        '''Unmap the book file.
+        '''
+        self.entries.release()
+        self.map.close()
+
+
+    def lookup(self, code: int) -> Tuple[int, int]:
+        '''Look up a position by its code.
+
+        Args:
+            code: The base-3 code of the position.
+
+        Returns:
+            The value for the player to move (VALUE_*) and the mask of the best moves
+
+        Raises:
+            KeyError: if the position can't be reached in a game
+        '''
+        entry = self.entries[code]
+        if not entry & REACHABLE:
+            raise KeyError(code)
+        return entry >> VALUE_SHIFT & 3, entry & MOVES_MASK
+
+
+    def best_moves(self, board: BoardClass) -> List[Tuple[int, int]]:
+        '''Find all the moves with the best value.
+
+        Args:
+            board: The 3x3 gameboard to look up.
+
+        Returns:
+            A list of 1-based coordinates, empty when the game is over
+        '''
+        moves = self.lookup(position_code(board))[1]
+        return [(index // SIZE + 1, index % SIZE + 1) for index in range(NUM_OF_SLOTS) if moves >> index & 1]
+
+
+    def value(self, board: BoardClass) -> int:
+        '''Look up the value of a gameboard for the player to move.
+
+        Args:
+            board: The 3x3 gameboard to look up.
+
+        Returns:
+            VALUE_WIN, VALUE_TIE or VALUE_LOSS, VALUE_NONE when the game is over
+        '''
+        return self.lookup(position_code(board))[0]
+
+
+if __name__ == '__main__':
+    book_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    print('Wrote {} positions to {}.'.format(build_book(book_path), book_path))
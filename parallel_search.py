@@ -0,0 +1,193 @@
+"""\
+This module provides a root-parallel MCTS that searches a move on every core.
+
+The socket thread of a player can only use one core, so the search of a move
+is handed to a process pool instead. Every worker keeps its own MCTS tree and
+searches the same position with its own random playouts for the whole
+budget, and the visit counts of the root moves of all the workers are added
+up to pick the move. The counts come back through one shared memory buffer,
+a row of size * size unsigned ints per worker, so only the list of moves is
+pickled on the way to the workers and a playout count on the way back.
+
+Functions:
+get_parallel_search() -- get the shared parallel search of a board size and win length
+
+Classes:
+ParallelSearch -- runs independent searches in a process pool and merges their visits
+"""
+
+import atexit
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from typing import Dict, List, Optional, Tuple
+from gameboard import BoardClass
+from mcts import MOVE_BUDGET, MCTS
+
+COUNT_TYPE = 'I'        # array type of a visit count in the shared buffer
+
+_parallel_searches: Dict[Tuple[int, int], 'ParallelSearch'] = {}
+_worker_buffer: Optional[shared_memory.SharedMemory] = None     # the shared buffer, attached once per worker
+_worker_search: Optional[MCTS] = None                           # the tree of the worker, reused between moves
+
+
+def get_parallel_search(size: int = 3, win_length: int = 3) -> 'ParallelSearch':
+    '''Get the parallel search shared by the whole process, its pool is shut down at exit.
+
+    Args:
+        size: The number of rows (and columns) of the board.
+        win_length: The number of chess in a row needed to win.
+
+    Returns:
+        The shared parallel search
+    '''
+    key = (size, win_length)
+    if key not in _parallel_searches:
+        search = ParallelSearch(size, win_length)
+        atexit.register(search.close)
+        _parallel_searches[key] = search
+    return _parallel_searches[key]
+
+
+def init_worker(buffer_name: str, size: int, win_length: int) -> None:
+    '''Attach a worker to the shared buffer and make its tree.
+
+    Args:
+        buffer_name: The name of the shared memory buffer.
+        size: The number of rows (and columns) of the board.
+        win_length: The number of chess in a row needed to win.
+    '''
+    global _worker_buffer, _worker_search
+    _worker_buffer = shared_memory.SharedMemory(name=buffer_name)
+    _worker_search = MCTS(size, win_length)
+
+
+def search_row(row: int, moves: List[int], budget: float, seed: int) -> int:
+    '''Search a position in a worker and write the visits of the root moves to a row of the buffer.
+
+    Args:
+        row: The row of the buffer to write.
+        moves: The slot indices played from the empty board.
+        budget: The seconds of search.
+        seed: The seed of the playouts, different for every row.
+
+    Returns:
+        The number of playouts
+    '''
+    _worker_search.rng = random.Random(seed)
+    _worker_search.search(moves, budget)
+    counts = array(COUNT_TYPE, _worker_search.root_visits()).tobytes()
+    start = row * len(counts)
+    _worker_buffer.buf[start:start + len(counts)] = counts
+    return _worker_search.last_report['playouts']
+
+
+class ParallelSearch:
+    '''A class to search the moves of a gameboard in a process pool.
+
+    Attributes:
+        size(int): The number of rows (and columns) of the board.
+        win_length(int): The number of chess in a row needed to win.
+        budget(float): The seconds of search per move.
+        workers(int): The number of processes, one search each.
+        executor(ProcessPoolExecutor): The pool, None until the first search.
+        buffer(SharedMemory): The visit counts, a row per worker, None until the first search.
+        last_report(dict): The playouts, seconds and playouts per second of the last search, all workers together.
+    '''
+    def __init__(self, size: int = 3, win_length: int = 3, budget: float = MOVE_BUDGET,
+                 workers: Optional[int] = None) -> None:
+        '''Make a parallel search, the processes are started by the first search.
+
+        Args:
+            size: The number of rows (and columns) of the board.
+            win_length: The number of chess in a row needed to win.
+            budget: The seconds of search per move.
+            workers: The number of processes, None for one per core.
+        '''
+        self.size = size
+        self.win_length = win_length
+        self.budget = budget
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.buffer = None
+        self.last_report = {}
+
+
+    def start(self) -> None:
+        '''Create the shared buffer and start the processes.
+        '''
+        row_bytes = self.size * self.size * array(COUNT_TYPE).itemsize
+        self.buffer = shared_memory.SharedMemory(create=True, size=row_bytes * self.workers)
+        self.executor = ProcessPoolExecutor(self.workers, get_context('spawn'), initializer=init_worker,
+                                            initargs=(self.buffer.name, self.size, self.win_length))
+        # Start every process now, so the first move isn't searched by fewer workers
+        for future in [self.executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+
+    def close(self) -> None:
+        '''Stop the processes and free the shared buffer.
+        '''
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer.unlink()
+            self.buffer = None
+
+
+    def search(self, moves: List[int], rng: random.Random, budget: Optional[float] = None) -> int:
+        '''Search a position in every worker and pick the move with the most visits overall.
+
+        Args:
+            moves: The slot indices played from the empty board.
+            rng: The random generator that seeds the workers.
+            budget: The seconds of search, None for the budget of the search.
+
+        Returns:
+            The slot index of the move
+        '''
+        if self.executor is None:
+            self.start()
+        budget = self.budget if budget is None else budget
+        start = time.perf_counter()
+        futures = [self.executor.submit(search_row, row, moves, budget, rng.getrandbits(32))
+                   for row in range(self.workers)]
+        playouts = sum(future.result() for future in futures)
+        seconds = time.perf_counter() - start
+
+        num_of_slots = self.size * self.size
+        counts = array(COUNT_TYPE)
+        counts.frombytes(self.buffer.buf[:num_of_slots * counts.itemsize * self.workers])   # the buffer may be rounded up to a page
+        totals = [sum(counts[index::num_of_slots]) for index in range(num_of_slots)]
+        self.last_report = {
+            'playouts': playouts,
+            'seconds': seconds,
+            'playouts_per_second': playouts / seconds,
+            'workers': self.workers,
+        }
+        played = set(moves)
+        return max((index for index in range(num_of_slots) if index not in played), key=totals.__getitem__)
+
+
+    def best_move(self, board: BoardClass, rng: random.Random) -> Tuple[int, int]:
+        '''Search a gameboard in every worker and find the best move of the player to move.
+
+        Args:
+            board: The gameboard to search.
+            rng: The random generator that seeds the workers.
+
+        Returns:
+            The 1-based coordinates of the move
+
+        Raises:
+            ValueError: if the gameboard has another size or win length
+        '''
+        if board.size != self.size or board.win_length != self.win_length:
+            raise ValueError('The search is for %dx%d boards with %d in a row' % (self.size, self.size, self.win_length))
+        x, y = divmod(self.search(board.move_history, rng), self.size)
+        return x + 1, y + 1
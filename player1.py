@@ -1,16 +1,19 @@
+import random
 import socket
-from tkinter import messagebox
-from threading import Thread
-from time import sleep
+import sys
+import time
+from threading import Event, Thread
 from gameboard import BoardClass
-from startup_dlg import StartupDlg
-from game_window import GameWindow
-from choice_dlg import ChoiceDlg
-import coordinate
+from game_window import GameWindow, player_options
+from sessions import restore_board
+from strategies import get_strategy
+import metrics
+import protocol
 
-RECV_SIZE = 1024    # read at most 1024 bytes
 PLAYER1_CHESS = '×'     # player1's chess is 'X'
 PLAYER2_CHESS = '◯'    # player1's chess is 'O'
+RESUME_ATTEMPTS = 10    # reconnections tried after a drop
+RESUME_DELAY = 1.0      # seconds between two reconnections
 
 # class Player1, GameWindow
 class Player1(GameWindow):
@@ -18,21 +21,41 @@ class Player1(GameWindow):
 
     Attributes:
         sock: Socket variable object.
+        reader: The reader of the frames sent by player2.
         player1_name(str): The username of player1.
         player2_name(str): The username of player2.
         on_move: On move function which is called when chessboard is clicked.
         exit_thread(bool): The boolean variable that controls the loop.
         sock_state(int): The integer of socket state.
+        move_event: The event that is set when player1 has moved.
+        host_info: The host and port of player2.
+        session_token(bytes): The token to resume the match after a drop.
+        strategy: The strategy that moves for player1, None to wait for clicks.
+        rng: The random generator of the strategy.
+        win_length(int): The number of chess in a row needed to win.
     """
-    def __init__(self) -> None:
-        """Make player1's gameboard."""
-        super(Player1, self).__init__(PLAYER1_CHESS)
+    def __init__(self, size: int = 3, win_length: int = 3, renderer: str = 'buttons') -> None:
+        """Make player1's gameboard.
+
+        Args:
+            size: The number of rows (and columns) of the gameboard, the same as player2's.
+            win_length: The number of chess in a row needed to win, the same as player2's.
+            renderer: 'buttons' or 'canvas', see GameWindow.
+        """
+        super(Player1, self).__init__(PLAYER1_CHESS, size, renderer)
+        self.win_length = win_length
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.reader = protocol.FrameReader(self.sock)
         self.player1_name = ''
         self.player2_name = ''
         self.on_move = self.on_player1_move     # on_move function，calls when chessboard is clicked
         self.exit_thread = False                # thread marker，True represents getting out from thread loop
         self.sock_state = 0                     # the socket state at present
+        self.move_event = Event()               # set by on_player1_move to wake up the socket thread
+        self.host_info = None
+        self.session_token = b''
+        self.strategy = None
+        self.rng = random.Random()
 
 
     def connect(self) -> bool:
@@ -44,6 +67,10 @@ class Player1(GameWindow):
         Returns:
             True if no error occurs, False otherwise.
         '''
+        from tkinter import messagebox     # the dialogs load tkinter, only when a window is shown
+        from startup_dlg import StartupDlg
+        from choice_dlg import ChoiceDlg
+
         user_choice = ''   # Set up a variable 'user_choice' that would be used later
         dlg = StartupDlg(True)
 
@@ -52,7 +79,8 @@ class Player1(GameWindow):
                 break
 
             try:
-                self.sock.connect(dlg.get_host_info())   # Connect to player2
+                self.host_info = dlg.get_host_info()
+                self.sock.connect(self.host_info)   # Connect to player2
                 self.player1_name = dlg.get_user_name()
                 self.sock_state = 1
                 dlg.destroy()
@@ -61,6 +89,7 @@ class Player1(GameWindow):
                 choice_dlg = ChoiceDlg('Connect fail: %s.\n\nDo you want to try again?' % msg)
                 user_choice = choice_dlg.run()
                 choice_dlg.destroy()
+                metrics.RECONNECTS.inc()
             except TypeError as msg:     # TypeError: wrong information type
                 messagebox.showwarning("Error", "Type Error: %s" % msg)
             except OverflowError as msg:     # OverflowError: fail to connect after a long time
@@ -72,25 +101,39 @@ class Player1(GameWindow):
         return False
 
 
+    def ask_play_again(self) -> str:
+        '''Ask the user whether to play again, on the Tk main loop.
+
+        Returns:
+            'y' for yes or 'n' for no.
+        '''
+        from choice_dlg import ChoiceDlg
+
+        dlg = ChoiceDlg('Would you want to play again?')
+        play_again_choice = dlg.run()
+        dlg.destroy()
+        return play_again_choice
+
+
     def check_play_again(self) -> bool:
         '''Check the user input choice for whether the user wants to play again.
 
+        The dialog runs on the Tk main loop, the socket thread waits for the choice.
+
         Returns:
             True represents yes or False represents no.
         '''
-        dlg = ChoiceDlg('Would you want to play again?')
-        play_again_choice = dlg.run() 
-        dlg.destroy()
+        play_again_choice = self.call_main(self.ask_play_again)     # None if the window was closed
 
         if play_again_choice == 'y':     # Justify whether player1 wants to start a new game
-            self.sock.sendall('Play Again'.encode())
+            self.sock.sendall(protocol.encode_frame(protocol.PLAY_AGAIN))
             self.gameboard.resetGameBoard()
             self.reset()
             return True
         else:
-            self.sock.sendall('Fun Times'.encode())
+            self.sock.sendall(protocol.encode_frame(protocol.FUN_TIMES))
             self.exit_thread = True
-            self.destroy()
+            self.call_main(self.destroy, wait=False)
             return False
 
 
@@ -104,16 +147,31 @@ class Player1(GameWindow):
             y(int): The y-coordinate of player1's move.
 
         '''
-        self.sock.sendall("{},{}".format(x, y).encode())
+        started = metrics.now()
+        try:
+            self.sock.sendall(protocol.encode_move(x, y))
+        except OSError:     # the socket thread resumes the match and the snapshot tells if the move arrived
+            pass
+        metrics.NETWORK_SEND.observe_since(started)
+
+        started = metrics.now()
         self.gameboard.updateGameBoard(self.gameboard.player1_name, x, y)
+        metrics.BOARD_UPDATE.observe_since(started)
+        metrics.MOVES.inc()
+
+        started = metrics.now()
+        game_over = self.gameboard.isWinner() or self.gameboard.boardIsFull()
+        metrics.WIN_CHECK.observe_since(started)
 
-        if self.gameboard.isWinner() or self.gameboard.boardIsFull():
+        if game_over:
+            metrics.GAMES.inc()
             self.sock_state = 3
             self.update_stats(self.gameboard)
         else:
             self.sock_state = 2
 
         self.enable_set(False)
+        self.move_event.set()
 
 
     def recv_player2_move(self) -> None:
@@ -125,12 +183,23 @@ class Player1(GameWindow):
         self.enable_set(False)
         self.update_turn("%s's turn" % self.player2_name)
 
-        player2_move = self.sock.recv(RECV_SIZE).decode()    #Receives player2's move
-        x, y = coordinate.parse_coordinate(player2_move)
+        started = metrics.now()
+        kind, payload = self.reader.read_frame()    #Receives player2's move
+        metrics.NETWORK_RECEIVE.observe_since(started)
+
+        x, y = protocol.decode_move(payload) if kind == protocol.MOVE else (-1, -1)
+        started = metrics.now()
         self.gameboard.updateGameBoard(self.player2_name, x, y)
+        metrics.BOARD_UPDATE.observe_since(started)
+        metrics.MOVES.inc()
         self.set(x, y, PLAYER2_CHESS)
 
-        if self.gameboard.isWinner() or self.gameboard.boardIsFull():
+        started = metrics.now()
+        game_over = self.gameboard.isWinner() or self.gameboard.boardIsFull()
+        metrics.WIN_CHECK.observe_since(started)
+
+        if game_over:
+            metrics.GAMES.inc()
             self.update_stats(self.gameboard)
             self.update_turn("")
             self.sock_state = 3
@@ -144,15 +213,32 @@ class Player1(GameWindow):
         """The socket thread function that does all the internet operations here."""
         while not self.exit_thread:
             if self.sock_state == 1:        # wait player1 move
-                sleep(1)
+                if self.strategy is not None:   # the strategy moves instead of a click
+                    self.enable_set(False)
+                    x, y = self.strategy(self.gameboard, self.rng)
+                    self.set(x, y, PLAYER1_CHESS)
+                    self.on_player1_move(x, y)
+                    continue
+                self.move_event.wait()
+                self.move_event.clear()
                 continue
 
             if self.sock_state == 2:      # receive player2 move
-                self.recv_player2_move()
+                try:
+                    self.recv_player2_move()
+                except OSError:     # ConnectionError too
+                    if not self.resume():
+                        break
                 continue
 
             if self.sock_state == 3:    # check play again
-                if not self.check_play_again():
+                try:
+                    play_again = self.check_play_again()
+                except OSError:
+                    if not self.resume():
+                        break
+                    continue
+                if not play_again:
                     break
 
                 self.update_turn("%s's turn" % self.player1_name)
@@ -160,16 +246,70 @@ class Player1(GameWindow):
                 self.sock_state = 1
 
 
+    def resume(self) -> bool:
+        '''Reconnect to player2 with the session token and restore the match from its snapshot.
+
+        Returns:
+            True if the match is resumed, False otherwise.
+        '''
+        self.sock.close()
+        self.enable_set(False)
+        self.update_turn("Reconnecting to %s" % self.player2_name)
+        for _ in range(RESUME_ATTEMPTS):
+            if self.exit_thread:
+                return False
+            metrics.RECONNECTS.inc()
+            try:
+                self.sock = socket.create_connection(self.host_info, timeout=RESUME_DELAY)
+                self.sock.settimeout(None)
+                self.reader = protocol.FrameReader(self.sock)
+                self.sock.sendall(protocol.encode_resume(self.session_token))
+                kind, payload = self.reader.read_frame()
+                break
+            except OSError:
+                time.sleep(RESUME_DELAY)
+        else:
+            self.update_turn("Lost the connection to %s" % self.player2_name)
+            return False
+
+        try:
+            if kind != protocol.SNAPSHOT:
+                raise ConnectionError('Expected a snapshot')
+            game_over = restore_board(self.gameboard, payload)
+        except (ConnectionError, ValueError):       # a malformed snapshot or a move that doesn't fit the board
+            self.update_turn("Lost the connection to %s" % self.player2_name)
+            return False
+        self.reset()
+        for turn, index in enumerate(self.gameboard.move_history):
+            self.set(index // self.size + 1, index % self.size + 1, PLAYER1_CHESS if turn % 2 == 0 else PLAYER2_CHESS)
+        self.update_stats(self.gameboard)
+
+        if game_over:
+            self.sock_state = 3
+            self.update_turn("")
+        elif len(self.gameboard.move_history) % 2 == 0:
+            self.sock_state = 1
+            self.update_turn("%s's turn" % self.player1_name)
+            self.enable_set(True)
+        else:
+            self.sock_state = 2
+        return True
+
+
     def play_game(self) -> None:
         '''Two players play the game
 
         Creates widget, gameboard and thread, then starts the game.
         '''
         self.create_widget()
-        self.sock.sendall(self.player1_name.encode())
-        self.player2_name = self.sock.recv(RECV_SIZE).decode()     # Receives player2's username
-
-        self.gameboard = BoardClass(self.player1_name, self.player2_name, self.player1_name)
+        self.sock.sendall(protocol.encode_hello(self.player1_name))
+        kind, payload = self.reader.read_frame()     # Receives player2's username
+        self.player2_name = payload.decode()
+        kind, payload = self.reader.read_frame()     # Receives the token to resume the match
+        self.session_token = payload if kind == protocol.SESSION else b''
+
+        self.gameboard = BoardClass(self.player1_name, self.player2_name, self.player1_name,
+                                    size=self.size, win_length=self.win_length)
         self.update_stats(self.gameboard)
         self.enable_set(True)
         self.update_turn("%s's turn" % self.player1_name)
@@ -180,13 +320,19 @@ class Player1(GameWindow):
         self.run()                      # start window mainloop
 
         self.exit_thread = True
+        self.move_event.set()           # wake up the thread if it waits for a move
         self.sock.close()
 
         t.join()                # wait thread exit
 
 
 if __name__ == '__main__':
-    player = Player1()
+    metrics.enable_from_env()
+    # python player1.py [STRATEGY|human [SIZE [WIN_LENGTH [RENDERER]]]], a strategy plays instead of clicks
+    strategy_name, board_size, board_win_length, board_renderer = player_options(sys.argv[1:])
+    player = Player1(board_size, board_win_length, board_renderer)
+    if strategy_name is not None:
+        player.strategy = get_strategy(strategy_name)
 
     if player.connect():
         player.play_game()
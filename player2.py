@@ -1,18 +1,21 @@
+import random
 import socket
-from tkinter import messagebox
-from threading import Thread
-from time import sleep
+import sys
+from threading import Event, Thread
 from unicodedata import numeric
 from gameboard import BoardClass
-from startup_dlg import StartupDlg
-from game_window import GameWindow
-from choice_dlg import ChoiceDlg
-import coordinate
+from game_window import GameWindow, player_options
+from stats_store import StatsStore
+from game_log import GameLogWriter, board_outcome
+from sessions import SessionCache
+from strategies import get_strategy
+import metrics
+import protocol
 
-RECV_SIZE = 1024    # read at most 1024 bytes
 PLAYER1_CHESS = '×'
 PLAYER2_CHESS = '◯'
 PLAYER2_USERNAME = 'player2'    # The username of player2
+GAME_LOG_PATH = 'tictactoe_games.log'   # The log of the moves of all the games
 
 
 class Player2(GameWindow):
@@ -24,20 +27,44 @@ class Player2(GameWindow):
         player2_name(str): The username of player2.
         on_move: On move function which is called when chessboard is clicked.
         conn_sock: The accepted socket.
+        reader: The reader of the frames sent by player1.
         exit_thread(bool): The boolean variable that controls the loop.
         sock_state(int): The integer of socket state.
+        move_event: The event that is set when player2 has moved.
+        stats_store: The store that keeps the results of all the games, None to keep nothing.
+        game_log: The log that keeps the moves of all the games, None to keep nothing.
+        sessions: The sessions of player1, so that it can resume after a drop.
+        session: The session of the current match.
+        strategy: The strategy that moves for player2, None to wait for clicks.
+        rng: The random generator of the strategy.
+        win_length(int): The number of chess in a row needed to win.
     """
-    def __init__(self) -> None:
-        """Make player1's gameboard."""
-        super(Player2, self).__init__(PLAYER2_CHESS)
+    def __init__(self, size: int = 3, win_length: int = 3, renderer: str = 'buttons') -> None:
+        """Make player1's gameboard.
+
+        Args:
+            size: The number of rows (and columns) of the gameboard, the same as player1's.
+            win_length: The number of chess in a row needed to win, the same as player1's.
+            renderer: 'buttons' or 'canvas', see GameWindow.
+        """
+        super(Player2, self).__init__(PLAYER2_CHESS, size, renderer)
+        self.win_length = win_length
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.player1_name = ''
         self.player2_name = PLAYER2_USERNAME
         self.on_move = self.on_player2_move
 
         self.conn_sock = None
+        self.reader = None
         self.exit_thread = False
         self.sock_state = 0
+        self.move_event = Event()       # set by on_player2_move to wake up the socket thread
+        self.stats_store = None
+        self.game_log = None
+        self.sessions = SessionCache()
+        self.session = None
+        self.strategy = None
+        self.rng = random.Random()
  
 
     def setup_server(self) -> bool:
@@ -48,6 +75,9 @@ class Player2(GameWindow):
         Returns:
             True if no error occurs, False otherwise.
         '''
+        from tkinter import messagebox     # the dialogs load tkinter, only when a window is shown
+        from startup_dlg import StartupDlg
+
         dlg = StartupDlg(False)
 
         while True:
@@ -81,12 +111,25 @@ class Player2(GameWindow):
         self.enable_set(False)
         self.update_turn("%s's turn" % self.player1_name)
 
-        player1_move = self.conn_sock.recv(RECV_SIZE).decode()     # receive player1's move
-        x, y = coordinate.parse_coordinate(player1_move)
+        started = metrics.now()
+        kind, payload = self.reader.read_frame()     # receive player1's move
+        metrics.NETWORK_RECEIVE.observe_since(started)
+
+        x, y = protocol.decode_move(payload) if kind == protocol.MOVE else (-1, -1)
+        started = metrics.now()
         self.gameboard.updateGameBoard(self.player1_name, x, y)
+        metrics.BOARD_UPDATE.observe_since(started)
+        metrics.MOVES.inc()
         self.set(x, y, PLAYER1_CHESS)
 
-        if self.gameboard.isWinner() or self.gameboard.boardIsFull():
+        started = metrics.now()
+        won = self.gameboard.isWinner()
+        game_over = won or self.gameboard.boardIsFull()
+        metrics.WIN_CHECK.observe_since(started)
+
+        if game_over:
+            metrics.GAMES.inc()
+            self.record_game(won)
             self.update_stats(self.gameboard)
             self.sock_state = 3
             self.update_turn("")
@@ -104,15 +147,46 @@ class Player2(GameWindow):
             x: The x-coordinate of the slot.
             y: The y-coordinate of the slot.
         '''
-        self.conn_sock.sendall("{},{}".format(x, y).encode())
+        started = metrics.now()
+        try:
+            self.conn_sock.sendall(protocol.encode_move(x, y))
+        except OSError:     # player1 dropped, it gets the move in the snapshot when it resumes
+            pass
+        metrics.NETWORK_SEND.observe_since(started)
+
+        started = metrics.now()
         self.gameboard.updateGameBoard(self.player2_name, x, y)
+        metrics.BOARD_UPDATE.observe_since(started)
+        metrics.MOVES.inc()
 
-        if self.gameboard.isWinner() or self.gameboard.boardIsFull():
+        started = metrics.now()
+        won = self.gameboard.isWinner()
+        game_over = won or self.gameboard.boardIsFull()
+        metrics.WIN_CHECK.observe_since(started)
+
+        if game_over:
+            metrics.GAMES.inc()
+            self.record_game(won)
             self.update_stats(self.gameboard)
             self.sock_state = 3
         else:
             self.sock_state = 1
 
+        self.move_event.set()
+
+
+    def record_game(self, won: bool) -> None:
+        '''Keep the finished game in the stats store and the game log, if there are ones.
+
+        Args:
+            won: True if the last player won, False for a tie.
+        '''
+        if self.stats_store is not None:
+            winner = self.gameboard.last_player if won else None
+            self.stats_store.record_game(self.player1_name, self.player2_name, winner)
+        if self.game_log is not None:
+            self.game_log.write_game(self.gameboard, board_outcome(self.gameboard, won))
+
 
     def recv_play_again(self) -> bool:
         '''Receives player1's choice for whether the user wants to try again.
@@ -120,8 +194,8 @@ class Player2(GameWindow):
         Returns
             True represents yes or False represents no.
         '''
-        choice = self.conn_sock.recv(RECV_SIZE).decode()     # receive player1's choice
-        if choice == 'Play Again':
+        kind, payload = self.reader.read_frame()     # receive player1's choice
+        if kind == protocol.PLAY_AGAIN:
             self.gameboard.resetGameBoard()
             self.reset()
             return True
@@ -135,25 +209,41 @@ class Player2(GameWindow):
         """The socket thread function that does all the internet operations here."""
         while not self.exit_thread:
             if self.sock_state == 0:        # wait connected
-                self.accept()
-                self.sock_state = 1
+                if self.accept():
+                    self.sock_state = 1
                 continue
 
             if self.sock_state == 1:      # receive player1 move
-                self.recv_player1_move()
+                try:
+                    self.recv_player1_move()
+                except OSError:     # ConnectionError too
+                    self.wait_resume()
                 continue
 
             if self.sock_state == 2:       # wait player2 move
-                sleep(1)
+                if self.strategy is not None:   # the strategy moves instead of a click
+                    self.enable_set(False)
+                    x, y = self.strategy(self.gameboard, self.rng)
+                    self.set(x, y, PLAYER2_CHESS)
+                    self.on_player2_move(x, y)
+                    continue
+                self.move_event.wait()
+                self.move_event.clear()
                 continue
 
             if self.sock_state == 3:      # receive play again choice
-                if self.recv_play_again():
+                try:
+                    play_again = self.recv_play_again()
+                except OSError:
+                    self.wait_resume()
+                    continue
+                if play_again:
                     self.sock_state = 1
                     self.update_turn("%s's turn" % self.player1_name)
                     self.enable_set(True)
                 else:
                     self.sock_state = 0
+                    self.sessions.discard(self.session.token)
                     self.conn_sock.close()
                     self.conn_sock = None
                 continue
@@ -163,20 +253,96 @@ class Player2(GameWindow):
             self.conn_sock = None
 
 
-    def accept(self) -> None:
-        """Accepts incoming connection, and creates gameboard. """
+    def accept(self) -> bool:
+        """Accepts incoming connection, and creates gameboard.
+
+        Returns:
+            True if player1 has joined, False otherwise.
+        """
         try:
             self.conn_sock, addr = self.sock.accept()
-
-            self.player1_name = self.conn_sock.recv(RECV_SIZE).decode() # receive player1_username
-            self.conn_sock.sendall(self.player2_name.encode())
-
-            self.gameboard = BoardClass(self.player1_name, self.player2_name, self.player2_name)
+            self.reader = protocol.FrameReader(self.conn_sock)
+
+            kind, payload = self.reader.read_frame()    # receive player1_username
+            if kind != protocol.HELLO:      # e.g. the RESUME of a match that has expired
+                self.conn_sock.close()
+                return False
+            self.player1_name = payload.decode()
+            self.session = self.sessions.create(self.player1_name, pinned=True)     # no TTL while player1 is connected
+            self.conn_sock.sendall(protocol.encode_hello(self.player2_name) + protocol.encode_session(self.session.token))
+
+            self.gameboard = BoardClass(self.player1_name, self.player2_name, self.player2_name,
+                                        size=self.size, win_length=self.win_length)
             self.update_stats(self.gameboard)
             self.enable_set(False)
             self.update_turn("%s's turn" % self.player1_name)
+            return True
         except:
+            return False
+
+
+    def snapshot(self) -> bytes:
+        """Build the SNAPSHOT of the match for player1.
+
+        Returns:
+            The frame with the moves so far and the stats of player1
+        """
+        board = self.gameboard
+        return protocol.encode_snapshot(board.size, board.win_length, board.move_history,
+                                        (board.num_of_losses, board.num_of_wins, board.num_of_ties))
+
+
+    def wait_resume(self) -> bool:
+        """Wait for player1 to reconnect with its session token after a drop.
+
+        Other connections are turned away until the session expires, then a new player1 can join.
+
+        Returns:
+            True if player1 resumed, False otherwise.
+        """
+        self.conn_sock.close()
+        self.enable_set(False)
+        self.update_turn("Waiting for %s to reconnect" % self.player1_name)
+        clock = self.sessions.clock
+        session = self.sessions.unpin(self.session.token)      # the TTL starts at the drop
+        deadline = session.expires_at if session is not None else clock()
+        try:
+            while not self.exit_thread and clock() < deadline:
+                self.sock.settimeout(deadline - clock())
+                conn_sock, addr = self.sock.accept()
+                conn_sock.settimeout(deadline - clock())
+                reader = protocol.FrameReader(conn_sock)
+                try:
+                    kind, payload = reader.read_frame()
+                except OSError:
+                    conn_sock.close()
+                    continue
+                if kind != protocol.RESUME or self.sessions.get(payload) is not self.session:
+                    conn_sock.close()
+                    continue
+
+                conn_sock.settimeout(None)
+                self.sessions.pin(self.session.token)
+                self.conn_sock, self.reader = conn_sock, reader
+                self.conn_sock.sendall(self.snapshot())
+                if self.sock_state == 2:
+                    self.enable_set(True)
+                    self.update_turn("%s's turn" % self.player2_name)
+                elif self.sock_state == 1:
+                    self.update_turn("%s's turn" % self.player1_name)
+                return True
+        except OSError:     # the timeout, or the window is closed
             pass
+        finally:
+            if not self.exit_thread:
+                self.sock.settimeout(None)
+
+        self.sessions.discard(self.session.token)
+        self.conn_sock = None
+        self.sock_state = 0
+        self.reset()
+        self.update_turn("")
+        return False
 
 
     def play_game(self) -> None:
@@ -192,6 +358,7 @@ class Player2(GameWindow):
         self.run()                      # start window mainloop
 
         self.exit_thread = True
+        self.move_event.set()           # wake up the thread if it waits for a move
 
         if self.conn_sock:
             self.conn_sock.close()
@@ -199,11 +366,22 @@ class Player2(GameWindow):
         self.sock.close()
 
         t.join()                # wait thread exit
+        if self.stats_store is not None:
+            self.stats_store.close()
+        if self.game_log is not None:
+            self.game_log.close()
         self.destroy()
 
 
 if __name__ == '__main__':
-    player = Player2()
+    metrics.enable_from_env()
+    # python player2.py [STRATEGY|human [SIZE [WIN_LENGTH [RENDERER]]]], a strategy plays instead of clicks
+    strategy_name, board_size, board_win_length, board_renderer = player_options(sys.argv[1:])
+    player = Player2(board_size, board_win_length, board_renderer)
+    player.stats_store = StatsStore()
+    player.game_log = GameLogWriter(GAME_LOG_PATH)
+    if strategy_name is not None:
+        player.strategy = get_strategy(strategy_name)
 
     if player.setup_server():
         player.play_game()
@@ -0,0 +1,310 @@
+"""\
+This module provides the framed binary protocol spoken between the players.
+
+Every message is a frame made of a 3-byte header, the message type and the
+length of the payload, followed by the payload. Frames are read through a
+buffer, so messages split over several TCP segments or sent back to back in
+one segment are both parsed correctly.
+
+Message types:
+    HELLO -- the username of the sender, in utf-8
+    MOVE -- the 1-based x and y coordinates of a slot, one byte each
+    PLAY_AGAIN -- player1 wants to play again, no payload
+    FUN_TIMES -- player1 is done, no payload
+    START -- sent by the game server, the role (1 or 2) then the opponent's username
+    WATCH -- sent by a spectator to the game server, the username of a player to watch
+    SNAPSHOT -- the size, the win length, the wins, losses and ties of the
+                receiver, then the slot index (x * size + y) of every move of
+                the game so far, two bytes each
+    SESSION -- sent by the host once a match starts, the token to resume it
+    RESUME -- sent by a player that reconnects instead of HELLO, its token
+
+Functions:
+encode_frame() -- build a frame from a type and a payload
+encode_hello() -- build a HELLO frame
+encode_move() -- build a MOVE frame
+encode_start() -- build a START frame
+encode_watch() -- build a WATCH frame
+encode_snapshot() -- build a SNAPSHOT frame
+encode_session() -- build a SESSION frame
+encode_resume() -- build a RESUME frame
+decode_move() -- read the coordinates of a MOVE payload
+decode_start() -- read the role and the opponent of a START payload
+decode_snapshot() -- read the shape, the stats and the moves of a SNAPSHOT payload
+read_frame_async() -- read one frame from an asyncio stream
+
+Classes:
+FrameDecoder -- splits a byte stream into frames
+FrameReader -- reads frames from a blocking socket
+"""
+
+import struct
+from collections import deque
+from typing import TYPE_CHECKING, List, Sequence, Tuple
+
+if TYPE_CHECKING:       # only for the annotations, the blocking clients don't pay for importing asyncio
+    import asyncio
+    import socket
+
+HELLO = 1
+MOVE = 2
+PLAY_AGAIN = 3
+FUN_TIMES = 4
+START = 5
+WATCH = 6
+SNAPSHOT = 7
+SESSION = 8
+RESUME = 9
+
+HEADER = struct.Struct('!BH')       # message type, payload length
+MOVE_PAYLOAD = struct.Struct('!BB')     # x, y
+SNAPSHOT_HEADER = struct.Struct('!BBHHH')  # size, win length, wins, losses, ties
+RECV_SIZE = 4096    # read at most 4096 bytes from the socket at once
+
+Frame = Tuple[int, bytes]
+
+
+def encode_frame(kind: int, payload: bytes = b'') -> bytes:
+    '''Build a frame.
+
+    Args:
+        kind: The message type.
+        payload: The payload of the message.
+
+    Returns:
+        The header followed by the payload
+    '''
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+def encode_hello(name: str) -> bytes:
+    '''Build a HELLO frame.
+
+    Args:
+        name: The username of the sender.
+
+    Returns:
+        The frame
+    '''
+    return encode_frame(HELLO, name.encode())
+
+
+def encode_move(x: int, y: int) -> bytes:
+    '''Build a MOVE frame.
+
+    Args:
+        x: The 1-based x-coordinate of the slot.
+        y: The 1-based y-coordinate of the slot.
+
+    Returns:
+        The frame
+    '''
+    return encode_frame(MOVE, MOVE_PAYLOAD.pack(x, y))
+
+
+def encode_start(role: int, opponent: str) -> bytes:
+    '''Build a START frame.
+
+    Args:
+        role: 1 if the receiver moves first, 2 otherwise.
+        opponent: The username of the opponent.
+
+    Returns:
+        The frame
+    '''
+    return encode_frame(START, bytes((role,)) + opponent.encode())
+
+
+def encode_watch(name: str) -> bytes:
+    '''Build a WATCH frame.
+
+    Args:
+        name: The username of the player to watch.
+
+    Returns:
+        The frame
+    '''
+    return encode_frame(WATCH, name.encode())
+
+
+def encode_snapshot(size: int, win_length: int, moves: Sequence[int],
+                    stats: Tuple[int, int, int] = (0, 0, 0)) -> bytes:
+    '''Build a SNAPSHOT frame.
+
+    Args:
+        size: The number of rows (and columns) of the gameboard.
+        win_length: The number of chess in a row needed to win.
+        moves: The slot index of every move so far, player1 first.
+        stats: The number of wins, losses and ties of the receiver, zeros for a spectator.
+
+    Returns:
+        The frame
+    '''
+    stats = tuple(min(count, 0xFFFF) for count in stats)   # two bytes each, long matches saturate
+    return encode_frame(SNAPSHOT, SNAPSHOT_HEADER.pack(size, win_length, *stats)
+                        + struct.pack('!%dH' % len(moves), *moves))
+
+
+def encode_session(token: bytes) -> bytes:
+    '''Build a SESSION frame.
+
+    Args:
+        token: The token of the session.
+
+    Returns:
+        The frame
+    '''
+    return encode_frame(SESSION, token)
+
+
+def encode_resume(token: bytes) -> bytes:
+    '''Build a RESUME frame.
+
+    Args:
+        token: The token of the session.
+
+    Returns:
+        The frame
+    '''
+    return encode_frame(RESUME, token)
+
+
+def decode_move(payload: bytes) -> Tuple[int, int]:
+    '''Read the coordinates of a MOVE payload.
+
+    Args:
+        payload: The payload of the frame.
+
+    Returns:
+        The 1-based x and y coordinates, (-1, -1) if the payload is invalid
+    '''
+    if len(payload) != MOVE_PAYLOAD.size:
+        return -1, -1
+    return MOVE_PAYLOAD.unpack(payload)
+
+
+def decode_start(payload: bytes) -> Tuple[int, str]:
+    '''Read a START payload.
+
+    Args:
+        payload: The payload of the frame.
+
+    Returns:
+        The role of the receiver and the username of the opponent
+
+    Raises:
+        ConnectionError: if the payload isn't a valid START
+    '''
+    if len(payload) < 2 or payload[0] not in (1, 2):
+        raise ConnectionError('Malformed START frame')
+    try:
+        return payload[0], payload[1:].decode()
+    except UnicodeDecodeError:
+        raise ConnectionError('Malformed START frame') from None
+
+
+def decode_snapshot(payload: bytes) -> Tuple[int, int, Tuple[int, int, int], Tuple[int, ...]]:
+    '''Read a SNAPSHOT payload.
+
+    Args:
+        payload: The payload of the frame.
+
+    Returns:
+        The size, the win length, the wins, losses and ties of the receiver and the slot index of every move
+
+    Raises:
+        ConnectionError: if the payload isn't a valid SNAPSHOT
+    '''
+    if len(payload) < SNAPSHOT_HEADER.size or (len(payload) - SNAPSHOT_HEADER.size) % 2:
+        raise ConnectionError('Malformed SNAPSHOT frame')
+    size, win_length, wins, losses, ties = SNAPSHOT_HEADER.unpack_from(payload)
+    num_of_moves = (len(payload) - SNAPSHOT_HEADER.size) // 2
+    moves = struct.unpack_from('!%dH' % num_of_moves, payload, SNAPSHOT_HEADER.size)
+    return size, win_length, (wins, losses, ties), moves
+
+
+async def read_frame_async(reader: 'asyncio.StreamReader') -> Frame:
+    '''Read one frame from an asyncio stream.
+
+    Args:
+        reader: The stream to read.
+
+    Returns:
+        The message type and the payload
+
+    Raises:
+        asyncio.IncompleteReadError: if the stream ends in the middle of a frame
+    '''
+    kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    payload = await reader.readexactly(length) if length else b''
+    return kind, payload
+
+
+class FrameDecoder:
+    '''A class to split a byte stream into frames.
+
+    Attributes:
+        buffer(bytearray): The bytes received but not parsed yet.
+    '''
+    def __init__(self) -> None:
+        '''Make a decoder with an empty buffer.'''
+        self.buffer = bytearray()
+
+
+    def feed(self, data: bytes) -> List[Frame]:
+        '''Add received bytes and parse all the complete frames.
+
+        Args:
+            data: The bytes received.
+
+        Returns:
+            A list of message types and payloads, empty if no frame is complete yet
+        '''
+        self.buffer += data
+        frames = []
+        start = 0
+        while len(self.buffer) - start >= HEADER.size:
+            kind, length = HEADER.unpack_from(self.buffer, start)
+            end = start + HEADER.size + length
+            if len(self.buffer) < end:      # the rest of the frame hasn't arrived
+                break
+            frames.append((kind, bytes(self.buffer[start + HEADER.size:end])))
+            start = end
+        del self.buffer[:start]
+        return frames
+
+
+class FrameReader:
+    '''A class to read frames from a blocking socket.
+
+    Attributes:
+        sock: The socket to read.
+        decoder(FrameDecoder): The decoder of the received bytes.
+        frames(deque): The frames parsed but not read yet.
+    '''
+    def __init__(self, sock: 'socket.socket') -> None:
+        '''Make a reader.
+
+        Args:
+            sock: The socket to read.
+        '''
+        self.sock = sock
+        self.decoder = FrameDecoder()
+        self.frames = deque()
+
+
+    def read_frame(self) -> Frame:
+        '''Read one frame, blocking until it has fully arrived.
+
+        Returns:
+            The message type and the payload
+
+        Raises:
+            ConnectionError: if the socket is closed by the peer
+        '''
+        while not self.frames:
+            data = self.sock.recv(RECV_SIZE)
+            if not data:
+                raise ConnectionError('The connection is closed by the peer')
+            self.frames.extend(self.decoder.feed(data))
+        return self.frames.popleft()
@@ -0,0 +1,135 @@
+"""\
+This module provides a headless driver that plays strategies against each other.
+
+Games are played directly on BoardClass without any window or socket. The
+games are split into chunks that run in a process pool, and the tallies of
+every chunk are streamed back as soon as it is done. The tallies are from
+player1's point of view and use the names of the BoardClass counters.
+
+Usage:
+    python selfplay.py STRATEGY1 STRATEGY2 [--games N] [--workers N] [--chunk N] [--size N] [--win-length N]
+
+Functions:
+play_one_game() -- play one game on a gameboard
+play_chunk() -- play a chunk of games and count the results
+run_selfplay() -- fan the chunks out to a process pool and stream the tallies
+"""
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, Optional, Tuple
+from gameboard import BoardClass
+from strategies import Strategy, get_strategy
+
+PLAYER1_NAME = 'player1'
+PLAYER2_NAME = 'player2'
+CHUNK_SIZE = 1000   # games played by a worker before it reports back
+
+
+def play_one_game(board: BoardClass, strategy1: Strategy, strategy2: Strategy, rng: random.Random) -> None:
+    '''Play one game from an empty gameboard, the result is counted by the gameboard.
+
+    Args:
+        board: The gameboard, player1 is the current user.
+        strategy1: The strategy of player1, which moves first.
+        strategy2: The strategy of player2.
+        rng: The random generator passed to the strategies.
+    '''
+    board.resetGameBoard()
+    players = ((PLAYER1_NAME, strategy1), (PLAYER2_NAME, strategy2))
+    turn = 0
+    while True:
+        name, strategy = players[turn]
+        board.updateGameBoard(name, *strategy(board, rng))
+        if board.isWinner() or board.boardIsFull():
+            return
+        turn = 1 - turn
+
+
+def play_chunk(strategy1: str, strategy2: str, num_of_games: int, seed: int,
+               size: int = 3, win_length: int = 3) -> Dict[str, int]:
+    '''Play a chunk of games between two strategies.
+
+    Args:
+        strategy1: The name of player1's strategy.
+        strategy2: The name of player2's strategy.
+        num_of_games: The number of games to play.
+        seed: The seed of the random generator.
+        size: The number of rows (and columns) of the gameboard.
+        win_length: The number of chess in a row needed to win.
+
+    Returns:
+        A dict with num_of_wins, num_of_losses and num_of_ties of player1
+    '''
+    board = BoardClass(PLAYER1_NAME, PLAYER2_NAME, PLAYER1_NAME, backend='bitboard', size=size, win_length=win_length)
+    first, second = get_strategy(strategy1), get_strategy(strategy2)
+    rng = random.Random(seed)
+    for _ in range(num_of_games):
+        play_one_game(board, first, second, rng)
+    return {
+        'num_of_wins': board.num_of_wins,
+        'num_of_losses': board.num_of_losses,
+        'num_of_ties': board.num_of_ties,
+    }
+
+
+def run_selfplay(strategy1: str, strategy2: str, num_of_games: int, workers: Optional[int] = None,
+                 chunk_size: int = CHUNK_SIZE, size: int = 3, win_length: int = 3,
+                 seed: int = 0) -> Iterator[Tuple[Dict[str, int], float]]:
+    '''Play games in a process pool and stream the running tallies.
+
+    Args:
+        strategy1: The name of player1's strategy.
+        strategy2: The name of player2's strategy.
+        num_of_games: The total number of games.
+        workers: The number of processes, None for one per core.
+        chunk_size: The number of games in each chunk.
+        size: The number of rows (and columns) of the gameboard.
+        win_length: The number of chess in a row needed to win.
+        seed: The seed of the first chunk, each chunk uses the next one.
+
+    Yields:
+        The tallies so far and the number of games played per second so far, once per finished chunk
+    '''
+    get_strategy(strategy1)     # fail here rather than in the workers
+    get_strategy(strategy2)
+
+    totals = {'num_of_wins': 0, 'num_of_losses': 0, 'num_of_ties': 0}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for chunk_id, first_game in enumerate(range(0, num_of_games, chunk_size)):
+            games = min(chunk_size, num_of_games - first_game)
+            futures.append(executor.submit(play_chunk, strategy1, strategy2, games, seed + chunk_id, size, win_length))
+
+        for future in as_completed(futures):
+            for key, count in future.result().items():
+                totals[key] += count
+            played = totals['num_of_wins'] + totals['num_of_losses'] + totals['num_of_ties']
+            yield dict(totals), played / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play strategies against each other without a window.')
+    parser.add_argument('strategy1', help='strategy of player1, who moves first')
+    parser.add_argument('strategy2', help='strategy of player2')
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk', type=int, default=CHUNK_SIZE, help='games played by a worker at once')
+    parser.add_argument('--size', type=int, default=3)
+    parser.add_argument('--win-length', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tallies, rate = {}, 0.0
+    for tallies, rate in run_selfplay(args.strategy1, args.strategy2, args.games, args.workers, args.chunk,
+                                      args.size, args.win_length, args.seed):
+        pass
+    print('The number of games is {}.'.format(sum(tallies.values())))
+    print('The number of wins is {}.'.format(tallies['num_of_wins']))
+    print('The number of losses is {}.'.format(tallies['num_of_losses']))
+    print('The number of ties is {}.'.format(tallies['num_of_ties']))
+    print('Played {:.0f} games per second with {} workers.'.format(rate, args.workers))
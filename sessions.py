@@ -0,0 +1,203 @@
+"""\
+This module provides the session tokens that let a dropped player resume.
+
+A session is created for every seat of a match and its random token is sent
+to the player. If the connection drops, the player reconnects with the
+token and the host sends back one SNAPSHOT with the board, the move stack
+and the stats, instead of replaying the match. Sessions live in a cache
+ordered by expiry: every use pushes a session to the end, so the expired
+ones are always at the front and are evicted in O(1) each.
+
+The session of a seat that is connected is pinned and never expires, however
+long the player thinks. The host unpins it when it sees the drop, which
+starts the TTL of the reconnection, and pins it again once the player is back.
+
+Functions:
+restore_board() -- bring a gameboard to the state of a snapshot
+
+Classes:
+Session -- the seat of one player
+SessionCache -- the live sessions of a host, evicted after a TTL
+"""
+
+import secrets
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+from gameboard import BoardClass
+import protocol
+
+SESSION_TTL = 60.0      # seconds a session lives without being used
+TOKEN_BYTES = 16
+
+
+class Session:
+    '''A class to hold the seat of one player.
+
+    Attributes:
+        token(bytes): The random token sent to the player.
+        name(str): The username of the player.
+        value: The state the host keeps for the player, e.g. its connection.
+        expires_at(float): The time the session is evicted unless it is used.
+    '''
+    __slots__ = ('token', 'name', 'value', 'expires_at')
+
+    def __init__(self, token: bytes, name: str, value: object, expires_at: float) -> None:
+        '''Make a session.
+
+        Args:
+            token: The random token.
+            name: The username of the player.
+            value: The state the host keeps for the player.
+            expires_at: The time the session is evicted unless it is used.
+        '''
+        self.token = token
+        self.name = name
+        self.value = value
+        self.expires_at = expires_at
+
+
+class SessionCache:
+    '''A class to keep the live sessions and evict them after a TTL.
+
+    Attributes:
+        ttl(float): The seconds a session lives without being used.
+        clock: The function that returns the current time in seconds, for the expiry and the waits on it.
+        sessions(OrderedDict): The sessions that expire by token, the first one expires first.
+        pinned(dict): The sessions that don't expire by token.
+    '''
+    def __init__(self, ttl: float = SESSION_TTL, clock: Callable[[], float] = time.monotonic) -> None:
+        '''Make an empty cache.
+
+        Args:
+            ttl: The seconds a session lives without being used.
+            clock: The function that returns the current time in seconds.
+        '''
+        self.ttl = ttl
+        self.clock = clock
+        self.sessions = OrderedDict()
+        self.pinned = {}
+
+
+    def __len__(self) -> int:
+        '''Get the number of live sessions.'''
+        return len(self.sessions) + len(self.pinned)
+
+
+    def evict_expired(self) -> int:
+        '''Remove the sessions that have expired.
+
+        Returns:
+            The number of sessions removed
+        '''
+        now = self.clock()
+        evicted = 0
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if session.expires_at > now:
+                break
+            self.sessions.popitem(last=False)
+            evicted += 1
+        return evicted
+
+
+    def create(self, name: str, value: object = None, pinned: bool = False) -> Session:
+        '''Make a session with a new random token.
+
+        Args:
+            name: The username of the player.
+            value: The state the host keeps for the player.
+            pinned: Whether the session is pinned, e.g. the player is connected.
+
+        Returns:
+            The session
+        '''
+        self.evict_expired()
+        session = Session(secrets.token_bytes(TOKEN_BYTES), name, value, self.clock() + self.ttl)
+        if pinned:
+            self.pinned[session.token] = session
+        else:
+            self.sessions[session.token] = session
+        return session
+
+
+    def get(self, token: bytes) -> Optional[Session]:
+        '''Find a live session and keep it alive for another TTL.
+
+        Args:
+            token: The token sent by the player.
+
+        Returns:
+            The session, None if the token is unknown or expired
+        '''
+        self.evict_expired()
+        session = self.pinned.get(token)
+        if session is not None:
+            return session
+        session = self.sessions.get(token)
+        if session is not None:
+            session.expires_at = self.clock() + self.ttl
+            self.sessions.move_to_end(token)
+        return session
+
+
+    def pin(self, token: bytes) -> Optional[Session]:
+        '''Stop a live session from expiring.
+
+        Args:
+            token: The token of the session.
+
+        Returns:
+            The session, None if the token is unknown or expired
+        '''
+        session = self.get(token)
+        if session is not None and token in self.sessions:
+            self.pinned[token] = self.sessions.pop(token)
+        return session
+
+
+    def unpin(self, token: bytes) -> Optional[Session]:
+        '''Let a pinned session expire a TTL from now.
+
+        Args:
+            token: The token of the session.
+
+        Returns:
+            The session, its expires_at is the deadline to use it, None if the token is unknown or expired
+        '''
+        session = self.pinned.pop(token, None)
+        if session is not None:
+            session.expires_at = self.clock() + self.ttl
+            self.sessions[token] = session      # the latest expiry, so the order holds
+            return session
+        return self.get(token)
+
+
+    def discard(self, token: bytes) -> None:
+        '''Remove a session if it is live.
+
+        Args:
+            token: The token of the session.
+        '''
+        self.sessions.pop(token, None)
+        self.pinned.pop(token, None)
+
+
+def restore_board(board: BoardClass, snapshot: bytes) -> bool:
+    '''Bring a gameboard to the state of a SNAPSHOT payload.
+
+    Args:
+        board: The gameboard of the receiver, of the same shape as the snapshot.
+        snapshot: The payload of the SNAPSHOT frame.
+
+    Returns:
+        True if the game of the snapshot is over, False otherwise
+    '''
+    size, _, stats, moves = protocol.decode_snapshot(snapshot)
+    board.resetGameBoard()
+    names = (board.player1_name, board.player2_name)
+    for turn, index in enumerate(moves):
+        board.updateGameBoard(names[turn % 2], index // size + 1, index % size + 1)
+    game_over = bool(moves) and (board.isWinner() or board.boardIsFull())
+    board.num_of_wins, board.num_of_losses, board.num_of_ties = stats   # the host counted this game already
+    return game_over
@@ -0,0 +1,385 @@
+"""\
+This module provides a perfect-play solver for the gameboard.
+
+The solver runs negamax with alpha-beta pruning on two bit masks, one for the
+player to move and one for the opponent. Searched positions are kept in a
+bounded transposition table keyed by the canonical Zobrist key, which folds
+the 8 rotations and reflections of the board together, so symmetric
+positions are only searched once.
+
+Functions:
+get_solver() -- get the shared solver of a board size and win length
+
+Classes:
+Solver -- negamax search with a transposition table
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from bitboard import slot_line_masks
+from gameboard import BoardClass
+from zobrist import symmetry_maps, zobrist_table
+
+WIN_SCORE = 1000            # score of a win, the number of empty slots left is added to prefer quick wins
+INFINITY = 10 ** 6
+MAX_ENTRIES = 1 << 20       # default number of positions kept in the transposition table
+CHUNK_BITS = 8              # bits permuted at once by the symmetry lookup tables
+
+EXACT, LOWER, UPPER = 0, 1, 2   # kinds of the values kept in the transposition table
+
+_solvers: Dict[Tuple[int, int, Optional[int]], 'Solver'] = {}
+
+
+def get_solver(size: int = 3, win_length: int = 3, max_depth: Optional[int] = None) -> 'Solver':
+    '''Get the solver shared by the whole process.
+
+    The 3x3 game is solved exhaustively the first time its solver is requested.
+
+    Args:
+        size: The number of rows (and columns) of the board.
+        win_length: The number of chess in a row needed to win.
+        max_depth: The number of moves searched ahead, None to search to the end.
+
+    Returns:
+        The shared solver
+    '''
+    key = (size, win_length, max_depth)
+    if key not in _solvers:
+        solver = Solver(size, win_length, max_depth=max_depth)
+        if size == 3:
+            solver.solve()
+        _solvers[key] = solver
+    return _solvers[key]
+
+
+class Solver:
+    '''A class to search the best moves of a gameboard.
+
+    Attributes:
+        size(int): The number of rows (and columns) of the board.
+        win_length(int): The number of chess in a row needed to win.
+        max_entries(int): The number of positions kept in the transposition table.
+        max_depth(int): The number of moves searched ahead, None to search to the end.
+        table(OrderedDict): The transposition table in least recently used order.
+    '''
+    def __init__(self, size: int = 3, win_length: int = 3, max_entries: int = MAX_ENTRIES,
+                 max_depth: Optional[int] = None) -> None:
+        '''Make a solver.
+
+        Args:
+            size: The number of rows (and columns) of the board.
+            win_length: The number of chess in a row needed to win.
+            max_entries: The number of positions kept in the transposition table.
+            max_depth: The number of moves searched ahead, None to search to the end.
+        '''
+        self.size = size
+        self.win_length = win_length
+        self.max_entries = max_entries
+        self.max_depth = max_depth
+        self.table = OrderedDict()
+
+        self.num_of_slots = size * size
+        self.full_mask = (1 << self.num_of_slots) - 1
+        self.slot_masks = slot_line_masks(size, win_length)
+        # Slots through more lines are tried first, which makes the pruning cut earlier
+        self.move_order = sorted(range(self.num_of_slots), key=lambda index: -len(self.slot_masks[index]))
+        self.symmetry_tables = self.create_symmetry_tables()
+
+
+    def create_symmetry_tables(self) -> List[List[List[int]]]:
+        '''Create lookup tables that XOR the Zobrist numbers of CHUNK_BITS bits of a position at once.
+
+        The bits are those of me | opp << num_of_slots, the player to move takes the numbers of 'x'.
+
+        Returns:
+            A list indexed by symmetry, chunk and chunk value holding the XOR of the numbers
+        '''
+        table = zobrist_table(self.size)
+        tables = []
+        total_bits = 2 * self.num_of_slots
+        for slot_map in symmetry_maps(self.size):
+            bit_numbers = [table['x'][index] for index in slot_map] + [table['o'][index] for index in slot_map]
+            chunks = []
+            for start in range(0, total_bits, CHUNK_BITS):
+                chunk = []
+                for value in range(1 << CHUNK_BITS):
+                    key = 0
+                    for offset in range(CHUNK_BITS):
+                        if value >> offset & 1 and start + offset < total_bits:
+                            key ^= bit_numbers[start + offset]
+                    chunk.append(key)
+                chunks.append(chunk)
+            tables.append(chunks)
+        return tables
+
+
+    def canonical_key(self, me: int, opp: int) -> int:
+        '''Compute the Zobrist key shared by all the symmetric positions.
+
+        It is the canonicalKey() of a BoardClass with the chess of the player to move as 'x'.
+
+        Args:
+            me: The mask of the player to move.
+            opp: The mask of the opponent.
+
+        Returns:
+            The smallest key of the 8 transformed positions
+        '''
+        bits = me | opp << self.num_of_slots
+        chunk_mask = (1 << CHUNK_BITS) - 1
+        best = None
+        for chunks in self.symmetry_tables:
+            key = 0
+            rest = bits
+            for chunk in chunks:
+                if not rest:
+                    break
+                key ^= chunk[rest & chunk_mask]
+                rest >>= CHUNK_BITS
+            if best is None or key < best:
+                best = key
+        return best
+
+
+    def store(self, key: int, entry: Tuple[int, int, int]) -> None:
+        '''Keep an entry in the transposition table, evicting the least recently used one when full.
+
+        Args:
+            key: The canonical key of the position.
+            entry: The value, the kind of the value and the depth searched.
+        '''
+        self.table[key] = entry
+        self.table.move_to_end(key)
+        if len(self.table) > self.max_entries:
+            self.table.popitem(last=False)
+
+
+    def negamax(self, me: int, opp: int, depth: int, alpha: int, beta: int) -> int:
+        '''Search the value of a position for the player to move.
+
+        Args:
+            me: The mask of the player to move.
+            opp: The mask of the opponent.
+            depth: The number of moves left to search.
+            alpha: The lower bound of the interesting values.
+            beta: The upper bound of the interesting values.
+
+        Returns:
+            A positive value if the player to move wins, negative if it loses, 0 for a tie
+        '''
+        empty = self.full_mask & ~(me | opp)
+        if not empty or depth == 0:
+            return 0
+
+        key = self.canonical_key(me, opp)
+        entry = self.table.get(key)
+        if entry is not None and entry[2] >= depth:
+            self.table.move_to_end(key)
+            value, kind = entry[0], entry[1]
+            if kind == EXACT:
+                return value
+            if kind == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        original_alpha = alpha
+        best = -INFINITY
+        num_of_empty = bin(empty).count('1')
+        for index in self.move_order:
+            bit = 1 << index
+            if not empty & bit:
+                continue
+
+            new_me = me | bit
+            value = None
+            for mask in self.slot_masks[index]:
+                if new_me & mask == mask:     # Justify whether the move completes a line
+                    value = WIN_SCORE + num_of_empty - 1
+                    break
+            if value is None:
+                value = -self.negamax(opp, new_me, depth - 1, -beta, -alpha)
+
+            if value > best:
+                best = value
+            if best > alpha:
+                alpha = best
+            if alpha >= beta:
+                break
+
+        if best <= original_alpha:
+            kind = UPPER
+        elif best >= beta:
+            kind = LOWER
+        else:
+            kind = EXACT
+        self.store(key, (best, kind, depth))
+        return best
+
+
+    def solve(self) -> int:
+        '''Search every position reachable from the empty board with a full window.
+
+        Positions are searched after their children, so every entry of the game ends up
+        exact in the transposition table and later queries never search again.
+
+        Returns:
+            The value of the game for player1
+        '''
+        visited = set()
+
+        def visit(me: int, opp: int) -> None:
+            key = self.canonical_key(me, opp)
+            if key in visited:
+                return
+            visited.add(key)
+
+            empty = self.full_mask & ~(me | opp)
+            for index in self.move_order:
+                bit = 1 << index
+                if not empty & bit:
+                    continue
+                new_me = me | bit
+                if not any(new_me & mask == mask for mask in self.slot_masks[index]):
+                    visit(opp, new_me)
+            self.negamax(me, opp, self.search_depth(me | opp), -INFINITY, INFINITY)
+
+        visit(0, 0)
+        return self.negamax(0, 0, self.search_depth(0), -INFINITY, INFINITY)
+
+
+    def search_depth(self, mask: int) -> int:
+        '''Get the depth to search from a position.
+
+        Args:
+            mask: The mask of all the taken slots.
+
+        Returns:
+            The number of moves to search ahead
+        '''
+        num_of_empty = self.num_of_slots - bin(mask).count('1')
+        if self.max_depth is None:
+            return num_of_empty
+        return min(self.max_depth, num_of_empty)
+
+
+    def board_masks(self, board: BoardClass) -> Tuple[int, int]:
+        '''Read the masks of the player to move and its opponent from a gameboard.
+
+        Args:
+            board: The gameboard to read.
+
+        Returns:
+            The mask of the player to move and the mask of the opponent
+
+        Raises:
+            ValueError: if the gameboard has another size or win length
+        '''
+        if board.size != self.size or board.win_length != self.win_length:
+            raise ValueError('The solver is for %dx%d boards with %d in a row' % (self.size, self.size, self.win_length))
+
+        x_bits, o_bits = board.getBitMasks()
+        if bin(x_bits).count('1') > bin(o_bits).count('1'):     # Player1 always moves first
+            return o_bits, x_bits
+        return x_bits, o_bits
+
+
+    def slot_values(self, me: int, opp: int) -> Dict[int, int]:
+        '''Search the value of every legal move for the player to move.
+
+        Args:
+            me: The mask of the player to move.
+            opp: The mask of the opponent.
+
+        Returns:
+            A dict from the slot index of each move to its value, empty when the game is over
+        '''
+        for masks in self.slot_masks:
+            for mask in masks:
+                if opp & mask == mask:      # Justify whether the game is already won
+                    return {}
+
+        empty = self.full_mask & ~(me | opp)
+        depth = self.search_depth(me | opp)
+        num_of_empty = bin(empty).count('1')
+        values = {}
+        for index in self.move_order:
+            bit = 1 << index
+            if not empty & bit:
+                continue
+
+            new_me = me | bit
+            value = None
+            for mask in self.slot_masks[index]:
+                if new_me & mask == mask:
+                    value = WIN_SCORE + num_of_empty - 1
+                    break
+            if value is None:
+                value = -self.negamax(opp, new_me, depth - 1, -INFINITY, INFINITY)
+            values[index] = value
+        return values
+
+
+    def move_values(self, board: BoardClass) -> Dict[Tuple[int, int], int]:
+        '''Search the value of every legal move for the player to move.
+
+        Args:
+            board: The gameboard to search.
+
+        Returns:
+            A dict from the 1-based coordinates of each move to its value, empty when the game is over
+        '''
+        values = {}
+        for index, value in self.slot_values(*self.board_masks(board)).items():
+            x, y = divmod(index, self.size)
+            values[(x + 1, y + 1)] = value
+        return values
+
+
+    def evaluate(self, board: BoardClass) -> int:
+        '''Search the value of a gameboard for the player to move.
+
+        Args:
+            board: The gameboard to search.
+
+        Returns:
+            A positive value if the player to move wins, negative if it loses, 0 for a tie
+        '''
+        me, opp = self.board_masks(board)
+        return self.negamax(me, opp, self.search_depth(me | opp), -INFINITY, INFINITY)
+
+
+    def best_moves(self, board: BoardClass) -> List[Tuple[int, int]]:
+        '''Find all the moves with the best value.
+
+        Args:
+            board: The gameboard to search.
+
+        Returns:
+            A list of 1-based coordinates, empty when the game is over
+        '''
+        values = self.move_values(board)
+        if not values:
+            return []
+        best = max(values.values())
+        return [move for move, value in values.items() if value == best]
+
+
+    def best_move(self, board: BoardClass) -> Tuple[int, int]:
+        '''Find one of the moves with the best value.
+
+        Args:
+            board: The gameboard to search.
+
+        Returns:
+            The 1-based coordinates of the move
+
+        Raises:
+            ValueError: if the game is over
+        '''
+        moves = self.best_moves(board)
+        if not moves:
+            raise ValueError('The game is over')
+        return moves[0]
@@ -0,0 +1,124 @@
+"""\
+This module provides the fan-out of live matches to spectators.
+
+Every move is serialized once and the same bytes object is handed to the
+transport of every spectator, so nothing is copied per recipient on the way
+to the sockets. Writes never wait for a spectator: the bytes a spectator
+hasn't read yet stay in its transport, and once they go over MAX_BUFFER the
+spectator is lagging. A lagging spectator is either dropped, or skips the
+moves until its buffer is drained and then gets one SNAPSHOT of the whole
+game instead of the moves it missed. A slow spectator never slows the
+players.
+
+Classes:
+Audience -- the spectators of one match
+"""
+
+import asyncio
+from typing import Set
+from gameboard import BoardClass
+import protocol
+
+MAX_BUFFER = 1 << 14    # unsent bytes of a spectator before it is lagging
+DROP, SNAPSHOT = 'drop', 'snapshot'     # policies for lagging spectators
+POLICIES = (DROP, SNAPSHOT)
+
+
+class Audience:
+    '''A class to broadcast the frames of a match to its spectators.
+
+    Attributes:
+        board(BoardClass): The gameboard of the match.
+        policy(str): DROP to close lagging spectators, SNAPSHOT to send them a snapshot once they catch up.
+        max_buffer(int): The unsent bytes of a spectator before it is lagging.
+        spectators(set): The streams to write to the spectators.
+        lagging(set): The spectators that skipped frames.
+    '''
+    def __init__(self, board: BoardClass, policy: str = SNAPSHOT, max_buffer: int = MAX_BUFFER) -> None:
+        '''Make an audience without spectators.
+
+        Args:
+            board: The gameboard of the match.
+            policy: DROP or SNAPSHOT.
+            max_buffer: The unsent bytes of a spectator before it is lagging.
+
+        Raises:
+            ValueError: if the policy is unknown
+        '''
+        if policy not in POLICIES:
+            raise ValueError('Unknown policy %s, choose from %s' % (policy, ', '.join(POLICIES)))
+        self.board = board
+        self.policy = policy
+        self.max_buffer = max_buffer
+        self.spectators: Set[asyncio.StreamWriter] = set()
+        self.lagging: Set[asyncio.StreamWriter] = set()
+
+
+    def __len__(self) -> int:
+        '''Get the number of spectators.'''
+        return len(self.spectators)
+
+
+    def snapshot(self) -> bytes:
+        '''Build a SNAPSHOT frame of the game so far.
+
+        Returns:
+            The frame
+        '''
+        return protocol.encode_snapshot(self.board.size, self.board.win_length, self.board.move_history)
+
+
+    def add(self, writer: asyncio.StreamWriter) -> None:
+        '''Add a spectator, it gets a snapshot of the game so far.
+
+        Args:
+            writer: The stream to write to the spectator.
+        '''
+        self.spectators.add(writer)
+        writer.write(self.snapshot())
+
+
+    def discard(self, writer: asyncio.StreamWriter) -> None:
+        '''Remove a spectator if it is watching.
+
+        Args:
+            writer: The stream to write to the spectator.
+        '''
+        self.spectators.discard(writer)
+        self.lagging.discard(writer)
+
+
+    def publish(self, frame: bytes) -> None:
+        '''Send a frame to every spectator without waiting for any of them.
+
+        Args:
+            frame: The frame, the same object is written to every spectator.
+        '''
+        snapshot = None
+        for writer in list(self.spectators):
+            if writer.is_closing():
+                self.discard(writer)
+            elif writer.transport.get_write_buffer_size() > self.max_buffer:
+                if self.policy == DROP:
+                    self.discard(writer)
+                    writer.close()
+                else:
+                    self.lagging.add(writer)
+            elif writer in self.lagging:
+                if snapshot is None:    # built once for all the spectators catching up
+                    snapshot = self.snapshot()
+                self.lagging.discard(writer)
+                writer.write(snapshot)
+                if frame[0] != protocol.MOVE:   # the snapshot holds the moves, not the end of a match
+                    writer.write(frame)
+            else:
+                writer.write(frame)
+
+
+    def close(self) -> None:
+        '''Close the streams of all the spectators.
+        '''
+        for writer in self.spectators:
+            writer.close()
+        self.spectators.clear()
+        self.lagging.clear()
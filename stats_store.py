@@ -0,0 +1,263 @@
+"""\
+This module provides a persistent store of the game results in SQLite.
+
+Results are queued by record_game() and written by a background thread that
+groups them into one transaction per batch, so recording a result never
+blocks the socket thread. The database runs in WAL mode, so the queries can
+read while the writer writes. A batch that fails is logged and dropped, and
+the writer goes on with the next one. Lifetime stats per user and head-to-head
+records are kept as summary rows updated with every batch, which keeps the
+leaderboard and head-to-head queries fast however many games are stored.
+
+Functions:
+connect() -- open the database and create the tables
+
+Classes:
+StatsStore -- queues results and answers the queries
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tictactoe_stats.db')
+BATCH_SIZE = 500        # results written in one transaction at most
+FLUSH_INTERVAL = 0.5    # seconds the writer waits to fill a batch
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS users (
+    name TEXT PRIMARY KEY,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    ties INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    player1 TEXT NOT NULL,
+    player2 TEXT NOT NULL,
+    winner TEXT,
+    finished_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS head_to_head (
+    player_a TEXT NOT NULL,
+    player_b TEXT NOT NULL,
+    a_wins INTEGER NOT NULL DEFAULT 0,
+    b_wins INTEGER NOT NULL DEFAULT 0,
+    ties INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player_a, player_b)
+);
+CREATE INDEX IF NOT EXISTS users_by_wins ON users (wins DESC, losses);
+CREATE INDEX IF NOT EXISTS games_by_player1 ON games (player1, finished_at);
+CREATE INDEX IF NOT EXISTS games_by_player2 ON games (player2, finished_at);
+'''
+
+
+def connect(path: str) -> sqlite3.Connection:
+    '''Open the database in WAL mode and create the tables.
+
+    Args:
+        path: The path of the database file.
+
+    Returns:
+        The connection
+    '''
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class StatsStore:
+    '''A class to store game results and query them.
+
+    Attributes:
+        path(str): The path of the database file.
+        pending(Queue): The results waiting for the writer.
+        num_of_dropped(int): The number of results lost in batches that failed to write.
+    '''
+    def __init__(self, path: str = DEFAULT_PATH) -> None:
+        '''Open the database and start the writer thread.
+
+        Args:
+            path: The path of the database file.
+        '''
+        self.path = path
+        self.pending = queue.Queue()
+        self.num_of_dropped = 0
+        self.read_conn = connect(path)
+        self.read_lock = threading.Lock()
+        self.writer = threading.Thread(target=self.write_batches, daemon=True)
+        self.writer.start()
+
+
+    def record_game(self, player1_name: str, player2_name: str, winner: Optional[str]) -> None:
+        '''Queue the result of a game, it returns without touching the database.
+
+        Args:
+            player1_name: The username of player1.
+            player2_name: The username of player2.
+            winner: The username of the winner, None for a tie.
+        '''
+        self.pending.put((player1_name, player2_name, winner, time.time()))
+
+
+    def write_batches(self) -> None:
+        '''Write the queued results in batches until close() is called, run by the writer thread.
+
+        Every result is marked done even if its batch fails, so flush() and close() never wait forever.
+        '''
+        conn = connect(self.path)
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE and batch[-1] is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            closing = batch[-1] is None
+            results = [result for result in batch if result is not None]
+            try:
+                if results:
+                    with conn:      # one transaction for the whole batch, rolled back if it fails
+                        self.write_results(conn, results)
+            except sqlite3.Error:
+                self.num_of_dropped += len(results)
+                logger.exception('Dropped a batch of %d results', len(results))
+            finally:
+                for _ in batch:
+                    self.pending.task_done()
+            if closing:
+                conn.close()
+                return
+
+
+    @staticmethod
+    def write_results(conn: sqlite3.Connection, results: List[Tuple[str, str, Optional[str], float]]) -> None:
+        '''Insert the games and update the summary rows.
+
+        Args:
+            conn: The connection of the writer.
+            results: The queued results.
+        '''
+        conn.executemany('INSERT INTO games (player1, player2, winner, finished_at) VALUES (?, ?, ?, ?)', results)
+
+        user_rows = []
+        pair_rows = []
+        for player1_name, player2_name, winner, _ in results:
+            for name in (player1_name, player2_name):
+                if winner is None:
+                    user_rows.append((name, 0, 0, 1))
+                elif winner == name:
+                    user_rows.append((name, 1, 0, 0))
+                else:
+                    user_rows.append((name, 0, 1, 0))
+
+            player_a, player_b = sorted((player1_name, player2_name))
+            pair_rows.append((player_a, player_b, int(winner == player_a), int(winner == player_b), int(winner is None)))
+
+        conn.executemany('''INSERT INTO users (name, wins, losses, ties) VALUES (?, ?, ?, ?)
+                            ON CONFLICT (name) DO UPDATE SET wins = wins + excluded.wins,
+                            losses = losses + excluded.losses, ties = ties + excluded.ties''', user_rows)
+        conn.executemany('''INSERT INTO head_to_head (player_a, player_b, a_wins, b_wins, ties) VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT (player_a, player_b) DO UPDATE SET a_wins = a_wins + excluded.a_wins,
+                            b_wins = b_wins + excluded.b_wins, ties = ties + excluded.ties''', pair_rows)
+
+
+    def flush(self) -> None:
+        '''Wait until all the queued results are written.
+        '''
+        self.pending.join()
+
+
+    def close(self) -> None:
+        '''Write the queued results and stop the writer thread.
+        '''
+        self.pending.put(None)
+        self.writer.join()
+        self.read_conn.close()
+
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        '''Run a read-only query.
+
+        Args:
+            sql: The query.
+            params: The parameters of the query.
+
+        Returns:
+            All the rows
+        '''
+        with self.read_lock:
+            return self.read_conn.execute(sql, params).fetchall()
+
+
+    def user_stats(self, name: str) -> Tuple[int, int, int]:
+        '''Get the lifetime stats of a user.
+
+        Args:
+            name: The username.
+
+        Returns:
+            The number of wins, losses and ties
+        '''
+        rows = self.query('SELECT wins, losses, ties FROM users WHERE name = ?', (name,))
+        return rows[0] if rows else (0, 0, 0)
+
+
+    def leaderboard(self, limit: int = 10) -> List[Tuple[str, int, int, int]]:
+        '''List the users with most wins.
+
+        Args:
+            limit: The number of users.
+
+        Returns:
+            A list of (name, wins, losses, ties)
+        '''
+        return self.query('SELECT name, wins, losses, ties FROM users ORDER BY wins DESC, losses LIMIT ?', (limit,))
+
+
+    def head_to_head(self, name: str, opponent: str) -> Tuple[int, int, int]:
+        '''Get the record of a user against an opponent.
+
+        Args:
+            name: The username.
+            opponent: The username of the opponent.
+
+        Returns:
+            The number of wins and losses of the user against the opponent, and their ties
+        '''
+        player_a, player_b = sorted((name, opponent))
+        rows = self.query('SELECT a_wins, b_wins, ties FROM head_to_head WHERE player_a = ? AND player_b = ?',
+                          (player_a, player_b))
+        if not rows:
+            return 0, 0, 0
+        a_wins, b_wins, ties = rows[0]
+        return (a_wins, b_wins, ties) if name == player_a else (b_wins, a_wins, ties)
+
+
+    def match_history(self, name: str, limit: int = 20) -> List[Tuple[str, str, Optional[str], float]]:
+        '''List the latest games of a user.
+
+        Args:
+            name: The username.
+            limit: The number of games.
+
+        Returns:
+            A list of (player1, player2, winner, finished_at), the latest first
+        '''
+        return self.query('''SELECT player1, player2, winner, finished_at FROM games WHERE player1 = ?
+                             UNION ALL
+                             SELECT player1, player2, winner, finished_at FROM games WHERE player2 = ?
+                             ORDER BY finished_at DESC LIMIT ?''', (name, name, limit))
@@ -0,0 +1,153 @@
+"""\
+This module provides the automated movers that can play on a BoardClass.
+
+A strategy is a function that takes a gameboard and a random generator and
+returns the 1-based coordinates of the next move for the player to move.
+Strategies are looked up by name so they can be chosen from the command line
+and sent to other processes.
+
+Functions:
+random_strategy() -- pick any empty slot
+heuristic_strategy() -- win, block, then prefer the slots through most lines
+solver_strategy() -- pick one of the best moves of the opening book or the solver
+mcts_strategy() -- pick the move of a Monte Carlo tree search, for large boards
+mcts_parallel_strategy() -- pick the move of Monte Carlo tree searches on every core
+get_strategy() -- look up a strategy by name
+"""
+
+import random
+from multiprocessing import parent_process
+from typing import Callable, Dict, Tuple
+from bitboard import slot_line_masks
+from gameboard import BoardClass
+from mcts import get_search
+from opening_book import get_book
+from solver import get_solver
+
+SOLVER_DEPTH = 4    # moves searched ahead by the solver strategy on boards larger than 3x3
+
+Strategy = Callable[[BoardClass, random.Random], Tuple[int, int]]
+
+
+def random_strategy(board: BoardClass, rng: random.Random) -> Tuple[int, int]:
+    '''Pick any empty slot.
+
+    Args:
+        board: The gameboard to play on.
+        rng: The random generator.
+
+    Returns:
+        The 1-based coordinates of the move
+    '''
+    return rng.choice(board.getEmptySlots())
+
+
+def heuristic_strategy(board: BoardClass, rng: random.Random) -> Tuple[int, int]:
+    '''Complete a line if possible, block the opponent's line otherwise,
+    and else take the slot that lies on most lines.
+
+    Args:
+        board: The gameboard to play on.
+        rng: The random generator used to break ties.
+
+    Returns:
+        The 1-based coordinates of the move
+    '''
+    x_bits, o_bits = board.getBitMasks()
+    me, opp = (o_bits, x_bits) if bin(x_bits).count('1') > bin(o_bits).count('1') else (x_bits, o_bits)
+    slot_masks = slot_line_masks(board.size, board.win_length)
+    slots = board.getEmptySlots()
+    rng.shuffle(slots)
+
+    for bits in (me, opp):      # Win first, then block
+        for x, y in slots:
+            index = (x - 1) * board.size + y - 1
+            new_bits = bits | 1 << index
+            for mask in slot_masks[index]:
+                if new_bits & mask == mask:
+                    return x, y
+
+    return max(slots, key=lambda slot: len(slot_masks[(slot[0] - 1) * board.size + slot[1] - 1]))
+
+
+def solver_strategy(board: BoardClass, rng: random.Random) -> Tuple[int, int]:
+    '''Pick one of the best moves found by the solver.
+
+    The 3x3 game is looked up in the opening book when it has been built,
+    otherwise searched to the end. Larger boards are searched SOLVER_DEPTH
+    moves ahead.
+
+    Args:
+        board: The gameboard to play on.
+        rng: The random generator used to break ties.
+
+    Returns:
+        The 1-based coordinates of the move
+    '''
+    if board.size == 3 and board.win_length == 3:
+        book = get_book()
+        if book is not None:
+            return rng.choice(book.best_moves(board))
+    max_depth = None if board.size == 3 else SOLVER_DEPTH
+    return rng.choice(get_solver(board.size, board.win_length, max_depth).best_moves(board))
+
+
+def mcts_strategy(board: BoardClass, rng: random.Random) -> Tuple[int, int]:
+    '''Pick the most visited move of a Monte Carlo tree search.
+
+    The search spends its budget on every move and keeps the subtree of the
+    position it reaches, so the turns of the opponent are searched too.
+
+    Args:
+        board: The gameboard to play on.
+        rng: The random generator of the playouts.
+
+    Returns:
+        The 1-based coordinates of the move
+    '''
+    return get_search(board.size, board.win_length).best_move(board, rng)
+
+
+def mcts_parallel_strategy(board: BoardClass, rng: random.Random) -> Tuple[int, int]:
+    '''Pick the move with the most visits of Monte Carlo tree searches run on every core.
+
+    In a worker process of another pool it searches in that process only.
+
+    Args:
+        board: The gameboard to play on.
+        rng: The random generator that seeds the searches.
+
+    Returns:
+        The 1-based coordinates of the move
+    '''
+    if parent_process() is not None:    # a worker of another pool, e.g. selfplay, already has its core
+        return mcts_strategy(board, rng)
+    from parallel_search import get_parallel_search     # the process pool modules are slow to import
+
+    return get_parallel_search(board.size, board.win_length).best_move(board, rng)
+
+
+STRATEGIES: Dict[str, Strategy] = {
+    'random': random_strategy,
+    'heuristic': heuristic_strategy,
+    'solver': solver_strategy,
+    'mcts': mcts_strategy,
+    'mcts_parallel': mcts_parallel_strategy,
+}
+
+
+def get_strategy(name: str) -> Strategy:
+    '''Look up a strategy by name.
+
+    Args:
+        name: One of the keys of STRATEGIES.
+
+    Returns:
+        The strategy function
+
+    Raises:
+        ValueError: if there is no strategy with that name
+    '''
+    if name not in STRATEGIES:
+        raise ValueError('Unknown strategy %s, choose from %s' % (name, ', '.join(STRATEGIES)))
+    return STRATEGIES[name]
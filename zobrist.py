@@ -0,0 +1,94 @@
+"""\
+This module provides the Zobrist keys of the gameboard positions.
+
+Every slot gets one random 64-bit number per chess, and the key of a position
+is the XOR of the numbers of its chess, so a move or its undo changes the key
+with one XOR. The numbers come from a generator with a fixed seed, so the
+keys are the same in every process and can be shared through files, sockets
+or process pools.
+
+The canonical key is the same for the 8 rotations and reflections of a
+position: it XORs the numbers of the transformed slots into one key per
+symmetry and takes the smallest of the 8.
+
+Functions:
+symmetry_maps() -- list the slot permutations of the 8 board symmetries
+zobrist_table() -- get the random numbers of every slot and chess
+symmetry_key_table() -- get the numbers of every slot and chess in all 8 symmetries
+"""
+
+import random
+from typing import Dict, List, Tuple
+
+ZOBRIST_SEED = 20220314     # fixed, so the keys are stable across processes and runs
+KEY_BITS = 64
+CHESS = ('x', 'o')
+NUM_OF_SYMMETRIES = 8
+
+_tables: Dict[int, Dict[str, List[int]]] = {}
+_symmetry_tables: Dict[int, Dict[str, List[Tuple[int, ...]]]] = {}
+
+
+def symmetry_maps(size: int) -> List[Tuple[int, ...]]:
+    '''List the slot permutations of the 8 rotations and reflections of the board.
+
+    Args:
+        size: The number of rows (and columns) of the board.
+
+    Returns:
+        A list of 8 tuples, each one maps a slot index to its transformed slot index, the identity first
+    '''
+    last = size - 1
+    transforms = (
+        lambda x, y: (x, y),
+        lambda x, y: (y, last - x),
+        lambda x, y: (last - x, last - y),
+        lambda x, y: (last - y, x),
+        lambda x, y: (x, last - y),
+        lambda x, y: (last - x, y),
+        lambda x, y: (y, x),
+        lambda x, y: (last - y, last - x),
+    )
+    maps = []
+    for transform in transforms:
+        slot_map = []
+        for index in range(size * size):
+            x, y = transform(*divmod(index, size))
+            slot_map.append(x * size + y)
+        maps.append(tuple(slot_map))
+    return maps
+
+
+def zobrist_table(size: int) -> Dict[str, List[int]]:
+    '''Get the random numbers of a board size, made once per process.
+
+    Args:
+        size: The number of rows (and columns) of the board.
+
+    Returns:
+        A dict from 'x' and 'o' to the list of the numbers of every slot index
+    '''
+    if size not in _tables:
+        rng = random.Random(ZOBRIST_SEED * 1000 + size)
+        _tables[size] = {chess: [rng.getrandbits(KEY_BITS) for _ in range(size * size)] for chess in CHESS}
+    return _tables[size]
+
+
+def symmetry_key_table(size: int) -> Dict[str, List[Tuple[int, ...]]]:
+    '''Get the numbers to XOR into the 8 symmetry keys for every slot and chess.
+
+    Args:
+        size: The number of rows (and columns) of the board.
+
+    Returns:
+        A dict from 'x' and 'o' to a list indexed by slot, each item holds the numbers of
+        the transformed slot in the 8 symmetries, the identity first
+    '''
+    if size not in _symmetry_tables:
+        table = zobrist_table(size)
+        maps = symmetry_maps(size)
+        _symmetry_tables[size] = {
+            chess: [tuple(table[chess][slot_map[index]] for slot_map in maps) for index in range(size * size)]
+            for chess in CHESS
+        }
+    return _symmetry_tables[size]